@@ -0,0 +1,67 @@
+# %% INICIALIZAÇÃO
+# Benchmark de ponta a ponta: roda as etapas do main.py contra a API fake (fake_bling.py) e um
+# banco descartável, e grava requisições/s, linhas/s, latência p50/p95, tempo de banco, pico de
+# RSS e cota usada por etapa em BENCH_DIR (JSON), para comparar entre commits.
+# Uso:
+#   python benchmark.py                                   -> todas as etapas, escala BENCH_ESCALA
+#   python benchmark.py -e PRODUTOS -e SALDO_PROD_DEP     -> só as etapas informadas (nomes das tarefas)
+#   python benchmark.py --escala 0.2 --latencia 150       -> mais volume, API mais lenta
+#   python benchmark.py --db-uri postgresql://...         -> usa um banco já preparado (não cria/apaga)
+#   python benchmark.py --comparar antes.json depois.json -> variação por etapa entre duas execuções
+# O banco descartável é criado no servidor de BENCH_POSTGRES_URI (padrão: POSTGRES_URI) com o
+# schema de POSTGRES_URI (pg_dump --schema-only); nenhum dado do banco de origem é lido ou alterado.
+import argparse
+import json
+import os
+from dotenv import load_dotenv
+from src.config import BENCH_ESCALA, BENCH_DIR, FAKE_LATENCIA_MS, FAKE_LATENCIA_JITTER_MS
+from src.benchmark import comparar_resultados, executar_benchmark, medir_etapas
+from src.log import log_etl
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta da carga contra a API fake.")
+    parser.add_argument("-e", "--etapa", action="append", help="tarefa a medir (repita para várias; padrão: todas)")
+    parser.add_argument("--escala", type=float, default=BENCH_ESCALA, help="fração de FAKE_VOLUME")
+    parser.add_argument("--latencia", type=float, default=FAKE_LATENCIA_MS, help="latência da API fake (ms)")
+    parser.add_argument("--jitter", type=float, default=FAKE_LATENCIA_JITTER_MS, help="variação da latência (ms)")
+    parser.add_argument("--db-uri", help="banco já preparado (com schema e vazio); sem ele, cria um descartável")
+    parser.add_argument("--manter-banco", action="store_true", help="não apaga o banco descartável ao final")
+    parser.add_argument("--saida", default=BENCH_DIR, help="diretório dos JSONs de resultado")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NOVO"), help="compara dois JSONs de resultado")
+    parser.add_argument("--medir", help=argparse.SUPPRESS)  # uso interno: processo filho da carga
+    return parser.parse_args()
+
+
+def _imprimir_comparacao(base, novo):
+    for etapa, metricas in comparar_resultados(base, novo).items():
+        partes = [f"{m}: {a} -> {b} ({v:+.1f}%)" if v is not None else f"{m}: {a} -> {b}" for m, (a, b, v) in metricas.items()]
+        log_etl("BENCHMARK", "COMPARA", f"{etapa} | " + " | ".join(partes))
+
+
+# %% EXECUÇÃO
+if __name__ == "__main__":
+    load_dotenv()
+    args = _argumentos()
+
+    if args.medir:
+        # Processo filho: o ambiente (API fake, banco, zona bruta) já vem do processo pai
+        with open(args.medir, "w", encoding="utf-8") as f:
+            json.dump(medir_etapas(args.etapa), f, ensure_ascii=False, default=str)
+
+    elif args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as f_base, open(args.comparar[1], encoding="utf-8") as f_novo:
+            _imprimir_comparacao(json.load(f_base), json.load(f_novo))
+
+    else:
+        executar_benchmark(
+            etapas=args.etapa,
+            escala=args.escala,
+            latencia_ms=args.latencia,
+            jitter_ms=args.jitter,
+            admin_uri=os.getenv("BENCH_POSTGRES_URI") or os.getenv("POSTGRES_URI"),
+            schema_de=os.getenv("POSTGRES_URI"),
+            db_uri=args.db_uri,
+            manter_banco=args.manter_banco,
+            saida_dir=args.saida,
+        )
@@ -0,0 +1,68 @@
+# %% INICIALIZAÇÃO
+# Micro-benchmark da camada de transformação: map_produtos, map_pedido_venda, map_contato
+# (caminho quente, por registro) e parse_date_safe por formato de data.
+# Payloads: fixtures em BENCH_FIXTURES_DIR (formato da API v3) ou, com --zona-bruta, os
+# payloads gravados pela carga em RAW_DIR. Não usa API nem banco.
+# Uso:
+#   python benchmark_transformers.py                              -> todos os casos, fixtures
+#   python benchmark_transformers.py -f parse_date                -> só os casos cujo nome contém o trecho
+#   python benchmark_transformers.py --zona-bruta                 -> payloads reais da zona bruta
+#   python benchmark_transformers.py --comparar antes.json depois.json
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from src.benchmark import versao_codigo
+from src.config import BENCH_DIR, BENCH_FIXTURES_DIR, BENCH_MICRO_REPETICOES
+from src.log import log_etl
+from src.micro_benchmark import comparar_micro, executar_micro_benchmark
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Micro-benchmark dos map_* e do parse_date_safe.")
+    parser.add_argument("-f", "--filtro", help="mede só os casos cujo nome contém o trecho")
+    parser.add_argument("--repeticoes", type=int, default=BENCH_MICRO_REPETICOES)
+    parser.add_argument("--zona-bruta", action="store_true", help="usa os payloads da zona bruta no lugar das fixtures")
+    parser.add_argument("--fixtures", default=BENCH_FIXTURES_DIR, help="diretório das fixtures")
+    parser.add_argument("--saida", default=BENCH_DIR, help="diretório dos JSONs de resultado")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NOVO"), help="compara dois JSONs de resultado")
+    return parser.parse_args()
+
+
+# %% EXECUÇÃO
+if __name__ == "__main__":
+    args = _argumentos()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as f_base, open(args.comparar[1], encoding="utf-8") as f_novo:
+            for caso, (antes, depois, variacao) in comparar_micro(json.load(f_base), json.load(f_novo)).items():
+                sufixo = f" ({variacao:+.1f}%)" if variacao is not None else ""
+                log_etl("MICRO_BENCHMARK", "COMPARA", f"{caso}: {antes} -> {depois} us/registro{sufixo}")
+        sys.exit(0)
+
+    inicio = datetime.now()
+    casos = executar_micro_benchmark(args.filtro, args.zona_bruta, args.repeticoes, args.fixtures)
+    for caso, metricas in casos.items():
+        log_etl(
+            "MICRO_BENCHMARK", "INFO",
+            f"{caso}: {metricas['por_registro_us']} us/registro | {metricas['registros_s']} registros/s "
+            f"(mediana {metricas['mediana_us']} us, desvio {metricas['desvio_us']} us por chamada de {metricas['registros']} registros)"
+        )
+
+    resultado = {
+        "versao": versao_codigo(),
+        "data": inicio.isoformat(timespec="seconds"),
+        "parametros": {
+            "filtro": args.filtro,
+            "repeticoes": args.repeticoes,
+            "origem": "zona_bruta" if args.zona_bruta else args.fixtures,
+            "python": sys.version.split()[0],
+        },
+        "casos": casos,
+    }
+    os.makedirs(args.saida, exist_ok=True)
+    caminho = os.path.join(args.saida, f"micro_{inicio:%Y%m%d_%H%M%S}_{resultado['versao'] or 'sem-git'}.json")
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    log_etl("MICRO_BENCHMARK", "FIM", f"Resultado gravado em {caminho}")
@@ -0,0 +1,66 @@
+# %% INICIALIZAÇÃO
+# API fake do Bling: servidor local com dados sintéticos e os limites da API real
+# (3 req/s, 120k/dia, bloqueio de IP, 20 chamadas/60s no /oauth/token), para medir a carga
+# sem chamar api.bling.com.br.
+# Uso:
+#   python fake_bling.py                                   -> volumes de FAKE_VOLUME, porta FAKE_PORTA
+#   python fake_bling.py --escala 10 --latencia 150        -> 10x os volumes, 150ms por resposta
+#   python fake_bling.py --sem-autenticacao                -> aceita qualquer Bearer/refresh_token
+# Para apontar a carga (main.py) para o servidor, no .env:
+#   BLING_API_URL=http://127.0.0.1:8765/Api/v3
+#   TOKEN_URL=http://127.0.0.1:8765/Api/v3/oauth/token
+# e grave em conf.token o par de tokens impresso na inicialização.
+import argparse
+import json
+from src.config import (
+    FAKE_HOST,
+    FAKE_PORTA,
+    FAKE_SEMENTE,
+    FAKE_VOLUME,
+    FAKE_LATENCIA_MS,
+    FAKE_LATENCIA_JITTER_MS,
+    FAKE_LIMITE_SEGUNDO,
+    FAKE_LIMITE_DIARIO,
+    FAKE_BLOQUEIO_IP_ESPERA,
+    FAKE_BLOQUEIO_TOKEN_ESPERA,
+)
+from src.fake_bling import DadosSinteticos, ServidorBlingFake
+from src.log import log_etl
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API v3 do Bling.")
+    parser.add_argument("--host", default=FAKE_HOST)
+    parser.add_argument("--porta", type=int, default=FAKE_PORTA)
+    parser.add_argument("--escala", type=float, default=1.0, help="multiplica os volumes de FAKE_VOLUME")
+    parser.add_argument("--semente", type=int, default=FAKE_SEMENTE)
+    parser.add_argument("--latencia", type=float, default=FAKE_LATENCIA_MS, help="latência por resposta (ms)")
+    parser.add_argument("--jitter", type=float, default=FAKE_LATENCIA_JITTER_MS, help="variação da latência (ms)")
+    parser.add_argument("--limite-segundo", type=int, default=FAKE_LIMITE_SEGUNDO)
+    parser.add_argument("--limite-diario", type=int, default=FAKE_LIMITE_DIARIO)
+    parser.add_argument("--bloqueio-ip", type=float, default=FAKE_BLOQUEIO_IP_ESPERA, help="duração (s) do bloqueio de IP")
+    parser.add_argument("--bloqueio-token", type=float, default=FAKE_BLOQUEIO_TOKEN_ESPERA, help="duração (s) do bloqueio por /oauth/token")
+    parser.add_argument("--sem-autenticacao", action="store_true", help="não valida Bearer nem refresh_token")
+    return parser.parse_args()
+
+
+# %% EXECUÇÃO
+if __name__ == "__main__":
+    args = _argumentos()
+    volume = {recurso: max(int(qtd * args.escala), 1) for recurso, qtd in FAKE_VOLUME.items()}
+    servidor = ServidorBlingFake(
+        host=args.host,
+        porta=args.porta,
+        dados=DadosSinteticos(volume=volume, semente=args.semente),
+        latencia_ms=args.latencia,
+        jitter_ms=args.jitter,
+        limite_segundo=args.limite_segundo,
+        limite_diario=args.limite_diario,
+        bloqueio_ip=args.bloqueio_ip,
+        bloqueio_token=args.bloqueio_token,
+        exigir_token=not args.sem_autenticacao,
+    )
+    log_etl("FAKE_BLING", "INÍCIO", f"API fake em {servidor.url_api} (token: {servidor.url_token}); volumes: {volume}")
+    log_etl("FAKE_BLING", "INFO", f"Tokens para conf.token: {json.dumps(servidor.emitir_token())}")
+    servidor.servir()
+    log_etl("FAKE_BLING", "FIM", f"Servidor encerrado: {servidor.metricas()}")
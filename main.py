@@ -3,13 +3,15 @@
 # carrega .env, configura API, conexão e parâmetros globais
 
 from dotenv import load_dotenv
-import os, psycopg2
+import os
 from datetime import datetime, timedelta
 import time
 
 from src.bling_api import BlingAPI
 from src.db import (
     call_procedure,
+    modo_carga,
+    get_estatisticas_upsert,
     upsert_empresa_bling_bulk,
     upsert_categoria_produto_bling_bulk,
     upsert_grupo_produto_bling_bulk,
@@ -41,6 +43,9 @@ from src.utils import (
     atualizar_controle_carga,
     registrar_falha_importacao,
     get_data_periodo_incremental,
+    get_data_periodo_watermark,
+    atualizar_watermark,
+    maior_data_alteracao,
     flush_buffer,
     montar_filtro_pedidos,
     montar_filtro_contatos
@@ -57,6 +62,8 @@ from src.config import (
     BLING_FULL_FIM,
     DATA_FULL_INICIAL,
     MARGEM_DIAS_INCREMENTO,
+    WATERMARK_SOBREPOSICAO_DIAS,
+    WATERMARK_CAMPOS,
     RODAR_PIPELINE_CARGA_COMPLETA,
     RODAR_EMPRESA,
     RODAR_CATEGORIA,
@@ -69,14 +76,35 @@ from src.config import (
     RODAR_PEDIDOS_VENDAS,
     RODAR_CATEGORIAS_RECEITAS_DESPESAS,
     RODAR_CONTATO,
-    RODAR_PRODUTO_ESTRUTURA
+    RODAR_PRODUTO_ESTRUTURA,
+    COPY_BATCH_SIZE,
+    RETOMAR_CARGA,
+    SALDO_IDS_POR_REQUISICAO
+)
+from src.pipeline import executar_pipeline
+from src.checkpoint import CheckpointCarga
+from src.orquestrador import tarefa, tarefas_registradas, executar_dag
+from src.extrator import (
+    extrair_detalhes_paginados,
+    extrair_detalhes_por_janelas,
+    planejar_janelas,
+    extrair_data,
+    buscar_saldos_em_lotes,
+    obter_ids_produtos
 )
 from src.date_utils import format_bling_datetime
+from src.auth import get_token_cache_stats
+from src.conexao import conexao, registrar_metricas_pool
+from src.retry import CotaDiariaEsgotada
+from src.cota import obter_cota_diaria
+from src.arquivo_bruto import ArquivoBruto
 
 load_dotenv()
 api_key = os.getenv("BLING_API_KEY")
 db_uri = os.getenv("POSTGRES_URI")
-api = BlingAPI(api_key)
+# Cota diária da conta (conf.cota_api): contabiliza as requisições e protege as reservas (ex.: pedidos)
+cota = obter_cota_diaria(db_uri)
+api = BlingAPI(api_key, cota=cota)
 
 # 🔹 Calcula janela de carga global (usada por todos os blocos)
 try:
@@ -102,7 +130,12 @@ except Exception as e:
 # EMPRESA: 
 # Carga sempre FULL, sem filtros ou paginação
 
-if RODAR_EMPRESA:
+@tarefa(
+    "EMPRESA",
+    habilitada=RODAR_EMPRESA,
+    mensagem_desligada="Carga da empresa está desligada (RODAR_EMPRESA = False)"
+)
+def carga_empresa():
     log_etl("EMPRESA", "INÍCIO", "Carga da empresa iniciada")
     id_log_empresa = iniciar_log_etl(db_uri, tabela="empresa_bling", acao="extracao")
     tempo_inicio = time.time()
@@ -110,6 +143,7 @@ if RODAR_EMPRESA:
         try:
             empresa_dict = api.get_empresa()
             empresas = [empresa_dict]
+            ArquivoBruto("empresa").gravar(empresas)
         except Exception as api_erro:
             erro_msg = f"Falha na API de empresa: {api_erro}"
             log_etl("EMPRESA", "ERRO", erro=erro_msg)
@@ -165,40 +199,51 @@ if RODAR_EMPRESA:
         log_etl("EMPRESA", "ERRO", erro=str(e))
         finalizar_log_etl(db_uri, id_log_empresa, status="erro", mensagem_erro=str(e))
         raise
-else:
-    log_etl("EMPRESA", "DESLIGADA", "Carga da empresa está desligada (RODAR_EMPRESA = False)")
 
 # %% CATEGORIA PRODUTO
 # CATEGORIA PRODUTO
 # Carga FULL paginada via endpoint categorias/produtos
 
-if RODAR_CATEGORIA:
+@tarefa(
+    "CATEGORIA",
+    habilitada=RODAR_CATEGORIA,
+    mensagem_desligada="Carga da categoria está desligada (RODAR_CATEGORIA = False)"
+)
+def carga_categoria():
     log_etl("CATEGORIA", "INÍCIO", "Carga da categoria produto iniciada")
     id_log_cat = iniciar_log_etl(db_uri, tabela="categoria_produto_bling", acao="extracao")
     tempo_inicio = time.time()
     try:
-        categorias = api.get_all_paginated("categorias/produtos", data_path=['data'])
-        log_etl("CATEGORIA", "API", "Dados coletados da API", quantidade=len(categorias))
+        total_categorias = 0
+        idx = 0
+        # Streaming: mapeia e grava página a página, sem acumular a lista completa
+        arquivo_bruto = ArquivoBruto("categoria_produto")
+        for categorias in api.iter_paginas("categorias/produtos", data_path=['data']):
+            log_etl("CATEGORIA", "API", "Página coletada da API", quantidade=len(categorias))
+            arquivo_bruto.gravar(categorias)
+
+            lista_categorias = []
+            for c in categorias:
+                idx += 1
+                try:
+                    mapped = map_categoria_produto(c)
+                    lista_categorias.append(mapped)
+                except Exception as erro:
+                    erro_msg = f"Falha ao mapear categoria idx {idx}: {erro}"
+                    if DEBUG:
+                        log_etl("CATEGORIA", "WARN", erro=erro_msg)
+                    registrar_falha_importacao(
+                        db_uri=db_uri,
+                        entidade="categoria_produto",
+                        id_referencia=c.get("id"),
+                        erro=erro_msg,
+                        id_log=id_log_cat
+                    )
 
-        lista_categorias = []
-        for idx, c in enumerate(categorias, 1):
-            try:
-                mapped = map_categoria_produto(c)
-                lista_categorias.append(mapped)
-            except Exception as erro:
-                erro_msg = f"Falha ao mapear categoria idx {idx}: {erro}"
-                if DEBUG:
-                    log_etl("CATEGORIA", "WARN", erro=erro_msg)
-                registrar_falha_importacao(
-                    db_uri=db_uri,
-                    entidade="categoria_produto",
-                    id_referencia=c.get("id"),
-                    erro=erro_msg,
-                    id_log=id_log_cat
-                )
+            upsert_categoria_produto_bling_bulk(lista_categorias, db_uri)
+            total_categorias += len(lista_categorias)
 
-        upsert_categoria_produto_bling_bulk(lista_categorias, db_uri)
-        log_etl("CATEGORIA", "DB", "Inseridos/atualizados no banco", quantidade=len(lista_categorias))
+        log_etl("CATEGORIA", "DB", "Inseridos/atualizados no banco", quantidade=total_categorias)
 
         finalizar_log_etl(db_uri, id_log_cat, status="finalizado")
         log_etl("CATEGORIA", "FIM", "Carga finalizada", tempo=(time.time() - tempo_inicio))
@@ -216,42 +261,52 @@ if RODAR_CATEGORIA:
         log_etl("CATEGORIA", "ERRO", erro=str(e))
         finalizar_log_etl(db_uri, id_log_cat, status="erro", mensagem_erro=str(e))
         raise
-else:
-    log_etl("CATEGORIA", "DESLIGADA", "Carga da categoria está desligada (RODAR_CATEGORIA = False)")
 
 # %% GRUPO PRODUTO
 # GRUPO PRODUTO
 # Carga FULL da lista de grupos de produto (sem filtros ou incremental)
 
-if RODAR_GRUPO_PRODUTO:
+@tarefa(
+    "GRUPO PRODUTO",
+    habilitada=RODAR_GRUPO_PRODUTO,
+    mensagem_desligada="Carga do grupo de produtos está desligada (RODAR_GRUPO_PRODUTO = False)"
+)
+def carga_grupo_produto():
     log_etl("GRUPO PRODUTO", "INÍCIO", "Carga do grupo de produtos iniciada")
     id_log_grupo = iniciar_log_etl(db_uri, tabela="grupo_produto_bling", acao="extracao")
     tempo_inicio = time.time()
     try:
         # Requisição da lista completa de grupos de produto via paginação
-        grupos = api.get_all_paginated("grupos-produtos", data_path=['data'])
-        log_etl("GRUPO PRODUTO", "API", "Dados coletados da API", quantidade=len(grupos))
+        total_grupos = 0
+        idx = 0
+        arquivo_bruto = ArquivoBruto("grupo_produto")
+        for grupos in api.iter_paginas("grupos-produtos", data_path=['data']):
+            log_etl("GRUPO PRODUTO", "API", "Página coletada da API", quantidade=len(grupos))
+            arquivo_bruto.gravar(grupos)
+
+            lista_grupos = []
+            for g in grupos:
+                idx += 1
+                try:
+                    mapped = map_grupo_produto(g)
+                    lista_grupos.append(mapped)
+                except Exception as erro:
+                    erro_msg = f"Falha ao mapear grupo produto idx {idx}: {erro}"
+                    if DEBUG:
+                        log_etl("GRUPO PRODUTO", "WARN", erro=erro_msg)
+                    registrar_falha_importacao(
+                        db_uri=db_uri,
+                        entidade="grupo_produto",
+                        id_referencia=g.get("id"),
+                        erro=erro_msg,
+                        id_log=id_log_grupo
+                    )
 
-        lista_grupos = []
-        for idx, g in enumerate(grupos, 1):
-            try:
-                mapped = map_grupo_produto(g)
-                lista_grupos.append(mapped)
-            except Exception as erro:
-                erro_msg = f"Falha ao mapear grupo produto idx {idx}: {erro}"
-                if DEBUG:
-                    log_etl("GRUPO PRODUTO", "WARN", erro=erro_msg)
-                registrar_falha_importacao(
-                    db_uri=db_uri,
-                    entidade="grupo_produto",
-                    id_referencia=g.get("id"),
-                    erro=erro_msg,
-                    id_log=id_log_grupo
-                )
+            if lista_grupos:
+                upsert_grupo_produto_bling_bulk(lista_grupos, db_uri)
+                total_grupos += len(lista_grupos)
 
-        if lista_grupos:
-            upsert_grupo_produto_bling_bulk(lista_grupos, db_uri)
-            log_etl("GRUPO PRODUTO", "DB", "Inseridos/atualizados no banco", quantidade=len(lista_grupos))
+        log_etl("GRUPO PRODUTO", "DB", "Inseridos/atualizados no banco", quantidade=total_grupos)
 
         finalizar_log_etl(db_uri, id_log_grupo, status="finalizado")
         log_etl("GRUPO PRODUTO", "FIM", "Carga finalizada", tempo=(time.time() - tempo_inicio))
@@ -271,14 +326,17 @@ if RODAR_GRUPO_PRODUTO:
         finalizar_log_etl(db_uri, id_log_grupo, status="erro", mensagem_erro=str(e))
         raise
 
-else:
-    log_etl("GRUPO PRODUTO", "DESLIGADA", "Carga do grupo de produtos está desligada (RODAR_GRUPO_PRODUTO = False)")
 
 # %% DEPOSITO
 # DEPOSITO
 # Carga FULL dos depósitos, sem filtros ou paginação
 
-if RODAR_DEPOSITOS:
+@tarefa(
+    "DEPOSITOS",
+    habilitada=RODAR_DEPOSITOS,
+    mensagem_desligada="Carga de depósitos está desligada (RODAR_DEPOSITOS = False)"
+)
+def carga_depositos():
     log_etl("DEPOSITOS", "INÍCIO", "Carga de depósitos iniciada")
     id_log_deposito = iniciar_log_etl(db_uri, tabela="deposito_bling", acao="extracao")
     tempo_inicio = time.time()
@@ -288,6 +346,7 @@ if RODAR_DEPOSITOS:
         try:
             depositos_resp = api.get_depositos()
             depositos = depositos_resp if isinstance(depositos_resp, list) else [depositos_resp]
+            ArquivoBruto("deposito").gravar(depositos)
         except Exception as api_erro:
             erro_msg = f"Falha na API de depósitos: {api_erro}"
             log_etl("DEPOSITOS", "ERRO", erro=erro_msg)
@@ -348,15 +407,19 @@ if RODAR_DEPOSITOS:
         finalizar_log_etl(db_uri, id_log_deposito, status="erro", mensagem_erro=str(e))
         raise
 
-else:
-    log_etl("DEPOSITOS", "DESLIGADA", "Carga de depósitos está desligada (RODAR_DEPOSITOS = False)")
 
 
 # %% PRODUTO
 # PRODUTO
 # Coleta de produtos via ID paginado e fetch detalhado, com upsert em lote
 
-if RODAR_PRODUTO:
+@tarefa(
+    "PRODUTOS",
+    habilitada=RODAR_PRODUTO,
+    recurso="produtos",
+    mensagem_desligada="Carga de produtos está desligada (RODAR_PRODUTO = False)"
+)
+def carga_produto():
     log_etl("PRODUTOS", "INÍCIO", "Carga de produtos iniciada")
     id_log_prod = iniciar_log_etl(db_uri, tabela="produtos_bling", acao="extracao")
     tempo_inicio = time.time()
@@ -381,45 +444,27 @@ if RODAR_PRODUTO:
 
         log_etl("PRODUTOS", "INFO", f"Janela de carga definida: De {dt_ini} até {dt_fim}")
 
-        pagina = 1
         limite = 100
         total_inseridos = 0
         maior_data = None
 
-        while True:
-            params_api = {
-                "dataAlteracaoInicial": params_base["dataInicial"],
-                "dataAlteracaoFinal": params_base["dataFinal"]
-            }
-
-            ids_produtos = api.get_produtos_ids_pagina(pagina, limit=limite, params=params_api)
-            if not ids_produtos:
-                break
-
-            if DEBUG:
-                log_etl("PRODUTOS", "DEBUG", f"Página {pagina}: {len(ids_produtos)} IDs coletados.")
-
-            produtos_detalhados = []
-            for idx, id_prod in enumerate(ids_produtos, 1):
-                if DEBUG:
-                    log_etl("PRODUTOS", "DEBUG", f"ID {((pagina-1)*limite)+idx}: {id_prod}")
-                try:
-                    resp = api.get_produto_por_id(id_prod)
-                    if resp and "data" in resp:
-                        produtos_detalhados.append(resp["data"])
-                    else:
-                        erro_msg = f"Produto ID {id_prod} não retornou detalhes ou veio vazio."
-                        if DEBUG:
-                            log_etl("PRODUTOS", "WARN", erro=erro_msg)
-                        registrar_falha_importacao(db_uri, "produto", id_prod, erro_msg, id_log_prod)
-                except Exception as erro:
-                    erro_msg = f"Erro ao buscar produto ID {id_prod}: {erro}"
-                    if DEBUG:
-                        log_etl("PRODUTOS", "WARN", erro=erro_msg)
-                    registrar_falha_importacao(db_uri, "produto", id_prod, erro_msg, id_log_prod)
-
-                time.sleep(0.35)
+        params_api = {
+            "dataAlteracaoInicial": params_base["dataInicial"],
+            "dataAlteracaoFinal": params_base["dataFinal"]
+        }
 
+        for pagina, ids_produtos, produtos_detalhados in extrair_detalhes_paginados(
+            fn_ids_pagina=api.get_produtos_ids_pagina,
+            fn_detalhe=api.get_produto_por_id,
+            db_uri=db_uri,
+            entidade="produto",
+            ent_label="PRODUTOS",
+            id_log=id_log_prod,
+            params=params_api,
+            limite=limite,
+            extrair=extrair_data,
+            arquivo=ArquivoBruto("produto")
+        ):
             log_etl("PRODUTOS", "API", f"IDs coletados da página {pagina}", quantidade=len(produtos_detalhados))
 
             produtos_mapeados = map_produtos(produtos_detalhados)
@@ -435,8 +480,6 @@ if RODAR_PRODUTO:
             if pagina_maior_data and (maior_data is None or pagina_maior_data > maior_data):
                 maior_data = pagina_maior_data
 
-            pagina += 1
-
         finalizar_log_etl(db_uri, id_log_prod, status="finalizado")
         log_etl("PRODUTOS", "FIM", "Carga finalizada", tempo=(time.time() - tempo_inicio), quantidade=total_inseridos)
 
@@ -453,52 +496,69 @@ if RODAR_PRODUTO:
         log_etl("PRODUTOS", "ERRO", erro=str(e))
         finalizar_log_etl(db_uri, id_log_prod, status="erro", mensagem_erro=str(e))
         raise
-else:
-    log_etl("PRODUTOS", "DESLIGADA", "Carga de produtos está desligada (RODAR_PRODUTO = False)")
 
 # %% PRODUTO SALDO
 # PRODUTO SALDO
 # Coleta de saldos de produtos por depósito. Sempre FULL (não há incremental na API).
 
-if RODAR_SALDO_PRODUTO_DEPOSITO:
+def estimar_requisicoes_saldo():
+    # 1 requisição por lote de SALDO_IDS_POR_REQUISICAO produtos do catálogo
+    with conexao(db_uri) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM stg.produto_bling")
+            total = cur.fetchone()[0]
+    return -(-total // SALDO_IDS_POR_REQUISICAO)
+
+
+@tarefa(
+    "SALDO_PROD_DEP",
+    depende_de=("PRODUTOS", "DEPOSITOS"),
+    habilitada=RODAR_SALDO_PRODUTO_DEPOSITO,
+    recurso="estoques/saldos",
+    custo=estimar_requisicoes_saldo,
+    prioridade="baixa",
+    mensagem_desligada="Carga de saldos produto x depósito está desligada (RODAR_SALDO_PRODUTO_DEPOSITO = False)"
+)
+def carga_saldo_produto_deposito():
     log_etl("SALDO_PROD_DEP", "INÍCIO", "Carga de saldos produto x depósito iniciada")
     id_log_saldo = iniciar_log_etl(db_uri, tabela="saldo_produto_deposito_bling", acao="extracao")
     tempo_inicio = time.time()
 
     try:
-        pagina = 1
         limite = 100
         total_inseridos = 0
 
-        while True:
-            ids_produtos = api.get_produtos_ids_pagina(pagina, limit=limite)
-            if not ids_produtos:
-                break
+        # IDs listados uma única vez por execução (stg.produto_bling ou API), compartilhados entre etapas
+        ids_catalogo = obter_ids_produtos(api, db_uri)
+        arquivo_bruto = ArquivoBruto("saldo_produto_deposito")
+
+        for pagina, i in enumerate(range(0, len(ids_catalogo), limite), 1):
+            ids_produtos = ids_catalogo[i:i + limite]
 
             if DEBUG:
-                log_etl("SALDO_PROD_DEP", "DEBUG", f"Página {pagina}: {len(ids_produtos)} IDs coletados.")
+                log_etl("SALDO_PROD_DEP", "DEBUG", f"Lote {pagina}: {len(ids_produtos)} IDs.")
 
-            registros_batch = []
-            for idx, id_prod in enumerate(ids_produtos, 1):
+            saldos, falhas = buscar_saldos_em_lotes(api.get_saldos_produtos_por_ids, ids_produtos)
+            arquivo_bruto.gravar(saldos, id_de=lambda item: (item.get("produto") or {}).get("id"))
+            registros_batch = map_saldo_produto_deposito(saldos)
+
+            ids_com_saldo = {str((item.get("produto") or {}).get("id")) for item in saldos}
+            for id_prod, erro in falhas:
+                erro_msg = f"Falha ao buscar saldo do produto {id_prod}: {erro}"
                 if DEBUG:
-                    log_etl("SALDO_PROD_DEP", "DEBUG", f"ID {((pagina-1)*limite)+idx}: {id_prod}")
-                try:
-                    saldo_data = api.get_saldo_produto_por_id(id_prod)
-                    if saldo_data:
-                        registros_batch.extend(map_saldo_produto_deposito(saldo_data))
-                    else:
-                        erro_msg = f"Produto ID {id_prod} não retornou saldo ou veio vazio."
-                        if DEBUG:
-                            log_etl("SALDO_PROD_DEP", "WARN", erro=erro_msg)
-                        registrar_falha_importacao(
-                            db_uri=db_uri,
-                            entidade="saldo_produto_deposito",
-                            id_referencia=id_prod,
-                            erro=erro_msg,
-                            id_log=id_log_saldo
-                        )
-                except Exception as erro:
-                    erro_msg = f"Falha ao buscar saldo do produto {id_prod}: {erro}"
+                    log_etl("SALDO_PROD_DEP", "WARN", erro=erro_msg)
+                registrar_falha_importacao(
+                    db_uri=db_uri,
+                    entidade="saldo_produto_deposito",
+                    id_referencia=id_prod,
+                    erro=erro_msg,
+                    id_log=id_log_saldo
+                )
+                ids_com_saldo.add(str(id_prod))  # já registrado acima
+
+            for id_prod in ids_produtos:
+                if str(id_prod) not in ids_com_saldo:
+                    erro_msg = f"Produto ID {id_prod} não retornou saldo ou veio vazio."
                     if DEBUG:
                         log_etl("SALDO_PROD_DEP", "WARN", erro=erro_msg)
                     registrar_falha_importacao(
@@ -509,15 +569,12 @@ if RODAR_SALDO_PRODUTO_DEPOSITO:
                         id_log=id_log_saldo
                     )
 
-                time.sleep(0.35)
-
             # Insere o batch da página
             log_etl("SALDO_PROD_DEP", "API", f"Saldos coletados da página {pagina}", quantidade=len(registros_batch))
             upsert_saldo_produto_deposito_bulk(db_uri, registros_batch)
             log_etl("SALDO_PROD_DEP", "DB", f"Inseridos/atualizados no banco (página {pagina})", quantidade=len(registros_batch))
 
             total_inseridos += len(registros_batch)
-            pagina += 1  # Sempre incrementar após processar a página
 
         finalizar_log_etl(db_uri, id_log_saldo, status="finalizado")
         log_etl("SALDO_PROD_DEP", "FIM", "Carga finalizada", tempo=(time.time() - tempo_inicio), quantidade=total_inseridos)
@@ -535,8 +592,6 @@ if RODAR_SALDO_PRODUTO_DEPOSITO:
         log_etl("SALDO_PROD_DEP", "ERRO", erro=str(e))
         finalizar_log_etl(db_uri, id_log_saldo, status="erro", mensagem_erro=str(e))
         raise
-else:
-    log_etl("SALDO_PROD_DEP", "DESLIGADA", "Carga de saldos produto x depósito está desligada (RODAR_SALDO_PRODUTO_DEPOSITO = False)")
 
 # %% PRODUTO ESTRUTURA
 # PRODUTO ESTRUTURA
@@ -545,13 +600,30 @@ else:
 # - Faz upsert em lotes de 20 para não acumular em memória
 # - Atualiza controle de carga ao final
 
-if RODAR_PRODUTO_ESTRUTURA:
+def estimar_requisicoes_estrutura():
+    # 1 requisição por kit (teto: todos os kits, sem o filtro de data da carga)
+    with conexao(db_uri) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM stg.produto_bling WHERE formato = 'E'")
+            return cur.fetchone()[0]
+
+
+@tarefa(
+    "ESTRUTURA PRODUTO",
+    depende_de=("PRODUTOS",),
+    habilitada=RODAR_PRODUTO_ESTRUTURA,
+    recurso="produtos/estruturas",
+    custo=estimar_requisicoes_estrutura,
+    prioridade="baixa",
+    mensagem_desligada="Carga de estrutura de produtos está desligada (RODAR_PRODUTO_ESTRUTURA = False)"
+)
+def carga_produto_estrutura():
     log_etl("ESTRUTURA PRODUTO", "INÍCIO", "Iniciando carga de estruturas de produtos do tipo E")
     id_log_prod_estr = iniciar_log_etl(db_uri, tabela="produto_estrutura_bling", acao="extracao")
     tempo_inicio = time.time()
 
     try:
-        with psycopg2.connect(db_uri) as conn:
+        with conexao(db_uri) as conn:
             with conn.cursor() as cur:
                 # Calcula X = última carga - 3 dias | Y = ontem
                 cur.execute("""
@@ -578,6 +650,7 @@ if RODAR_PRODUTO_ESTRUTURA:
 
         total_inseridos = 0
         estruturas_detalhadas = []
+        arquivo_bruto = ArquivoBruto("produto_estrutura")
 
         for idx, id_prod in enumerate(produtos_kit, 1):
             if DEBUG:
@@ -587,6 +660,8 @@ if RODAR_PRODUTO_ESTRUTURA:
                 resp_estrutura = api.get_produto_estrutura_por_id(id_prod)
                 if resp_estrutura and "data" in resp_estrutura:
                     estrutura_data = resp_estrutura["data"]
+                    # id da linha na zona bruta = produto (kit), exigido por map_produto_estrutura
+                    arquivo_bruto.gravar([estrutura_data], id_de=lambda _: id_prod)
                     estruturas_map = map_produto_estrutura(estrutura_data, id_produto=id_prod)
 
                     # log_etl("ESTRUTURA PRODUTO", "DEBUG", f"{len(estruturas_map)} componentes mapeados para produto {id_prod}")
@@ -610,6 +685,8 @@ if RODAR_PRODUTO_ESTRUTURA:
                         id_log=id_log_prod_estr
                     )
 
+            except CotaDiariaEsgotada:
+                raise  # sem cota, os próximos produtos também falhariam
             except Exception as erro:
                 erro_msg = f"Erro ao buscar estrutura do produto ID {id_prod}: {erro}"
                 log_etl("ESTRUTURA PRODUTO", "WARN", erro=erro_msg)
@@ -621,8 +698,6 @@ if RODAR_PRODUTO_ESTRUTURA:
                     id_log=id_log_prod_estr
                 )
 
-            time.sleep(0.35)
-
         # Inserção final (resto do buffer)
         if estruturas_detalhadas:
             log_etl("ESTRUTURA PRODUTO", "API", "Estruturas coletadas (lote final)", quantidade=len(estruturas_detalhadas))
@@ -649,8 +724,6 @@ if RODAR_PRODUTO_ESTRUTURA:
         finalizar_log_etl(db_uri, id_log_prod_estr, status="erro", mensagem_erro=str(e))
         raise
 
-else:
-    log_etl("ESTRUTURA PRODUTO", "DESLIGADA", "Carga de estrutura de produtos está desligada (RODAR_PRODUTO_ESTRUTURA = False)")
 
 
 # %% CANAL VENDA
@@ -660,7 +733,12 @@ else:
 # Inclui logs de depuração por ID (quando DEBUG=True) e resumo da coleta.
 # Realiza upsert em lote diretamente na tabela staging.
 
-if RODAR_CANAIS_VENDA:
+@tarefa(
+    "CANAIS VENDA",
+    habilitada=RODAR_CANAIS_VENDA,
+    mensagem_desligada="Carga de canais de venda está desligada (RODAR_CANAIS_VENDA = False)"
+)
+def carga_canais_venda():
     ENT = "CANAIS VENDA"
     log_etl(ENT, "INÍCIO", "Carga de canais de venda iniciada (FULL)")
     id_log = iniciar_log_etl(db_uri, tabela="canais_venda_bling", acao="extracao")
@@ -668,6 +746,7 @@ if RODAR_CANAIS_VENDA:
     try:
         # Sempre FULL, sem filtro de datas
         canais_venda = api.get_all_paginated("canais-venda", data_path=['data'])
+        ArquivoBruto("canais_venda").gravar(canais_venda)
 
         if DEBUG:
             log_etl(ENT, "DEBUG", f"Total canais recebidos: {len(canais_venda)}")
@@ -720,8 +799,6 @@ if RODAR_CANAIS_VENDA:
             id_log=id_log
         )
         raise
-else:
-    log_etl("CANAIS VENDA", "DESLIGADA", "Carga de canais de venda está desligada (RODAR_CANAIS_VENDA = False)")
 
 
 
@@ -732,7 +809,13 @@ else:
 # Implementa paginação (100 IDs por página), coleta detalhada por ID e upsert em lote.
 # Inclui logs da janela de datas usada, quantidade de IDs por página, e falhas por vendedor.
 
-if RODAR_VENDEDOR:
+@tarefa(
+    "VENDEDOR",
+    habilitada=RODAR_VENDEDOR,
+    recurso="vendedores",
+    mensagem_desligada="Carga de vendedores está desligada (RODAR_VENDEDOR = False)"
+)
+def carga_vendedor():
     ENT = "VENDEDORES"
     log_etl(ENT, "INÍCIO", "Carga de vendedores iniciada")
     id_log = iniciar_log_etl(db_uri, tabela="vendedor_bling", acao="extracao")
@@ -763,49 +846,22 @@ if RODAR_VENDEDOR:
             "dataAlteracaoFinal": params_base["dataFinal"]
         }
 
-        pagina = 1
         limite = 100
         total_inseridos = 0
         maior_data = None
 
-        while True:
-            ids_vendedores = api.get_vendedores_ids_pagina(pagina, limit=limite, params=params_api)
-            if not ids_vendedores:
-                break
-
-            if DEBUG:
-                log_etl(ENT, "DEBUG", f"Página {pagina}: {len(ids_vendedores)} IDs coletados.")
-
-            vendedores_detalhados = []
-            for idx, id_vend in enumerate(ids_vendedores, 1):
-                if DEBUG:
-                    log_etl(ENT, "DEBUG", f"ID {((pagina-1)*limite)+idx}: {id_vend}")
-                try:
-                    resp = api.get_vendedor_por_id(id_vend)
-                    if resp and "data" in resp:
-                        vendedores_detalhados.append(resp["data"])
-                    else:
-                        erro_msg = f"Vendedor ID {id_vend} não retornou detalhes ou veio vazio."
-                        log_etl(ENT, "WARN", erro=erro_msg)
-                        registrar_falha_importacao(
-                            db_uri=db_uri,
-                            entidade="vendedor",
-                            id_referencia=id_vend,
-                            erro=erro_msg,
-                            id_log=id_log
-                        )
-                except Exception as erro:
-                    erro_msg = f"Erro ao buscar vendedor ID {id_vend}: {erro}"
-                    log_etl(ENT, "WARN", erro=erro_msg)
-                    registrar_falha_importacao(
-                        db_uri=db_uri,
-                        entidade="vendedor",
-                        id_referencia=id_vend,
-                        erro=erro_msg,
-                        id_log=id_log
-                    )
-                time.sleep(0.35)
-
+        for pagina, ids_vendedores, vendedores_detalhados in extrair_detalhes_paginados(
+            fn_ids_pagina=api.get_vendedores_ids_pagina,
+            fn_detalhe=api.get_vendedor_por_id,
+            db_uri=db_uri,
+            entidade="vendedor",
+            ent_label=ENT,
+            id_log=id_log,
+            params=params_api,
+            limite=limite,
+            extrair=extrair_data,
+            arquivo=ArquivoBruto("vendedor")
+        ):
             log_etl(ENT, "API", f"Detalhes coletados da página {pagina}", quantidade=len(vendedores_detalhados))
 
             vendedores_mapeados = map_vendedores(vendedores_detalhados)
@@ -820,8 +876,6 @@ if RODAR_VENDEDOR:
             if pagina_maior_data and (maior_data is None or pagina_maior_data > maior_data):
                 maior_data = pagina_maior_data
 
-            pagina += 1
-
         finalizar_log_etl(db_uri, id_log, status="finalizado")
         log_etl(ENT, "FIM", "Carga finalizada", tempo=(time.time() - tempo_inicio), quantidade=total_inseridos)
 
@@ -838,8 +892,6 @@ if RODAR_VENDEDOR:
         log_etl(ENT, "ERRO", erro=str(e))
         finalizar_log_etl(db_uri, id_log, status="erro", mensagem_erro=str(e))
         raise
-else:
-    log_etl("VENDEDOR", "DESLIGADA", "Carga de vendedores está desligada (RODAR_VENDEDOR = False)")
 
 
 
@@ -850,7 +902,13 @@ else:
 # Implementa paginação (100 IDs por página), coleta detalhada por ID e upsert em blocos de 20.
 # Inclui logs da janela de datas usada, quantidade de IDs por página e falhas por contato.
 
-if RODAR_CONTATO:
+@tarefa(
+    "CONTATO",
+    habilitada=RODAR_CONTATO,
+    recurso="contatos",
+    mensagem_desligada="Carga de contatos está desligada (RODAR_CONTATO = False)"
+)
+def carga_contato():
     ENT = "CONTATO"
     log_etl(ENT, "INÍCIO", "Carga de contatos iniciada")
     id_log = iniciar_log_etl(db_uri, tabela="contato_bling", acao="extracao")
@@ -863,96 +921,102 @@ if RODAR_CONTATO:
             dt_ini = BLING_FULL_INICIO.strftime("%Y-%m-%d") if isinstance(BLING_FULL_INICIO, datetime) else str(BLING_FULL_INICIO)[:10]
             dt_fim = BLING_FULL_FIM.strftime("%Y-%m-%d") if isinstance(BLING_FULL_FIM, datetime) else str(BLING_FULL_FIM)[:10]
         else:
-            dt_ini, dt_fim = get_data_periodo_incremental(
+            # Começa no watermark (maior alteração já carregada) menos a sobreposição
+            dt_ini, dt_fim = get_data_periodo_watermark(
                 db_uri,
                 "stg.contato_bling",
                 etapa,
+                WATERMARK_SOBREPOSICAO_DIAS,
                 MARGEM_DIAS_INCREMENTO,
                 DATA_FULL_INICIAL
             )
 
+        # Faixas longas são divididas em janelas (limite de 1 ano da API / janelas densas demais).
+        # Checkpoint por janela/página em conf.controle_carga: com RETOMAR_CARGA, uma carga
+        # interrompida reaproveita as janelas salvas e continua após a última página concluída
+        def filtro_janela(ini, fim):
+            return montar_filtro_contatos(ini, fim, etapa)
+
+        checkpoint, janelas, dt_ini, dt_fim = CheckpointCarga.iniciar(
+            db_uri, "contato", "stg.contato_bling", etapa, dt_ini, dt_fim,
+            retomar=RETOMAR_CARGA, ent_label=ENT,
+            planejar=lambda ini, fim: planejar_janelas(api.get_contatos_ids_pagina, filtro_janela, ini, fim, ENT)
+        )
+
         # Usa nomes de campos corretos da API de contatos
         params_base = montar_filtro_contatos(dt_ini, dt_fim, etapa)
 
         if DEBUG:
             log_etl(ENT, "DEBUG", f"Janela usada: {params_base}")
 
-        pagina = 199
         limite = 100
         total_inseridos = 0
-        buffer = []
-        BATCH_SIZE = 20
+        BATCH_SIZE = COPY_BATCH_SIZE if modo_carga("contato") == "copy" else 20
         MAX_PAGES = None  # opcional para testes
 
-        while True:
-            ids_contatos = api.get_contatos_ids_pagina(pagina, limit=limite, params=params_base)
-            if not ids_contatos:
-                break
-
-            if DEBUG:
-                log_etl(ENT, "DEBUG", f"Página {pagina}: {len(ids_contatos)} IDs coletados.")
-
-            for idx, id_bling in enumerate(ids_contatos, 1):
-                if DEBUG:
-                    log_etl(ENT, "DEBUG", f"ID {((pagina-1)*limite)+idx}: {id_bling}")
-                try:
-                    detalhe = api.get_contato_por_id(id_bling)
-                    if detalhe:
-                        mapped = map_contato(detalhe)
-                        # sobrescreve dt_atualizacao com timestamp atual (segurança)
-                        mapped["dt_atualizacao"] = datetime.now()
-                        buffer.append(mapped)
-
-                        if len(buffer) >= BATCH_SIZE:
-                            total_inseridos += flush_buffer(
-                                db_uri=db_uri,
-                                buffer=buffer,
-                                upsert_fn=upsert_contato_bling_bulk,
-                                batch_size=BATCH_SIZE,
-                                ent_label=ENT,
-                                log_fn=log_etl
-                            )
-                    else:
-                        erro_msg = f"Contato ID {id_bling} não retornou detalhe ou veio vazio."
-                        if DEBUG:
-                            log_etl(ENT, "WARN", erro=erro_msg)
-                        registrar_falha_importacao(
-                            db_uri=db_uri,
-                            entidade="contato",
-                            id_referencia=id_bling,
-                            erro=erro_msg,
-                            id_log=id_log
-                        )
-                except Exception as erro:
-                    erro_msg = f"Falha ao buscar contato {id_bling}: {erro}"
-                    if DEBUG:
-                        log_etl(ENT, "WARN", erro=erro_msg)
-                    registrar_falha_importacao(
-                        db_uri=db_uri,
-                        entidade="contato",
-                        id_referencia=id_bling,
-                        erro=erro_msg,
-                        id_log=id_log
-                    )
-                time.sleep(0.35)
-
-            log_etl(ENT, "API", f"Detalhes coletados da página {pagina}", quantidade=len(ids_contatos))
+        maior_alteracao = None
 
-            if MAX_PAGES and pagina >= MAX_PAGES:
-                break
-            pagina += 1
-
-        total_inseridos += flush_buffer(
-            db_uri=db_uri,
-            buffer=buffer,
-            upsert_fn=upsert_contato_bling_bulk,
-            batch_size=BATCH_SIZE,
+        def paginas_contatos():
+            nonlocal maior_alteracao
+            for janela, pag, ids_contatos, contatos_detalhados in extrair_detalhes_por_janelas(
+                fn_ids_pagina=api.get_contatos_ids_pagina,
+                fn_detalhe=api.get_contato_por_id,
+                montar_filtro=filtro_janela,
+                janelas=janelas,
+                db_uri=db_uri,
+                entidade="contato",
+                ent_label=ENT,
+                id_log=id_log,
+                limite=limite,
+                paginas_iniciais=checkpoint.paginas_iniciais(),
+                ao_concluir_janela=checkpoint.janela_extraida,
+                max_paginas=MAX_PAGES,
+                arquivo=ArquivoBruto("contato")
+            ):
+                log_etl(ENT, "API", f"Detalhes coletados da janela {janela[0]} a {janela[1]}, página {pag}", quantidade=len(ids_contatos))
+                checkpoint.pagina_lida(janela, pag, [d.get("id") for d in contatos_detalhados])
+                maior_alteracao = maior_data_alteracao(contatos_detalhados, WATERMARK_CAMPOS["contato"], maior_alteracao)
+                yield contatos_detalhados
+
+        def transformar_contato(detalhe):
+            mapped = map_contato(detalhe)
+            # sobrescreve dt_atualizacao com timestamp atual (segurança)
+            mapped["dt_atualizacao"] = datetime.now()
+            return mapped
+
+        def falha_transformacao_contato(detalhe, erro):
+            id_contato = detalhe.get("id") if isinstance(detalhe, dict) else None
+            registrar_falha_importacao(
+                db_uri=db_uri,
+                entidade="contato",
+                id_referencia=id_contato,
+                erro=f"Falha ao transformar contato ID {id_contato}: {erro}",
+                id_log=id_log
+            )
+            # Falha registrada para reprocesso: o ID não segura a página no checkpoint
+            checkpoint.registros_gravados([id_contato])
+
+        def gravar_contatos(lote):
+            ids = [r["id_bling"] for r in lote]
+            qtd = flush_buffer(db_uri, lote, upsert_contato_bling_bulk, BATCH_SIZE, ENT, log_etl)
+            checkpoint.registros_gravados(ids)
+            return qtd
+
+        # API, map_contato e upsert rodam em estágios paralelos (filas limitadas)
+        metricas_pipeline = executar_pipeline(
+            fonte=paginas_contatos(),
+            transformar=transformar_contato,
+            gravar=gravar_contatos,
+            tamanho_lote=BATCH_SIZE,
             ent_label=ENT,
-            log_fn=log_etl
+            ao_falhar=falha_transformacao_contato
         )
+        total_inseridos += metricas_pipeline["gravados"]
 
         finalizar_log_etl(db_uri, id_log, status="finalizado")
         log_etl(ENT, "FIM", "Carga finalizada", tempo=(time.time() - tempo_inicio), quantidade=total_inseridos)
+        est = get_estatisticas_upsert(ENT)
+        log_etl(ENT, "DB", f"Gravados: {est['gravados']} | Sem alteração (ignorados): {est['ignorados']}")
 
         atualizar_controle_carga(
             db_uri=db_uri,
@@ -962,13 +1026,18 @@ if RODAR_CONTATO:
             dt_ultima_carga=datetime.now().date(),
             suporte_incremental='S' if not CARGA_FULL else 'N'
         )
+        if not CARGA_FULL:
+            # Sem data de alteração no payload, o watermark é o fim da janela carregada
+            atualizar_watermark(
+                db_uri, "stg.contato_bling", "api_to_stg",
+                maior_alteracao or datetime.strptime(dt_fim, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+            )
+        checkpoint.concluir()
 
     except Exception as e:
         log_etl(ENT, "ERRO", erro=str(e))
         finalizar_log_etl(db_uri, id_log, status="erro", mensagem_erro=str(e))
         raise
-else:
-    log_etl("CONTATO", "DESLIGADA", "Carga de contatos está desligada (RODAR_CONTATO = False)")
 
 
 # %% CATEGORIA RECEITA/DESPESA
@@ -977,7 +1046,12 @@ else:
 # Implementa paginação (100 IDs por página), coleta detalhada por página e upsert direto.
 # Inclui logs de quantidade de IDs por página, detalhes mapeados e falhas no mapeamento.
 
-if RODAR_CATEGORIAS_RECEITAS_DESPESAS:
+@tarefa(
+    "CAT_REC_DESP",
+    habilitada=RODAR_CATEGORIAS_RECEITAS_DESPESAS,
+    mensagem_desligada="Carga está desligada (RODAR_CATEGORIAS_RECEITAS_DESPESAS = False)"
+)
+def carga_categorias_receitas_despesas():
     ENT = "CAT_REC_DESP"
     log_etl(ENT, "INÍCIO", "Carga de categorias de receitas/despesas iniciada")
     id_log_cat_fin = iniciar_log_etl(db_uri, tabela="categoria_receita_despesa_bling", acao="extracao")
@@ -987,6 +1061,7 @@ if RODAR_CATEGORIAS_RECEITAS_DESPESAS:
         limite = 100
         total_inseridos = 0
         MAX_PAGES = None  # defina 3 para teste
+        arquivo_bruto = ArquivoBruto("categoria_receita_despesa")
 
         while True:
             ids = api.get_categorias_rec_desp_ids_pagina(pagina, limit=limite)
@@ -1000,6 +1075,7 @@ if RODAR_CATEGORIAS_RECEITAS_DESPESAS:
 
             # Busca itens completos da mesma página e mapeia
             itens = api.get_categorias_rec_desp_pagina(pagina, limit=limite)
+            arquivo_bruto.gravar(itens)
             lista_mapeada = []
             for it in itens:
                 try:
@@ -1043,8 +1119,6 @@ if RODAR_CATEGORIAS_RECEITAS_DESPESAS:
         log_etl(ENT, "ERRO", erro=str(e))
         finalizar_log_etl(db_uri, id_log_cat_fin, status="erro", mensagem_erro=str(e))
         raise
-else:
-    log_etl("CAT_REC_DESP", "DESLIGADA", "Carga está desligada (RODAR_CATEGORIAS_RECEITAS_DESPESAS = False)")
 
 
 # %% PEDIDO DE VENDA
@@ -1055,7 +1129,14 @@ else:
 # - Faz upsert em lotes de 20 registros usando buffer + flush_buffer().
 # - Logs padronizados indicam janela usada, IDs por página, falhas de mapeamento e totais inseridos.
 
-if RODAR_PEDIDOS_VENDAS:
+@tarefa(
+    "PEDIDOS_VENDAS",
+    habilitada=RODAR_PEDIDOS_VENDAS,
+    recurso="pedidos/vendas",
+    prioridade="critica",
+    mensagem_desligada="Carga de pedidos de venda está desligada (RODAR_PEDIDOS_VENDAS = False)"
+)
+def carga_pedidos_vendas():
     ENT = "PEDIDOS_VENDAS"
     log_etl(ENT, "INÍCIO", "Carga de pedidos de venda iniciada")
     id_log = iniciar_log_etl(db_uri, tabela="pedido_venda_bling", acao="extracao")
@@ -1068,14 +1149,28 @@ if RODAR_PEDIDOS_VENDAS:
             dt_ini = BLING_FULL_INICIO.strftime("%Y-%m-%d") if isinstance(BLING_FULL_INICIO, datetime) else str(BLING_FULL_INICIO)[:10]
             dt_fim = BLING_FULL_FIM.strftime("%Y-%m-%d") if isinstance(BLING_FULL_FIM, datetime) else str(BLING_FULL_FIM)[:10]
         else:
-            dt_ini, dt_fim = get_data_periodo_incremental(
+            # Começa no watermark (maior alteração já carregada) menos a sobreposição
+            dt_ini, dt_fim = get_data_periodo_watermark(
                 db_uri,
                 "stg.pedido_venda_bling",
                 etapa,
+                WATERMARK_SOBREPOSICAO_DIAS,
                 MARGEM_DIAS_INCREMENTO,
                 DATA_FULL_INICIAL
             )
         
+        # Faixas longas são divididas em janelas (limite de 1 ano da API / janelas densas demais).
+        # Checkpoint por janela/página em conf.controle_carga: com RETOMAR_CARGA, uma carga
+        # interrompida reaproveita as janelas salvas e continua após a última página concluída
+        def filtro_janela(ini, fim):
+            return montar_filtro_pedidos(ini, fim, etapa)
+
+        checkpoint, janelas, dt_ini, dt_fim = CheckpointCarga.iniciar(
+            db_uri, "pedido_venda", "stg.pedido_venda_bling", etapa, dt_ini, dt_fim,
+            retomar=RETOMAR_CARGA, ent_label=ENT,
+            planejar=lambda ini, fim: planejar_janelas(api.get_pedidos_vendas_ids_pagina, filtro_janela, ini, fim, ENT)
+        )
+
         # 🔹 Log da janela de carga (mesmo padrão de CONTATOS)
         log_etl(ENT, "INFO", f"Janela de carga definida: De {dt_ini} até {dt_fim}")
 
@@ -1088,79 +1183,68 @@ if RODAR_PEDIDOS_VENDAS:
 
         
 
-        pagina = 1
         limite = 100
         total_inseridos = 0
-        buffer = []
-        BATCH_SIZE = 20
+        BATCH_SIZE = COPY_BATCH_SIZE if modo_carga("pedido_venda") == "copy" else 20
         MAX_PAGES = None  # defina valor para limitar páginas em testes
 
-        while True:
-            ids_pedidos = api.get_pedidos_vendas_ids_pagina(pagina, limit=limite, params=params_base)
-            if not ids_pedidos:
-                break
-
-            if DEBUG:
-                log_etl(ENT, "DEBUG", f"Página {pagina}: {len(ids_pedidos)} IDs coletados.")
-
-            for idx, id_ped in enumerate(ids_pedidos, 1):
-                if DEBUG:
-                    log_etl(ENT, "DEBUG", f"ID {((pagina-1)*limite)+idx}: {id_ped}")
-                try:
-                    detalhe = api.get_pedido_venda_por_id(id_ped)
-                    if detalhe:
-                        buffer.append(map_pedido_venda(detalhe))
-                        if len(buffer) >= BATCH_SIZE:
-                            total_inseridos += flush_buffer(
-                                db_uri=db_uri,
-                                buffer=buffer,
-                                upsert_fn=upsert_pedido_venda_bling_bulk,
-                                batch_size=BATCH_SIZE,
-                                ent_label=ENT,
-                                log_fn=log_etl
-                            )
-                    else:
-                        erro_msg = f"Pedido ID {id_ped} não retornou detalhe ou veio vazio."
-                        if DEBUG:
-                            log_etl(ENT, "WARN", erro=erro_msg)
-                        registrar_falha_importacao(
-                            db_uri=db_uri,
-                            entidade="pedido_venda",
-                            id_referencia=id_ped,
-                            erro=erro_msg,
-                            id_log=id_log
-                        )
-                except Exception as erro:
-                    erro_msg = f"Falha ao buscar pedido {id_ped}: {erro}"
-                    if DEBUG:
-                        log_etl(ENT, "WARN", erro=erro_msg)
-                    registrar_falha_importacao(
-                        db_uri=db_uri,
-                        entidade="pedido_venda",
-                        id_referencia=id_ped,
-                        erro=erro_msg,
-                        id_log=id_log
-                    )
-                time.sleep(0.35)
-
-            log_etl(ENT, "API", f"Detalhes coletados da página {pagina}", quantidade=len(ids_pedidos))
-
-            if MAX_PAGES and pagina >= MAX_PAGES:
-                break
-            pagina += 1
+        maior_alteracao = None
 
-        # Flush final do buffer
-        total_inseridos += flush_buffer(
-            db_uri=db_uri,
-            buffer=buffer,
-            upsert_fn=upsert_pedido_venda_bling_bulk,
-            batch_size=BATCH_SIZE,
+        def paginas_pedidos():
+            nonlocal maior_alteracao
+            for janela, pag, ids_pedidos, pedidos_detalhados in extrair_detalhes_por_janelas(
+                fn_ids_pagina=api.get_pedidos_vendas_ids_pagina,
+                fn_detalhe=api.get_pedido_venda_por_id,
+                montar_filtro=filtro_janela,
+                janelas=janelas,
+                db_uri=db_uri,
+                entidade="pedido_venda",
+                ent_label=ENT,
+                id_log=id_log,
+                limite=limite,
+                paginas_iniciais=checkpoint.paginas_iniciais(),
+                ao_concluir_janela=checkpoint.janela_extraida,
+                max_paginas=MAX_PAGES,
+                arquivo=ArquivoBruto("pedido_venda")
+            ):
+                log_etl(ENT, "API", f"Detalhes coletados da janela {janela[0]} a {janela[1]}, página {pag}", quantidade=len(ids_pedidos))
+                checkpoint.pagina_lida(janela, pag, [d.get("id") for d in pedidos_detalhados])
+                maior_alteracao = maior_data_alteracao(pedidos_detalhados, WATERMARK_CAMPOS["pedido_venda"], maior_alteracao)
+                yield pedidos_detalhados
+
+        def falha_transformacao_pedido(detalhe, erro):
+            id_pedido = detalhe.get("id") if isinstance(detalhe, dict) else None
+            registrar_falha_importacao(
+                db_uri=db_uri,
+                entidade="pedido_venda",
+                id_referencia=id_pedido,
+                erro=f"Falha ao transformar pedido ID {id_pedido}: {erro}",
+                id_log=id_log
+            )
+            # Falha registrada para reprocesso: o ID não segura a página no checkpoint
+            checkpoint.registros_gravados([id_pedido])
+
+        def gravar_pedidos(lote):
+            ids = [r["id_bling"] for r in lote]
+            qtd = flush_buffer(db_uri, lote, upsert_pedido_venda_bling_bulk, BATCH_SIZE, ENT, log_etl)
+            checkpoint.registros_gravados(ids)
+            return qtd
+
+        # API, map_pedido_venda e upsert rodam em estágios paralelos (filas limitadas)
+        metricas_pipeline = executar_pipeline(
+            fonte=paginas_pedidos(),
+            transformar=map_pedido_venda,
+            gravar=gravar_pedidos,
+            tamanho_lote=BATCH_SIZE,
             ent_label=ENT,
-            log_fn=log_etl
+            ao_falhar=falha_transformacao_pedido
         )
+        total_inseridos += metricas_pipeline["gravados"]
 
         finalizar_log_etl(db_uri, id_log, status="finalizado")
         log_etl(ENT, "FIM", "Carga finalizada", tempo=(time.time() - tempo_inicio), quantidade=total_inseridos)
+        est = get_estatisticas_upsert(ENT)
+        log_etl(ENT, "DB", f"Gravados: {est['gravados']} | Sem alteração (ignorados): {est['ignorados']}")
 
         atualizar_controle_carga(
             db_uri=db_uri,
@@ -1170,17 +1254,27 @@ if RODAR_PEDIDOS_VENDAS:
             dt_ultima_carga=datetime.now().date(),
             suporte_incremental='S' if not CARGA_FULL else 'N'
         )
+        if not CARGA_FULL:
+            # Sem data de alteração no payload, o watermark é o fim da janela carregada
+            atualizar_watermark(
+                db_uri, "stg.pedido_venda_bling", "api_to_stg",
+                maior_alteracao or datetime.strptime(dt_fim, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+            )
+        checkpoint.concluir()
 
     except Exception as e:
         log_etl(ENT, "ERRO", erro=str(e))
         finalizar_log_etl(db_uri, id_log, status="erro", mensagem_erro=str(e))
         raise
-else:
-    log_etl("PEDIDOS_VENDAS", "DESLIGADA", "Carga de pedidos de venda está desligada (RODAR_PEDIDOS_VENDAS = False)")
 
 
 # %% FINALIZAÇÃO: CARGA COMPLETA (dimensões + fatos + views)
-if RODAR_PIPELINE_CARGA_COMPLETA:
+@tarefa(
+    "PIPELINE_CARGA_COMPLETA",
+    depende_de=[t.nome for t in tarefas_registradas()],
+    habilitada=RODAR_PIPELINE_CARGA_COMPLETA
+)
+def carga_pipeline_carga_completa():
     ENT = "PIPELINE_CARGA_COMPLETA"
     log_etl(ENT, "INÍCIO", "Execução do pipeline de carga completa iniciada")
     id_log = iniciar_log_etl(db_uri, tabela="pipeline_completa", acao="pipeline")
@@ -1197,4 +1291,29 @@ if RODAR_PIPELINE_CARGA_COMPLETA:
         log_etl(ENT, "ERRO", f"Erro ao executar pipeline completo: {str(e)}", id_log)
         raise
 
+# %% EXECUÇÃO (DAG)
+# Cada célula acima só registra sua etapa como tarefa (flag RODAR_* + dependências).
+# Aqui o orquestrador executa as etapas independentes em paralelo, respeitando as dependências
+# (ex.: ESTRUTURA PRODUTO e SALDO_PROD_DEP esperam PRODUTOS) e o rate limit compartilhado da API.
+# Antes de liberar cada etapa, a estimativa de requisições é comparada com a cota diária:
+# etapas de prioridade "baixa" (saldos, estruturas) que não cabem são adiadas para a próxima execução.
+# Para rodar uma etapa isolada numa sessão interativa, chame a função direto (ex.: carga_empresa()).
+# O guarda __main__ permite importar este arquivo só para registrar as tarefas (ex.: benchmark.py).
+# O finally grava a cota pendente e fecha a sessão HTTP mesmo quando uma etapa falha.
+if __name__ == "__main__":
+    try:
+        executar_dag(cota=cota)
+    finally:
+        try:
+            # MÉTRICAS DA EXECUÇÃO
+            log_etl("ORQUESTRADOR", "INFO", f"Cache de token: {get_token_cache_stats()}")
+            log_etl("ORQUESTRADOR", "INFO", f"Conexões HTTP: {api.get_metricas_conexao()}")
+            log_etl("ORQUESTRADOR", "INFO", f"Retry 429: {api.get_metricas_retry()}")
+            log_etl("ORQUESTRADOR", "INFO", f"Circuit breaker: {api.get_metricas_circuit_breaker()}")
+            cota.flush()
+            log_etl("ORQUESTRADOR", "INFO", f"Cota diária: {cota.metricas()}")
+            registrar_metricas_pool(db_uri)
+        finally:
+            api.fechar()
+
 # %%
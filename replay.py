@@ -0,0 +1,45 @@
+# %% INICIALIZAÇÃO
+# Replay: reconstrói as tabelas stg.* a partir da zona bruta (RAW_DIR), sem chamar a API do Bling.
+# Uso:
+#   python replay.py                                  -> todas as entidades, todos os dias
+#   python replay.py -e pedido_venda -e contato       -> só as entidades informadas
+#   python replay.py -e pedido_venda --de 2025-01-01 --ate 2025-01-31 --processos 4
+# As datas filtram pelo dia da extração (partição dt= da zona bruta).
+import argparse
+import os
+from dotenv import load_dotenv
+from src.config import RAW_DIR, REPLAY_PROCESSOS, REPLAY_TAMANHO_LOTE
+from src.log import log_etl
+from src.replay import ENTIDADES_REPLAY, reprocessar_zona_bruta
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Reprocessa as tabelas stg.* a partir da zona bruta, sem API.")
+    parser.add_argument("-e", "--entidade", action="append", choices=sorted(ENTIDADES_REPLAY),
+                        help="entidade a reprocessar (repita para várias; padrão: todas)")
+    parser.add_argument("--de", dest="dt_ini", help="primeiro dia de extração (AAAA-MM-DD)")
+    parser.add_argument("--ate", dest="dt_fim", help="último dia de extração (AAAA-MM-DD)")
+    parser.add_argument("--processos", type=int, default=REPLAY_PROCESSOS, help="processos para o map_* (1 = sem multiprocessamento)")
+    parser.add_argument("--lote", type=int, default=REPLAY_TAMANHO_LOTE, help="linhas por lote")
+    parser.add_argument("--diretorio", default=RAW_DIR, help="raiz da zona bruta")
+    return parser.parse_args()
+
+
+# %% EXECUÇÃO
+# O guarda __main__ é obrigatório: no Windows os processos filhos reimportam este arquivo.
+if __name__ == "__main__":
+    load_dotenv()
+    db_uri = os.getenv("POSTGRES_URI")
+    args = _argumentos()
+
+    resultado = reprocessar_zona_bruta(
+        db_uri,
+        entidades=args.entidade,
+        dt_ini=args.dt_ini,
+        dt_fim=args.dt_fim,
+        processos=args.processos,
+        tamanho_lote=args.lote,
+        diretorio=args.diretorio,
+    )
+    for entidade, metricas in resultado.items():
+        log_etl("REPLAY", "INFO", f"{entidade}: {metricas}")
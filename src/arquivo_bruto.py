@@ -0,0 +1,227 @@
+# region IMPORTS
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import date, datetime
+from src.config import RAW_ATIVO, RAW_DIR, RAW_COMPRESSAO
+
+try:
+    import zstandard
+except ImportError:  # opcional: sem o pacote, os arquivos são gravados em gzip
+    zstandard = None
+# endregion
+
+# region FORMATO DOS ARQUIVOS
+# Cada chamada de gravar() acrescenta um bloco comprimido independente (membro gzip / frame zstd)
+# ao fim do arquivo: o arquivo nunca é reescrito e continua legível mesmo se a carga cair no meio.
+_EXTENSOES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def _resolver_compressao(compressao):
+    if compressao == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if compressao == "zstd" and zstandard is None:
+        raise ImportError("Compressão zstd requer o pacote 'zstandard' (pip install zstandard)")
+    return compressao
+
+
+def _comprimir(dados, compressao):
+    if compressao == "zstd":
+        return zstandard.ZstdCompressor().compress(dados)
+    return gzip.compress(dados)
+
+
+def _descomprimir_bloco(f, compressao, tamanho_leitura=65536):
+    # Descomprime só o bloco que começa na posição atual de `f` (o offset indexado)
+    if compressao == "zstd":
+        descompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        descompressor = zlib.decompressobj(wbits=31)
+    partes = []
+    while not descompressor.eof:
+        conteudo = f.read(tamanho_leitura)
+        if not conteudo:
+            break
+        partes.append(descompressor.decompress(conteudo))
+    return b"".join(partes)
+
+
+def _compressao_do_arquivo(caminho):
+    return "zstd" if caminho.endswith(_EXTENSOES["zstd"]) else "gzip"
+# endregion
+
+# region ÍNDICE POR id_bling (SQLITE LOCAL)
+_LOCK = threading.Lock()  # serializa acréscimos aos arquivos e ao índice dentro do processo
+
+
+def _conectar_indice(diretorio):
+    os.makedirs(diretorio, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(diretorio, "indice.sqlite3"))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS indice (
+            entidade    TEXT    NOT NULL,
+            id_bling    TEXT    NOT NULL,
+            arquivo     TEXT    NOT NULL,
+            offset      INTEGER NOT NULL,
+            posicao     INTEGER NOT NULL,
+            gravado_em  TEXT    NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_indice_entidade_id ON indice (entidade, id_bling)")
+    return conn
+# endregion
+
+# region GRAVAÇÃO
+class ArquivoBruto:
+    """
+    Zona bruta (landing) de uma entidade: guarda em disco os payloads da API exatamente como
+    chegam ao map_*, para reprocessar transformações sem gastar cota da API.
+    Layout: {diretorio}/{entidade}/dt=AAAA-MM-DD/{entidade}__{ini}__{fim}.jsonl.gz
+      - dt = dia da extração; um arquivo por entidade por janela de datas ("completo" sem janela)
+      - cada linha: {"id", "janela", "recebido_em", "dados"}
+    Cada gravação também é indexada por id_bling em {diretorio}/indice.sqlite3.
+    Com ativo=False (RAW_ATIVO desligado), gravar() não faz nada.
+    """
+
+    def __init__(self, entidade, diretorio=RAW_DIR, compressao=RAW_COMPRESSAO, ativo=RAW_ATIVO):
+        self.entidade = entidade
+        self.ativo = ativo
+        self.diretorio = diretorio
+        self.compressao = _resolver_compressao(compressao)
+        self.total_registros = 0
+        self.total_bytes = 0
+
+    def _caminho(self, janela):
+        sufixo = f"{janela[0]}__{janela[1]}" if janela else "completo"
+        pasta = os.path.join(self.diretorio, self.entidade, f"dt={date.today().isoformat()}")
+        return os.path.join(pasta, f"{self.entidade}__{sufixo}{_EXTENSOES[self.compressao]}")
+
+    def gravar(self, registros, janela=None, id_de=None):
+        """
+        Acrescenta os registros (payloads já extraídos, ex.: detalhes de uma página) ao arquivo
+        da janela. id_de(registro) devolve o id_bling (padrão: registro["id"]).
+        Retorna a quantidade gravada.
+        """
+        if not self.ativo:
+            return 0
+        registros = [r for r in registros if r is not None]
+        if not registros:
+            return 0
+        id_de = id_de or (lambda r: r.get("id") if isinstance(r, dict) else None)
+        recebido_em = datetime.now().isoformat(timespec="seconds")
+        janela_json = list(janela) if janela else None
+        ids = [id_de(r) for r in registros]
+        linhas = "".join(
+            json.dumps({"id": i, "janela": janela_json, "recebido_em": recebido_em, "dados": r}, ensure_ascii=False, default=str) + "\n"
+            for i, r in zip(ids, registros)
+        )
+        bloco = _comprimir(linhas.encode("utf-8"), self.compressao)
+        caminho = self._caminho(janela)
+
+        with _LOCK:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            with open(caminho, "ab") as f:
+                offset = f.tell()
+                f.write(bloco)
+            relativo = os.path.relpath(caminho, self.diretorio)
+            conn = _conectar_indice(self.diretorio)
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO indice (entidade, id_bling, arquivo, offset, posicao, gravado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (self.entidade, str(i), relativo, offset, pos, recebido_em)
+                            for pos, i in enumerate(ids) if i is not None
+                        ],
+                    )
+            finally:
+                conn.close()
+            self.total_registros += len(registros)
+            self.total_bytes += len(bloco)
+        return len(registros)
+
+    def metricas(self) -> dict:
+        return {"registros": self.total_registros, "bytes": self.total_bytes, "compressao": self.compressao}
+
+# endregion
+
+# region LEITURA
+def ler_arquivo_bruto(caminho):
+    """
+    Gera as linhas (dicts) de um arquivo da zona bruta, em ordem de gravação, sem carregar tudo em memória.
+    """
+    if _compressao_do_arquivo(caminho) == "zstd":
+        if zstandard is None:
+            raise ImportError(f"{caminho} está em zstd; instale o pacote 'zstandard' para ler")
+        with open(caminho, "rb") as bruto:
+            leitor = zstandard.ZstdDecompressor().stream_reader(bruto, read_across_frames=True)
+            for linha in _linhas_texto(leitor):
+                yield json.loads(linha)
+        return
+    with gzip.open(caminho, "rt", encoding="utf-8") as f:
+        for linha in f:
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def _linhas_texto(leitor):
+    for linha in io.TextIOWrapper(leitor, encoding="utf-8"):
+        if linha.strip():
+            yield linha
+
+
+def listar_arquivos_brutos(entidade=None, dt_ini=None, dt_fim=None, diretorio=RAW_DIR):
+    """
+    Lista (entidade, dia_extracao, caminho) dos arquivos da zona bruta, em ordem de dia.
+    dt_ini/dt_fim ('AAAA-MM-DD', inclusivos) filtram pelo dia da extração (partição dt=).
+    """
+    arquivos = []
+    if not os.path.isdir(diretorio):
+        return arquivos
+    entidades = [entidade] if entidade else sorted(
+        e for e in os.listdir(diretorio) if os.path.isdir(os.path.join(diretorio, e))
+    )
+    for ent in entidades:
+        pasta_ent = os.path.join(diretorio, ent)
+        if not os.path.isdir(pasta_ent):
+            continue
+        for particao in sorted(os.listdir(pasta_ent)):
+            if not particao.startswith("dt="):
+                continue
+            dia = particao[3:]
+            if (dt_ini and dia < str(dt_ini)[:10]) or (dt_fim and dia > str(dt_fim)[:10]):
+                continue
+            pasta = os.path.join(pasta_ent, particao)
+            for nome in sorted(os.listdir(pasta)):
+                if nome.endswith(tuple(_EXTENSOES.values())):
+                    arquivos.append((ent, dia, os.path.join(pasta, nome)))
+    return arquivos
+
+
+def localizar_registro(entidade, id_bling, diretorio=RAW_DIR):
+    """
+    Retorna a linha mais recente gravada para (entidade, id_bling), lendo só o bloco indexado, ou None.
+    """
+    with _LOCK:
+        conn = _conectar_indice(diretorio)
+        try:
+            row = conn.execute(
+                "SELECT arquivo, offset, posicao FROM indice WHERE entidade = ? AND id_bling = ? ORDER BY rowid DESC LIMIT 1",
+                (entidade, str(id_bling)),
+            ).fetchone()
+        finally:
+            conn.close()
+    if not row:
+        return None
+    arquivo, offset, posicao = row
+    caminho = os.path.join(diretorio, arquivo)
+    with open(caminho, "rb") as f:
+        f.seek(offset)
+        bloco = _descomprimir_bloco(f, _compressao_do_arquivo(caminho))
+    linhas = bloco.decode("utf-8").splitlines()
+    return json.loads(linhas[posicao])
+# endregion
@@ -2,10 +2,12 @@
 import os
 import json
 import time
+import threading
 import psycopg2
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import requests
+from src.circuit_breaker import obter_circuit_breaker
 
 load_dotenv()
 
@@ -24,6 +26,11 @@ EXPIRATION_MARGIN = 120
 # === TABELA DE TOKENS (schema conf) ===
 TOKEN_TABLE = "conf.token"
 
+# === CACHE EM MEMÓRIA DO TOKEN (evita SELECT em conf.token a cada requisição) ===
+_TOKEN_CACHE = {"access_token": None, "expires_at": 0}
+_TOKEN_CACHE_STATS = {"hits": 0, "misses": 0, "renovacoes": 0, "invalidacoes": 0}
+_TOKEN_LOCK = threading.RLock()
+
 # === FUNÇÃO: busca token no banco ===
 def load_tokens_db():
     with PG_CONN.cursor() as cur:
@@ -69,9 +76,16 @@ def refresh_access_token():
         "refresh_token": tokens["refresh_token"]
     }
 
+    # Circuit breaker: no máximo CB_MARGEM das 20 chamadas/60s permitidas; aguarda bloqueio em andamento
+    circuit_breaker = obter_circuit_breaker()
+    circuit_breaker.antes_token()
     response = requests.post(TOKEN_URL, headers=headers, data=data)
+    if response.status_code >= 400:
+        circuit_breaker.registrar_erro()
 
     if response.status_code == 429:
+        # 429 no /oauth/token = limite de 20 chamadas/60s estourado: IP bloqueado por 60 min
+        circuit_breaker.abrir(circuit_breaker.espera_bloqueio_token, "429 em /oauth/token")
         raise Exception("Erro 429: Too Many Requests ao renovar token.")
 
     response.raise_for_status()
@@ -86,18 +100,62 @@ def refresh_access_token():
     }
 
     save_tokens_db(updated)
+    _atualizar_cache(updated["access_token"], updated["expires_at"])
+    _TOKEN_CACHE_STATS["renovacoes"] += 1
     return updated["access_token"]
 
 
-# === FUNÇÃO: retorna token válido do banco ou renova ===
-def get_valid_access_token():
-    tokens = load_tokens_db()
+# === FUNÇÃO: atualiza cache em memória ===
+def _atualizar_cache(access_token, expires_at):
+    with _TOKEN_LOCK:
+        _TOKEN_CACHE["access_token"] = access_token
+        _TOKEN_CACHE["expires_at"] = int(expires_at or 0)
+
+
+# === FUNÇÃO: invalida o cache (ex.: após HTTP 401) ===
+def invalidar_cache_token():
+    with _TOKEN_LOCK:
+        _TOKEN_CACHE["access_token"] = None
+        _TOKEN_CACHE["expires_at"] = 0
+        _TOKEN_CACHE_STATS["invalidacoes"] += 1
+
+
+# === FUNÇÃO: métricas do cache de token ===
+def get_token_cache_stats():
+    with _TOKEN_LOCK:
+        stats = dict(_TOKEN_CACHE_STATS)
+    consultas = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / consultas, 4) if consultas else 0.0
+    return stats
+
+
+# === FUNÇÃO: retorna token válido (cache -> banco -> renovação) ===
+def get_valid_access_token(token_rejeitado=None):
+    """
+    Retorna o access_token válido.
+    - Usa o cache em memória enquanto faltar mais que EXPIRATION_MARGIN para expirar.
+    - Só consulta conf.token quando o cache está vazio/perto de expirar.
+    - token_rejeitado: token que voltou 401; se o banco ainda tiver o mesmo, força renovação.
+    """
     now = int(time.time())
 
-    if not tokens:
-        raise Exception("Token inexistente. Cadastre via OAuth inicial.")
+    with _TOKEN_LOCK:
+        if (
+            token_rejeitado is None
+            and _TOKEN_CACHE["access_token"]
+            and _TOKEN_CACHE["expires_at"] - now >= EXPIRATION_MARGIN
+        ):
+            _TOKEN_CACHE_STATS["hits"] += 1
+            return _TOKEN_CACHE["access_token"]
+
+        _TOKEN_CACHE_STATS["misses"] += 1
+        tokens = load_tokens_db()
+
+        if not tokens:
+            raise Exception("Token inexistente. Cadastre via OAuth inicial.")
 
-    if tokens["expires_at"] - now < EXPIRATION_MARGIN:
-        return refresh_access_token()
+        if tokens["expires_at"] - now < EXPIRATION_MARGIN or tokens["access_token"] == token_rejeitado:
+            return refresh_access_token()
 
-    return tokens["access_token"]
+        _atualizar_cache(tokens["access_token"], tokens["expires_at"])
+        return tokens["access_token"]
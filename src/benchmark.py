@@ -0,0 +1,396 @@
+# region IMPORTS
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import make_dsn
+from src.config import (
+    BENCH_ESCALA,
+    BENCH_DIR,
+    BENCH_AMOSTRA_RSS,
+    FAKE_VOLUME,
+    FAKE_LATENCIA_MS,
+    FAKE_LATENCIA_JITTER_MS,
+)
+from src.log import log_etl
+
+try:
+    import psutil
+except ImportError:  # opcional: sem o pacote, o pico de RSS é o do processo inteiro (resource)
+    psutil = None
+# endregion
+
+# region BANCO DESCARTÁVEL
+class BancoDescartavel:
+    """
+    Banco Postgres criado só para o benchmark, no mesmo servidor de `admin_uri`:
+    CREATE DATABASE + schema (sem dados) copiado de `schema_de` com pg_dump --schema-only | psql.
+    apagar() faz o DROP DATABASE. Exige pg_dump e psql no PATH.
+    """
+
+    def __init__(self, admin_uri, schema_de, nome=None):
+        self.admin_uri = admin_uri
+        self.schema_de = schema_de
+        self.nome = nome or f"bling_bench_{datetime.now():%Y%m%d_%H%M%S}"
+        self.uri = make_dsn(admin_uri, dbname=self.nome)
+
+    def _executar_admin(self, comando):
+        conn = psycopg2.connect(self.admin_uri)
+        conn.autocommit = True  # CREATE/DROP DATABASE não rodam dentro de transação
+        try:
+            with conn.cursor() as cur:
+                cur.execute(comando)
+        finally:
+            conn.close()
+
+    def criar(self):
+        self._executar_admin(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(self.nome)))
+        try:
+            dump = _rodar(["pg_dump", "--schema-only", "--no-owner", "--no-privileges", "-d", self.schema_de])
+            _rodar(["psql", "-q", "-v", "ON_ERROR_STOP=1", "-d", self.uri], entrada=dump)
+        except Exception:
+            self.apagar()
+            raise
+        log_etl("BENCHMARK", "INFO", f"Banco descartável {self.nome} criado com o schema de origem")
+        return self
+
+    def apagar(self):
+        try:
+            self._executar_admin(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(self.nome)))
+            log_etl("BENCHMARK", "INFO", f"Banco descartável {self.nome} apagado")
+        except Exception as e:
+            log_etl("BENCHMARK", "WARN", f"Não foi possível apagar o banco {self.nome}; apague manualmente", erro=str(e))
+
+
+def gravar_token(db_uri, tokens):
+    """
+    Grava em conf.token o par emitido pela API fake (mesmo formato de auth.save_tokens_db).
+    """
+    conn = psycopg2.connect(db_uri)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM conf.token")
+            cur.execute(
+                "INSERT INTO conf.token (access_token, refresh_token, expires_at) VALUES (%s, %s, %s)",
+                (tokens["access_token"], tokens["refresh_token"], int(time.time()) + tokens["expires_in"]),
+            )
+    finally:
+        conn.close()
+
+
+def _rodar(comando, entrada=None):
+    resultado = subprocess.run(comando, input=entrada, capture_output=True, text=True)
+    if resultado.returncode != 0:
+        raise RuntimeError(f"{comando[0]} falhou (código {resultado.returncode}): {resultado.stderr.strip()}")
+    return resultado.stdout
+# endregion
+
+# region MEDIÇÃO (PROCESSO DA CARGA)
+def _rss_mb():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    import resource  # Unix; ru_maxrss em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class AmostradorRSS:
+    """
+    Amostra o RSS do processo a cada `intervalo` segundos numa thread; pico() = maior valor
+    desde o último reiniciar(). Sem psutil, vale o pico do processo inteiro (ru_maxrss).
+    """
+
+    def __init__(self, intervalo=BENCH_AMOSTRA_RSS):
+        self.intervalo = intervalo
+        self._pico = _rss_mb()
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._amostrar, name="bench-rss", daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            atual = _rss_mb()
+            with self._lock:
+                self._pico = max(self._pico, atual)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def reiniciar(self):
+        with self._lock:
+            self._pico = _rss_mb()
+
+    def pico(self):
+        atual = _rss_mb()
+        with self._lock:
+            self._pico = max(self._pico, atual)
+            return round(self._pico, 1)
+
+
+def _percentil(valores, p):
+    # Percentil pelo método nearest-rank; None sem amostras
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = max(math.ceil(p / 100 * len(ordenados)), 1)
+    return ordenados[posicao - 1]
+
+
+class MedidorRequisicoes:
+    """
+    Registra (latência, status) de cada resposta HTTP do BlingAPI pelo hook de resposta da
+    sessão requests. A latência é response.elapsed (envio até o fim dos cabeçalhos).
+    """
+
+    def __init__(self, api):
+        self.respostas = []
+        self._lock = threading.Lock()
+        api.session.hooks["response"].append(self._registrar)
+
+    def _registrar(self, response, *args, **kwargs):
+        with self._lock:
+            self.respostas.append((response.elapsed.total_seconds(), response.status_code))
+
+    def desde(self, posicao):
+        with self._lock:
+            return self.respostas[posicao:]
+
+    def __len__(self):
+        with self._lock:
+            return len(self.respostas)
+
+
+def _resumir(respostas, tempo, linhas_enviadas, linhas_gravadas, tempo_db, rss_pico, cota_usada):
+    latencias = [lat for lat, _ in respostas]
+    p50, p95 = _percentil(latencias, 50), _percentil(latencias, 95)
+    return {
+        "tempo": round(tempo, 3),
+        "requisicoes": len(respostas),
+        "requisicoes_s": round(len(respostas) / tempo, 3) if tempo else 0.0,
+        "respostas_429": sum(1 for _, status in respostas if status == 429),
+        "erros_http": sum(1 for _, status in respostas if status >= 400 and status != 429),
+        "latencia_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+        "latencia_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        "linhas_enviadas": linhas_enviadas,
+        "linhas_gravadas": linhas_gravadas,
+        "linhas_s": round(linhas_enviadas / tempo, 3) if tempo else 0.0,
+        "tempo_db": round(tempo_db, 3),
+        "rss_pico_mb": rss_pico,
+        "cota_usada": cota_usada,
+    }
+
+
+def _totais_upsert(estatisticas):
+    return (
+        sum(e["enviados"] for e in estatisticas.values()),
+        sum(e["gravados"] for e in estatisticas.values()),
+        sum(e["tempo"] for e in estatisticas.values()),
+    )
+
+
+def medir_etapas(etapas=None):
+    """
+    Roda no processo filho, com BLING_API_URL/TOKEN_URL/POSTGRES_URI já apontando para a
+    API fake e o banco descartável: importa o main.py (só registra as tarefas), executa cada
+    etapa isolada, na ordem de registro (que respeita as dependências), e mede cada uma.
+    etapas: nomes das tarefas (padrão: todas menos PIPELINE_CARGA_COMPLETA).
+    """
+    from src.db import listar_estatisticas_upsert
+    from src.orquestrador import executar_dag, tarefas_registradas
+
+    amostrador = AmostradorRSS().iniciar()
+    inicio = time.time()
+    import main  # noqa: E402 - precisa do ambiente do benchmark já configurado
+    inicializacao = time.time() - inicio
+
+    medidor = MedidorRequisicoes(main.api)
+    selecionadas = [
+        t for t in tarefas_registradas()
+        if t.nome != "PIPELINE_CARGA_COMPLETA" and (not etapas or t.nome in etapas)
+    ]
+    resultado = {"inicializacao": round(inicializacao, 3), "etapas": {}}
+
+    for t in selecionadas:
+        posicao = len(medidor)
+        enviados, gravados, tempo_db = _totais_upsert(listar_estatisticas_upsert())
+        cota_antes = main.cota.usado()
+        amostrador.reiniciar()
+        log_etl("BENCHMARK", "INÍCIO", f"Etapa {t.nome}")
+        inicio_etapa = time.time()
+        erro = None
+        try:
+            # Etapa forçada como habilitada: o benchmark escolhe as etapas, não as flags RODAR_*
+            status = executar_dag(tarefas=[replace(t, habilitada=True)], cota=main.cota).get(t.nome)
+        except Exception as e:
+            status, erro = "erro", str(e)
+        tempo = time.time() - inicio_etapa
+        main.cota.flush()
+        enviados_fim, gravados_fim, tempo_db_fim = _totais_upsert(listar_estatisticas_upsert())
+
+        metricas = _resumir(
+            medidor.desde(posicao),
+            tempo,
+            enviados_fim - enviados,
+            gravados_fim - gravados,
+            tempo_db_fim - tempo_db,
+            amostrador.pico(),
+            main.cota.usado() - cota_antes,
+        )
+        metricas["status"] = status
+        if erro:
+            metricas["erro"] = erro
+        resultado["etapas"][t.nome] = metricas
+        log_etl("BENCHMARK", "FIM", f"Etapa {t.nome}: {metricas}", tempo=tempo)
+
+    etapas_medidas = resultado["etapas"].values()
+    total = _resumir(
+        medidor.desde(0),
+        sum(e["tempo"] for e in etapas_medidas),
+        sum(e["linhas_enviadas"] for e in etapas_medidas),
+        sum(e["linhas_gravadas"] for e in etapas_medidas),
+        sum(e["tempo_db"] for e in etapas_medidas),
+        max([e["rss_pico_mb"] for e in etapas_medidas], default=amostrador.pico()),
+        sum(e["cota_usada"] for e in etapas_medidas),
+    )
+    resultado["total"] = total
+    resultado["cliente"] = {
+        "conexao": main.api.get_metricas_conexao(),
+        "retry": main.api.get_metricas_retry(),
+        "circuit_breaker": main.api.get_metricas_circuit_breaker(),
+    }
+    amostrador.parar()
+    main.api.fechar()
+    return resultado
+# endregion
+
+# region EXECUÇÃO (PROCESSO DO BENCHMARK)
+def versao_codigo():
+    # Commit atual (+ "-dirty" com alterações locais), para comparar resultados entre commits
+    try:
+        commit = _rodar(["git", "rev-parse", "--short", "HEAD"]).strip()
+        alterado = _rodar(["git", "status", "--porcelain", "--untracked-files=no"]).strip()
+        return f"{commit}-dirty" if alterado else commit
+    except Exception:
+        return None
+
+
+def executar_benchmark(
+    etapas=None,
+    escala=BENCH_ESCALA,
+    latencia_ms=FAKE_LATENCIA_MS,
+    jitter_ms=FAKE_LATENCIA_JITTER_MS,
+    admin_uri=None,
+    schema_de=None,
+    db_uri=None,
+    manter_banco=False,
+    saida_dir=BENCH_DIR,
+    script=None,
+):
+    """
+    Benchmark de ponta a ponta das etapas do main.py:
+    1. sobe a API fake (src/fake_bling.py) com FAKE_VOLUME * escala registros, numa porta livre
+    2. cria o banco descartável (ou usa db_uri, já preparado) e grava o token da API fake em conf.token
+    3. roda as etapas num processo filho (script --medir), com a carga apontada para a API fake,
+       o banco descartável e uma zona bruta temporária; o RSS medido é só o da carga
+    4. junta as métricas do servidor, grava o JSON em saida_dir e apaga banco e zona bruta
+    Retorna o dict gravado.
+    """
+    from src.fake_bling import DadosSinteticos, ServidorBlingFake
+
+    volume = {recurso: max(int(qtd * escala), 1) for recurso, qtd in FAKE_VOLUME.items()}
+    script = script or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark.py")
+    inicio = datetime.now()
+    banco = None
+    dir_bruto = tempfile.mkdtemp(prefix="bling_bench_bruto_")
+    servidor = ServidorBlingFake(
+        porta=0,
+        dados=DadosSinteticos(volume=volume),
+        latencia_ms=latencia_ms,
+        jitter_ms=jitter_ms,
+    ).iniciar()
+
+    try:
+        if db_uri is None:
+            banco = BancoDescartavel(admin_uri, schema_de).criar()
+            db_uri = banco.uri
+        gravar_token(db_uri, servidor.emitir_token())
+
+        with tempfile.TemporaryDirectory(prefix="bling_bench_") as tmp:
+            arquivo_medicao = os.path.join(tmp, "medicao.json")
+            comando = [sys.executable, script, "--medir", arquivo_medicao]
+            for etapa in etapas or []:
+                comando += ["--etapa", etapa]
+            ambiente = dict(
+                os.environ,
+                BLING_API_URL=servidor.url_api,
+                TOKEN_URL=servidor.url_token,
+                POSTGRES_URI=db_uri,
+                BLING_RAW_DIR=dir_bruto,
+            )
+            log_etl("BENCHMARK", "INÍCIO", f"API fake em {servidor.url_api}; volumes: {volume}")
+            processo = subprocess.run(comando, env=ambiente, cwd=os.path.dirname(script))
+            if processo.returncode != 0 or not os.path.exists(arquivo_medicao):
+                raise RuntimeError(f"Processo da carga terminou com código {processo.returncode}")
+            with open(arquivo_medicao, encoding="utf-8") as f:
+                medicao = json.load(f)
+    finally:
+        servidor.parar()
+        shutil.rmtree(dir_bruto, ignore_errors=True)
+        if banco is not None and not manter_banco:
+            banco.apagar()
+
+    resultado = {
+        "versao": versao_codigo(),
+        "data": inicio.isoformat(timespec="seconds"),
+        "parametros": {
+            "etapas": etapas,
+            "escala": escala,
+            "volume": volume,
+            "latencia_ms": latencia_ms,
+            "jitter_ms": jitter_ms,
+            "python": sys.version.split()[0],
+        },
+        **medicao,
+        "servidor": servidor.metricas(),
+    }
+    os.makedirs(saida_dir, exist_ok=True)
+    caminho = os.path.join(saida_dir, f"bench_{inicio:%Y%m%d_%H%M%S}_{resultado['versao'] or 'sem-git'}.json")
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    resultado["arquivo"] = caminho
+    log_etl("BENCHMARK", "FIM", f"Resultado gravado em {caminho}: {resultado['total']}")
+    return resultado
+# endregion
+
+# region COMPARAÇÃO ENTRE EXECUÇÕES
+_METRICAS_COMPARADAS = ("tempo", "requisicoes_s", "linhas_s", "latencia_p95_ms", "tempo_db", "rss_pico_mb", "cota_usada")
+
+
+def comparar_resultados(base, novo):
+    """
+    Compara dois JSONs do benchmark (ex.: commit anterior x atual): para cada etapa presente nos
+    dois e para o total, devolve {etapa: {métrica: (base, novo, variação %)}}.
+    """
+    comparacao = {}
+    etapas = [e for e in base.get("etapas", {}) if e in novo.get("etapas", {})]
+    pares = [(e, base["etapas"][e], novo["etapas"][e]) for e in etapas] + [("TOTAL", base["total"], novo["total"])]
+    for etapa, a, b in pares:
+        comparacao[etapa] = {}
+        for metrica in _METRICAS_COMPARADAS:
+            va, vb = a.get(metrica), b.get(metrica)
+            variacao = round((vb - va) / va * 100, 1) if va and vb is not None else None
+            comparacao[etapa][metrica] = (va, vb, variacao)
+    return comparacao
+# endregion
@@ -1,35 +1,119 @@
 # region ============= INICIALIZAÇÃO =============
+import os
 import requests
-import time
+import threading
+from requests.adapters import HTTPAdapter
 from src.log import (
     log_etl,
 )
 from src.config import (
     DEBUG,
+    HTTP_POOL_CONEXOES,
+    HTTP_POOL_MAXSIZE,
+    HTTP_TIMEOUT,
 )
 from src.auth import get_valid_access_token   # <---- NOVO: importa função de token dinâmico
+from src.auth import invalidar_cache_token
+from src.rate_limiter import obter_rate_limiter
+from src.retry import obter_politica_retry, CotaDiariaEsgotada, TentativasEsgotadas
+from src.circuit_breaker import obter_circuit_breaker
 
-BLING_API_URL = "https://api.bling.com.br/Api/v3"  # URL base da API do Bling
+# URL base da API do Bling; BLING_API_URL no .env aponta para outro servidor (ex.: fake_bling.py)
+BLING_API_URL = os.getenv("BLING_API_URL", "https://api.bling.com.br/Api/v3")
 
 
 class BlingAPI:
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, conta="default", rate_limiter=None, politica_retry=None, cota=None):
         # self.api_key = api_key
         # self.headers = {
         #     "Accept": "application/json",
         #     "Content-Type": "application/json",
         #     "Authorization": f"Bearer {self.api_key}"
         # }
-        self.last_request_time = 0
+        self.conta = conta
+        # Limitador compartilhado por conta: todas as instâncias da mesma conta dividem o mesmo balde
+        self.rate_limiter = rate_limiter or obter_rate_limiter(conta)
+        # Política de retry em 429 também por conta (a cota diária é da conta)
+        self.politica_retry = politica_retry or obter_politica_retry(conta)
+        # Livro-caixa da cota diária (src/cota.py); None = requisições não contabilizadas
+        self.cota = cota
+        # Circuit breaker de bloqueio de IP: um por processo, também usado na renovação do token
+        self.circuit_breaker = obter_circuit_breaker()
+        # Sessão HTTP persistente: reaproveita TCP+TLS entre chamadas (keep-alive)
+        self.session = self._criar_sessao()
+        self.total_requisicoes = 0
+        self._contador_lock = threading.Lock()
+
+    def _criar_sessao(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONEXOES,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=0,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        return session
+
+    def fechar(self):
+        """
+        Fecha a sessão HTTP e libera as conexões do pool.
+        """
+        self.session.close()
+# endregion
+
+# region ============= MÉTRICAS DE CONEXÃO =============
+    def get_metricas_conexao(self):
+        """
+        Retorna métricas do pool HTTP:
+        - handshakes: conexões novas abertas (TCP+TLS)
+        - requisicoes: requisições enviadas pelos pools
+        - reuso: requisições que aproveitaram conexão já aberta
+        """
+        handshakes = 0
+        requisicoes = 0
+        for adapter in set(self.session.adapters.values()):
+            poolmanager = getattr(adapter, "poolmanager", None)
+            if poolmanager is None:
+                continue
+            for chave in list(poolmanager.pools.keys()):
+                pool = poolmanager.pools.get(chave)
+                if pool is None:
+                    continue
+                handshakes += pool.num_connections
+                requisicoes += pool.num_requests
+        reuso = max(requisicoes - handshakes, 0)
+        return {
+            "requisicoes_api": self.total_requisicoes,
+            "handshakes": handshakes,
+            "requisicoes_pool": requisicoes,
+            "reuso": reuso,
+            "taxa_reuso": round(reuso / requisicoes, 4) if requisicoes else 0.0,
+        }
+
+    def get_metricas_circuit_breaker(self):
+        return self.circuit_breaker.metricas()
+
+    def get_metricas_retry(self):
+        """
+        Retorna métricas de 429/retentativas da conta e as pausas do token bucket.
+        """
+        metricas = self.politica_retry.metricas()
+        metricas["pausas_rate_limiter"] = self.rate_limiter.metricas()["pausas"]
+        return metricas
 # endregion
 
 # region ============= GERA HEADER DINAMICAMENTE (NOVO) =============
-    def get_headers(self):
+    def get_headers(self, token_rejeitado=None):
         """
-        Monta os headers sempre com o token válido do banco.
+        Monta os headers com o token válido (cache em memória, renovado via banco quando necessário).
         """
-        token = get_valid_access_token()
+        token = get_valid_access_token(token_rejeitado=token_rejeitado)
         return {
             "Accept": "application/json",
             "Content-Type": "application/json",
@@ -58,38 +142,71 @@ class BlingAPI:
     def get(self, endpoint, params=None):
         """
         Executa um GET na API do Bling com controle de rate limit, timeout e tratamento de erros.
+        - HTTP 401: invalida o cache do token e tenta uma única vez com token renovado.
+        - HTTP 429: a política de retry da conta define a espera (backoff exponencial com jitter,
+          respeitando Retry-After); durante a espera o token bucket fica pausado para todas as threads.
+          Tentativas esgotadas levantam TentativasEsgotadas (um HTTPError); cota diária esgotada
+          levanta CotaDiariaEsgotada. Os métodos *_por_id repassam as duas ao chamador.
+        - Com cota (CotaDiaria), cada requisição enviada é contabilizada no recurso do endpoint.
+        - Circuit breaker: pausa antes dos limites de bloqueio de IP; bloqueio detectado faz todas
+          as threads aguardarem o fim do bloqueio (uma espera por chamada; no segundo, HTTPError).
         """
-        elapsed = time.time() - self.last_request_time
-        if elapsed < 0.35:
-            time.sleep(0.35 - elapsed)  # Aguarda para não exceder 3 req/s
         url = f"{BLING_API_URL}/{endpoint}"
+        token_rejeitado = None
+        tentativa = 0
+        bloqueios = 0
+
+        while True:
+            self.politica_retry.verificar_cota()  # cota diária já esgotada: nem envia a requisição
+            if self.cota is not None:
+                self.cota.permitir(endpoint)  # respeita a cota local e as reservas de outros recursos
+            self.rate_limiter.adquirir()  # Aguarda token para não exceder o limite da conta (3 req/s)
+            headers = self.get_headers(token_rejeitado=token_rejeitado)
+            self.circuit_breaker.antes_requisicao()  # pausa com o circuito aberto ou perto dos limites de 10s
+            try:
+                response = self.session.get(url, headers=headers, params=params, timeout=HTTP_TIMEOUT)
+            except requests.exceptions.RequestException:
+                self.circuit_breaker.registrar_erro()
+                raise
+            with self._contador_lock:
+                self.total_requisicoes += 1
+            if self.cota is not None:
+                self.cota.registrar(endpoint)
+
+            if self.circuit_breaker.registrar_resposta(response):
+                bloqueios += 1
+                if bloqueios == 1:
+                    continue  # aguarda o fim do bloqueio (circuito aberto) e tenta de novo
+                response.raise_for_status()
+
+            if response.status_code == 401 and token_rejeitado is None:
+                invalidar_cache_token()
+                token_rejeitado = headers["Authorization"].removeprefix("Bearer ")
+                continue
 
-        try:
-            # response = requests.get(url, headers=self.headers, params=params, timeout=10)
-            response = requests.get(url, headers=self.get_headers(), params=params, timeout=60)  # <--- NOVO
-            self.last_request_time = time.time()
             if response.status_code == 429:
-                time.sleep(2)
-                return self.get(endpoint, params)
+                tentativa += 1
+                espera = self.politica_retry.avaliar_429(response, tentativa, endpoint)
+                if espera is not None:
+                    if DEBUG:
+                        log_etl("BLING_API", "DEBUG", f"429 em {endpoint} (tentativa {tentativa}); aguardando {espera:.2f}s")
+                    self.rate_limiter.pausar(espera)
+                    continue
+                raise TentativasEsgotadas(f"429 em {endpoint}: {tentativa} tentativas esgotadas", response=response)
+
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.Timeout:
-            raise
-        except Exception as ex:
-            raise
 # endregion
 
 # region ============= PAGINAÇÃO PADRÃO (GENÉRICO) =============
 
-    def get_all_paginated(self, endpoint, params=None, limit=100, data_path=None):
+    def iter_paginas(self, endpoint, params=None, limit=100, data_path=None):
         """
-        Busca todos os registros de um endpoint paginado.
+        Gera os registros de um endpoint paginado PÁGINA A PÁGINA (lista por página),
+        à medida que chegam da API, sem acumular tudo em memória.
         data_path: lista com chaves para navegar no JSON (ex: ['data'])
         """
-        if params is None:
-            params = {}
         page = 1
-        resultados = []
         while True:
             page_params = params.copy() if params else {}
             page_params["limit"] = limit
@@ -103,11 +220,24 @@ class BlingAPI:
                 items = [data["data"]] if "data" in data else []
             if not items:
                 break
-            resultados.extend(items)
+            yield items
             if len(items) < limit:
                 break
             page += 1
-        return resultados
+
+    def iter_paginated(self, endpoint, params=None, limit=100, data_path=None):
+        """
+        Gera os registros de um endpoint paginado ITEM A ITEM.
+        """
+        for items in self.iter_paginas(endpoint, params=params, limit=limit, data_path=data_path):
+            yield from items
+
+    def get_all_paginated(self, endpoint, params=None, limit=100, data_path=None):
+        """
+        Busca todos os registros de um endpoint paginado (lista única).
+        Wrapper de iter_paginated; prefira o gerador para volumes grandes.
+        """
+        return list(self.iter_paginated(endpoint, params=params, limit=limit, data_path=data_path))
 # endregion  
 
 # region ============= VENDEDORES: BUSCA IDS (PAGINADO) =============
@@ -145,6 +275,8 @@ class BlingAPI:
         try:
             response = self.get(endpoint)
             return response
+        except (CotaDiariaEsgotada, TentativasEsgotadas):
+            raise
         except Exception as e:
             log_etl("VENDEDORES", "ERRO", f"Erro ao buscar detalhe do vendedor {id_vendedor}", erro=str(e))
             return None
@@ -185,6 +317,8 @@ class BlingAPI:
         try:
             response = self.get(endpoint)
             return response
+        except (CotaDiariaEsgotada, TentativasEsgotadas):
+            raise
         except Exception as e:
             log_etl("PRODUTOS", "ERRO", f"Erro ao buscar detalhe do produto {id_produto}", erro=str(e))
             return None
@@ -219,6 +353,8 @@ class BlingAPI:
             if isinstance(response, dict) and "data" in response:
                 return response["data"]
             return response
+        except (CotaDiariaEsgotada, TentativasEsgotadas):
+            raise
         except requests.exceptions.HTTPError as e:
             # Log detalhado para entender o erro 400
             log_etl(
@@ -241,6 +377,23 @@ class BlingAPI:
 
 # endregion
 
+# region ============= PRODUTO: SALDO EM LOTE (VÁRIOS IDS) =============
+
+    def get_saldos_produtos_por_ids(self, ids_produtos):
+        """
+        Busca o saldo de vários produtos em UMA chamada (idsProdutos[] repetido).
+        Retorna a lista 'data' (um item por produto). Erros HTTP são propagados,
+        para que o chamador possa dividir o lote.
+        """
+        endpoint = "estoques/saldos"
+        params = {"idsProdutos[]": [str(i) for i in ids_produtos]}
+        response = self.get(endpoint, params=params)
+        if isinstance(response, dict) and "data" in response:
+            return response["data"] or []
+        return response if isinstance(response, list) else []
+
+# endregion
+
 # region ============= PEDIDOS: VENDAS (LISTA IDS/PAGINADO) =============
     def get_pedidos_vendas_ids_pagina(self, pagina: int, limit: int = 100, params: dict | None = None):
         """
@@ -271,6 +424,8 @@ class BlingAPI:
             if isinstance(response, dict) and "data" in response and isinstance(response["data"], dict):
                 return response["data"]
             return response
+        except (CotaDiariaEsgotada, TentativasEsgotadas):
+            raise
         except requests.exceptions.HTTPError as e:
             log_etl("PEDIDOS_VENDAS", "ERRO",
                     f"Erro ao buscar pedido {id_pedido_venda}",
@@ -333,6 +488,8 @@ class BlingAPI:
         try:
             response = self.get(endpoint)
             return response.get("data", {}) if isinstance(response, dict) else {}
+        except (CotaDiariaEsgotada, TentativasEsgotadas):
+            raise
         except Exception as e:
             log_etl("CONTATO", "ERRO", f"Erro ao buscar detalhe do contato {id_contato}", erro=str(e))
             return None
@@ -344,6 +501,8 @@ class BlingAPI:
         try:
             response = self.get(endpoint)
             return response
+        except (CotaDiariaEsgotada, TentativasEsgotadas):
+            raise
         except Exception as e:
             log_etl("ESTRUTURA PRODUTO", "ERRO", f"Erro ao buscar estrutura do produto {id_produto}", erro=str(e))
             return None
@@ -0,0 +1,223 @@
+# region IMPORTS
+import json
+import threading
+from datetime import datetime
+from src.conexao import conexao, garantir_colunas
+from src.log import log_etl
+# endregion
+
+# region COLUNAS DE CHECKPOINT EM conf.controle_carga
+_COLUNAS_CHECKPOINT = {
+    "checkpoint_dt_ini": "TEXT",
+    "checkpoint_dt_fim": "TEXT",
+    "checkpoint_pagina": "INTEGER",
+    "checkpoint_ids": "JSONB",
+    "checkpoint_janelas": "JSONB",
+    "checkpoint_status": "VARCHAR(20)",
+    "checkpoint_atualizado_em": "TIMESTAMP",
+}
+
+
+def _garantir_colunas_checkpoint(db_uri):
+    """
+    Cria (uma vez por processo) as colunas de checkpoint em conf.controle_carga.
+    """
+    garantir_colunas(db_uri, "conf.controle_carga", _COLUNAS_CHECKPOINT)
+# endregion
+
+# region LEITURA / GRAVAÇÃO
+def obter_checkpoint(db_uri, tabela_fisica, etapa):
+    """
+    Retorna o checkpoint de uma carga interrompida (status 'em_andamento') ou None.
+    dict: dt_ini, dt_fim, pagina (última página concluída), ids (IDs lidos e ainda não gravados),
+          janelas ({"ini|fim": {"pagina": n, "concluida": bool}} quando a carga foi dividida em janelas)
+    """
+    _garantir_colunas_checkpoint(db_uri)
+    with conexao(db_uri) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT checkpoint_dt_ini, checkpoint_dt_fim, checkpoint_pagina, checkpoint_ids, checkpoint_janelas
+                  FROM conf.controle_carga
+                 WHERE tabela_fisica = %s
+                   AND etapa = %s
+                   AND checkpoint_status = 'em_andamento'
+                 LIMIT 1
+            """, (tabela_fisica, etapa))
+            row = cur.fetchone()
+    if not row:
+        return None
+    return {"dt_ini": row[0], "dt_fim": row[1], "pagina": row[2] or 0, "ids": row[3] or [], "janelas": row[4] or {}}
+
+
+def salvar_checkpoint(db_uri, entidade, tabela_fisica, etapa, dt_ini, dt_fim, pagina, ids, janelas=None, status="em_andamento"):
+    """
+    Grava o checkpoint na linha (tabela_fisica, etapa) de conf.controle_carga, criando-a se não existir.
+    dt_ultima_carga não é alterado: só a carga concluída (atualizar_controle_carga) o avança.
+    """
+    valores = (dt_ini, dt_fim, pagina, json.dumps(ids), json.dumps(janelas or {}), status, datetime.now())
+    _garantir_colunas_checkpoint(db_uri)
+    with conexao(db_uri) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE conf.controle_carga
+                   SET checkpoint_dt_ini = %s,
+                       checkpoint_dt_fim = %s,
+                       checkpoint_pagina = %s,
+                       checkpoint_ids = %s,
+                       checkpoint_janelas = %s,
+                       checkpoint_status = %s,
+                       checkpoint_atualizado_em = %s
+                 WHERE tabela_fisica = %s
+                   AND etapa = %s
+            """, valores + (tabela_fisica, etapa))
+            if cur.rowcount == 0:
+                cur.execute("""
+                    INSERT INTO conf.controle_carga
+                        (entidade, tabela_fisica, etapa, suporte_incremental,
+                         checkpoint_dt_ini, checkpoint_dt_fim, checkpoint_pagina, checkpoint_ids,
+                         checkpoint_janelas, checkpoint_status, checkpoint_atualizado_em)
+                    VALUES (%s, %s, %s, 'N', %s, %s, %s, %s, %s, %s, %s)
+                """, (entidade, tabela_fisica, etapa) + valores)
+# endregion
+
+# region ACOMPANHAMENTO DA CARGA PAGINADA
+def _chave(janela):
+    return f"{janela[0]}|{janela[1]}"
+
+
+class CheckpointCarga:
+    """
+    Acompanha uma carga paginada (janela de datas -> página de IDs -> detalhe -> upsert)
+    e persiste o progresso de cada janela.
+    - pagina_lida(janela, pagina, ids): chamada pela extração ao entregar uma página
+    - janela_extraida(janela): chamada quando a extração da janela terminou, depois do
+      pagina_lida da última página dela (marcador de fim de janela em extrair_detalhes_por_janelas)
+    - registros_gravados(ids): chamada após cada upsert; quando uma página fica sem IDs
+      pendentes (e todas as anteriores da janela também), ela passa a ser a última página concluída
+    O checkpoint guarda a faixa, a última página concluída por janela, as janelas concluídas
+    e os IDs já lidos e ainda não gravados. Numa retomada, cada janela recomeça em pagina + 1
+    (as páginas relidas cobrem esses IDs) e janelas concluídas não são extraídas de novo.
+    Thread-safe: extração e carga rodam em threads diferentes no pipeline.
+    """
+
+    def __init__(self, db_uri, entidade, tabela_fisica, etapa, dt_ini, dt_fim, janelas, paginas_concluidas=None):
+        self.db_uri = db_uri
+        self.entidade = entidade
+        self.tabela_fisica = tabela_fisica
+        self.etapa = etapa
+        self.dt_ini = dt_ini
+        self.dt_fim = dt_fim
+        self.janelas = [tuple(j) for j in janelas]
+        self._ultima = {j: 0 for j in self.janelas}  # janela -> última página concluída
+        self._ultima.update(paginas_concluidas or {})
+        self._concluidas = set()
+        self._extraidas = set()
+        self._pendentes = {}  # (janela, pagina) -> set(ids) ainda não gravados
+        self._paginas_de = {}  # id -> set((janela, pagina)): o mesmo ID pode vir em mais de uma página
+        self._salvo = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def iniciar(cls, db_uri, entidade, tabela_fisica, etapa, dt_ini, dt_fim, retomar, ent_label, planejar=None, pagina_inicial=1):
+        """
+        Cria o acompanhamento da carga. Com retomar=True e um checkpoint interrompido,
+        reaproveita a faixa e as janelas salvas, pulando as concluídas; sem checkpoint,
+        as janelas vêm de planejar(dt_ini, dt_fim) (padrão: a faixa inteira numa janela só)
+        e cada uma começa em pagina_inicial.
+        Retorna (checkpoint, janelas_a_extrair, dt_ini, dt_fim).
+        """
+        salvo = obter_checkpoint(db_uri, tabela_fisica, etapa) if retomar else None
+        if salvo:
+            dt_ini, dt_fim = salvo["dt_ini"], salvo["dt_fim"]
+            if salvo["janelas"]:
+                janelas = [tuple(k.split("|")) for k in salvo["janelas"]]
+                paginas = {tuple(k.split("|")): v["pagina"] for k, v in salvo["janelas"].items()}
+                concluidas = {tuple(k.split("|")) for k, v in salvo["janelas"].items() if v["concluida"]}
+            else:
+                # checkpoint de uma carga em janela única
+                janelas = [(dt_ini, dt_fim)]
+                paginas = {(dt_ini, dt_fim): salvo["pagina"]}
+                concluidas = set()
+            cp = cls(db_uri, entidade, tabela_fisica, etapa, dt_ini, dt_fim, janelas, paginas)
+            cp._concluidas = concluidas
+            log_etl(
+                ent_label, "INFO",
+                f"Retomando carga interrompida: faixa {dt_ini} até {dt_fim}, "
+                f"{len(janelas) - len(concluidas)} de {len(janelas)} janela(s) pendente(s) "
+                f"({len(salvo['ids'])} IDs pendentes no checkpoint)"
+            )
+        else:
+            janelas = planejar(dt_ini, dt_fim) if planejar else [(dt_ini, dt_fim)]
+            paginas = {tuple(j): pagina_inicial - 1 for j in janelas}
+            cp = cls(db_uri, entidade, tabela_fisica, etapa, dt_ini, dt_fim, janelas, paginas)
+        cp.salvar(forcar=True)
+        return cp, [j for j in cp.janelas if j not in cp._concluidas], dt_ini, dt_fim
+
+    def paginas_iniciais(self):
+        with self._lock:
+            return {j: p + 1 for j, p in self._ultima.items()}
+
+    def _avancar(self):
+        # Páginas de uma janela são lidas em ordem: avança enquanto a menor página lida não tiver pendências
+        for janela in self.janelas:
+            lidas = sorted(p for (j, p) in self._pendentes if j == janela)
+            for pagina in lidas:
+                if self._pendentes[(janela, pagina)]:
+                    break
+                del self._pendentes[(janela, pagina)]
+                self._ultima[janela] = pagina
+            if janela in self._extraidas and not any(j == janela for (j, _) in self._pendentes):
+                self._concluidas.add(janela)
+
+    def pagina_lida(self, janela, pagina, ids):
+        janela = tuple(janela)
+        with self._lock:
+            self._pendentes[(janela, pagina)] = set(ids)
+            for i in ids:
+                self._paginas_de.setdefault(i, set()).add((janela, pagina))
+            self._avancar()
+
+    def janela_extraida(self, janela):
+        with self._lock:
+            self._extraidas.add(tuple(janela))
+            self._avancar()
+        self.salvar()
+
+    def registros_gravados(self, ids):
+        with self._lock:
+            for i in ids:
+                for chave in self._paginas_de.pop(i, ()):
+                    if chave in self._pendentes:
+                        self._pendentes[chave].discard(i)
+            self._avancar()
+        self.salvar()
+
+    def salvar(self, forcar=False):
+        """
+        Persiste o progresso; só grava quando alguma janela avançou (ou forcar=True).
+        """
+        with self._lock:
+            estado = {
+                _chave(j): {"pagina": self._ultima.get(j, 0), "concluida": j in self._concluidas}
+                for j in self.janelas
+            }
+            if not forcar and estado == self._salvo:
+                return
+            self._salvo = estado
+            abertas = [v["pagina"] for v in estado.values() if not v["concluida"]]
+            pagina = min(abertas) if abertas else None
+            ids = sorted(i for pend in self._pendentes.values() for i in pend)
+        salvar_checkpoint(
+            self.db_uri, self.entidade, self.tabela_fisica, self.etapa,
+            self.dt_ini, self.dt_fim, pagina, ids, janelas=estado
+        )
+
+    def concluir(self):
+        """
+        Carga finalizada: limpa página/IDs e marca o checkpoint como concluído (não será retomado).
+        """
+        salvar_checkpoint(
+            self.db_uri, self.entidade, self.tabela_fisica, self.etapa,
+            self.dt_ini, self.dt_fim, None, [], janelas=None, status="concluido"
+        )
+# endregion
@@ -0,0 +1,218 @@
+# region IMPORTS
+import threading
+import time
+from collections import deque
+from src.config import (
+    CB_JANELA_SEGUNDOS,
+    CB_LIMITE_REQUISICOES,
+    CB_LIMITE_ERROS,
+    CB_JANELA_TOKEN_SEGUNDOS,
+    CB_LIMITE_TOKEN,
+    CB_MARGEM,
+    CB_BLOQUEIO_IP_ESPERA,
+    CB_BLOQUEIO_TOKEN_ESPERA,
+)
+from src.log import log_etl
+# endregion
+
+# region JANELA DESLIZANTE
+class JanelaDeslizante:
+    """
+    Conta eventos (requisições, erros, chamadas de token) nos últimos `segundos`.
+    Não é thread-safe sozinha: o CircuitBreaker protege com o próprio lock.
+    """
+
+    def __init__(self, segundos):
+        self.segundos = float(segundos)
+        self._eventos = deque()
+
+    def _limpar(self, agora):
+        limite = agora - self.segundos
+        while self._eventos and self._eventos[0] <= limite:
+            self._eventos.popleft()
+
+    def registrar(self, agora):
+        self._limpar(agora)
+        self._eventos.append(agora)
+
+    def contar(self, agora):
+        self._limpar(agora)
+        return len(self._eventos)
+
+    def libera_em(self, agora, maximo):
+        """
+        Segundos até a janela ter menos de `maximo` eventos (0 se já tem).
+        """
+        self._limpar(agora)
+        excesso = len(self._eventos) - maximo
+        if excesso < 0:
+            return 0.0
+        return max(self._eventos[excesso] + self.segundos - agora, 0.0)
+# endregion
+
+# region DETECÇÃO DE BLOQUEIO
+def indica_bloqueio(response):
+    """
+    True quando a resposta indica IP bloqueado pelo Bling, e não só limite por segundo/dia.
+    Decide pela estrutura do erro da API v3 ({"error": {"type", "message", "description"}}),
+    sem depender do texto da mensagem:
+      - 403 com objeto "error": o IP foi recusado
+      - 429 com objeto "error" sem "period": não é o limite por segundo nem o diário
+        (esses sempre informam error.period e ficam com a política de retry)
+    Corpos fora desse formato (ex.: HTML de proxy) não contam como bloqueio.
+    """
+    if response.status_code not in (403, 429):
+        return False
+    try:
+        corpo = response.json()
+    except ValueError:
+        return False
+    erro = corpo.get("error") if isinstance(corpo, dict) else None
+    if not isinstance(erro, dict):
+        return False
+    if response.status_code == 429:
+        return not erro.get("period")
+    return True
+# endregion
+
+# region CIRCUIT BREAKER
+class CircuitBreaker:
+    """
+    Protege o IP dos bloqueios do Bling, compartilhado por todas as threads do processo:
+    - 600 requisições ou 300 erros em 10s -> IP bloqueado por 10 min
+    - mais de 20 chamadas a /oauth/token em 60s -> IP bloqueado por 60 min
+    Antes de chegar a CB_MARGEM de cada limite, o circuito pausa as chamadas até a janela
+    esvaziar. Se um bloqueio for detectado mesmo assim, o circuito abre e todas as threads
+    aguardam o fim do bloqueio em vez de continuar batendo na API.
+    """
+
+    def __init__(
+        self,
+        janela=CB_JANELA_SEGUNDOS,
+        limite_requisicoes=CB_LIMITE_REQUISICOES,
+        limite_erros=CB_LIMITE_ERROS,
+        janela_token=CB_JANELA_TOKEN_SEGUNDOS,
+        limite_token=CB_LIMITE_TOKEN,
+        margem=CB_MARGEM,
+        espera_bloqueio_ip=CB_BLOQUEIO_IP_ESPERA,
+        espera_bloqueio_token=CB_BLOQUEIO_TOKEN_ESPERA,
+    ):
+        self._requisicoes = JanelaDeslizante(janela)
+        self._erros = JanelaDeslizante(janela)
+        self._token = JanelaDeslizante(janela_token)
+        # Pausa preventiva ao atingir a margem do limite (ex.: 0.8 * 300 erros)
+        self.max_requisicoes = max(1, int(limite_requisicoes * margem))
+        self.max_erros = max(1, int(limite_erros * margem))
+        self.max_token = max(1, int(limite_token * margem))
+        self.espera_bloqueio_ip = float(espera_bloqueio_ip)
+        self.espera_bloqueio_token = float(espera_bloqueio_token)
+        self._aberto_ate = 0.0  # time.monotonic() até quando o circuito fica aberto (bloqueio)
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.total_pausas = 0
+        self.tempo_pausado = 0.0
+        self.total_bloqueios = 0
+
+    def _aguardar(self, calcular_espera):
+        esperado = 0.0
+        while True:
+            with self._lock:
+                espera = calcular_espera(time.monotonic())
+                if espera <= 0:
+                    if esperado > 0:
+                        self.total_pausas += 1
+                        self.tempo_pausado += esperado
+                    return esperado
+            time.sleep(espera)
+            esperado += espera
+
+    def _espera_requisicao(self, agora):
+        return max(
+            self._aberto_ate - agora,
+            self._requisicoes.libera_em(agora, self.max_requisicoes),
+            self._erros.libera_em(agora, self.max_erros),
+        )
+
+    def _espera_token(self, agora):
+        return max(
+            self._aberto_ate - agora,
+            self._token.libera_em(agora, self.max_token),
+        )
+
+    def antes_requisicao(self):
+        """
+        Bloqueia enquanto o circuito estiver aberto ou a janela de 10s perto do limite;
+        então registra a requisição. Retorna o tempo (s) aguardado.
+        """
+        esperado = self._aguardar(self._espera_requisicao)
+        with self._lock:
+            self._requisicoes.registrar(time.monotonic())
+        return esperado
+
+    def antes_token(self):
+        """
+        Igual a antes_requisicao, para chamadas a /oauth/token (janela de 60s).
+        """
+        esperado = self._aguardar(self._espera_token)
+        with self._lock:
+            self._token.registrar(time.monotonic())
+        return esperado
+
+    def registrar_erro(self):
+        with self._lock:
+            self._erros.registrar(time.monotonic())
+
+    def registrar_resposta(self, response):
+        """
+        Conta a resposta como erro quando status >= 400 e abre o circuito se ela indicar bloqueio.
+        Retorna True quando um bloqueio foi detectado.
+        """
+        if response.status_code >= 400:
+            self.registrar_erro()
+        if indica_bloqueio(response):
+            self.abrir(self.espera_bloqueio_ip, f"bloqueio de IP detectado (HTTP {response.status_code})")
+            return True
+        return False
+
+    def abrir(self, segundos, motivo):
+        """
+        Abre o circuito por `segundos`: todas as threads aguardam em antes_requisicao/antes_token.
+        """
+        with self._lock:
+            fim = time.monotonic() + segundos
+            if fim <= self._aberto_ate:
+                return
+            self._aberto_ate = fim
+            self.total_bloqueios += 1
+        log_etl("CIRCUIT_BREAKER", "WARN", f"Circuito aberto por {int(segundos)}s: {motivo}")
+
+    def metricas(self) -> dict:
+        agora = time.monotonic()
+        with self._lock:
+            return {
+                "requisicoes_janela": self._requisicoes.contar(agora),
+                "erros_janela": self._erros.contar(agora),
+                "token_janela": self._token.contar(agora),
+                "pausas": self.total_pausas,
+                "tempo_pausado": round(self.tempo_pausado, 3),
+                "bloqueios": self.total_bloqueios,
+                "aberto_por": round(max(self._aberto_ate - agora, 0.0), 1),
+            }
+# endregion
+
+# region INSTÂNCIA DO PROCESSO
+_CIRCUIT_BREAKER = None
+_CIRCUIT_BREAKER_LOCK = threading.Lock()
+
+
+def obter_circuit_breaker() -> CircuitBreaker:
+    """
+    Retorna o circuit breaker do processo (os bloqueios do Bling são por IP, não por conta).
+    """
+    global _CIRCUIT_BREAKER
+    with _CIRCUIT_BREAKER_LOCK:
+        if _CIRCUIT_BREAKER is None:
+            _CIRCUIT_BREAKER = CircuitBreaker()
+        return _CIRCUIT_BREAKER
+# endregion
@@ -0,0 +1,205 @@
+# region IMPORTS
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from psycopg2 import pool as pg_pool
+from src.config import (
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    DB_POOL_TIMEOUT,
+    DB_POOL_LIMITE_VAZAMENTO,
+)
+# endregion
+
+# region POOL DE CONEXÕES (POR db_uri)
+class PoolConexoes:
+    """
+    Pool de conexões Postgres compartilhado pelo processo (thread-safe).
+    - Espera até `timeout` segundos por uma conexão livre quando o pool está esgotado.
+    - Registra quem pegou cada conexão para detectar vazamentos (conexões não devolvidas).
+    """
+
+    def __init__(self, db_uri, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, db_uri)
+        self._vagas = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._emprestadas = {}  # id(conn) -> (momento, pilha de chamada)
+
+        # Métricas
+        self.total_emprestimos = 0
+        self.total_esperas = 0
+        self.tempo_espera_total = 0.0
+        self.tempo_espera_max = 0.0
+
+    def emprestar(self):
+        inicio = time.monotonic()
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError(
+                f"Nenhuma conexão livre no pool após {self.timeout}s (max={self.maxconn})."
+            )
+        espera = time.monotonic() - inicio
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._vagas.release()
+            raise
+
+        with self._lock:
+            self.total_emprestimos += 1
+            if espera > 0.001:
+                self.total_esperas += 1
+                self.tempo_espera_total += espera
+                self.tempo_espera_max = max(self.tempo_espera_max, espera)
+            self._emprestadas[id(conn)] = (time.monotonic(), "".join(traceback.format_stack(limit=6)[:-2]))
+        return conn
+
+    def devolver(self, conn):
+        with self._lock:
+            self._emprestadas.pop(id(conn), None)
+        try:
+            descartar = bool(conn.closed)
+            if not descartar:
+                try:
+                    conn.autocommit = False
+                except Exception:
+                    descartar = True  # conexão em estado inválido: não volta ao pool
+            self._pool.putconn(conn, close=descartar)
+        finally:
+            self._vagas.release()
+
+    def verificar_vazamentos(self, limite_segundos=DB_POOL_LIMITE_VAZAMENTO):
+        """
+        Retorna as conexões emprestadas há mais de `limite_segundos` (com a pilha de quem pegou).
+        """
+        agora = time.monotonic()
+        with self._lock:
+            return [
+                {"segundos": round(agora - momento, 1), "origem": pilha}
+                for momento, pilha in self._emprestadas.values()
+                if agora - momento > limite_segundos
+            ]
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "tamanho_max": self.maxconn,
+                "em_uso": len(self._emprestadas),
+                "emprestimos": self.total_emprestimos,
+                "esperas": self.total_esperas,
+                "tempo_espera_total": round(self.tempo_espera_total, 3),
+                "tempo_espera_max": round(self.tempo_espera_max, 3),
+            }
+
+    def fechar(self):
+        self._pool.closeall()
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def obter_pool(db_uri) -> PoolConexoes:
+    """
+    Retorna o pool do processo para o db_uri, criando-o na primeira chamada.
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.get(db_uri)
+        if pool is None:
+            pool = PoolConexoes(db_uri)
+            _POOLS[db_uri] = pool
+        return pool
+
+
+@contextmanager
+def conexao(db_uri, autocommit=False):
+    """
+    Empresta uma conexão do pool; faz commit ao final (ou rollback em erro) e devolve ao pool.
+    Uso: with conexao(db_uri) as conn: ...
+    """
+    pool = obter_pool(db_uri)
+    conn = pool.emprestar()
+    try:
+        conn.autocommit = autocommit
+        yield conn
+        if not autocommit:
+            conn.commit()
+    except Exception:
+        if not conn.closed and not autocommit:
+            conn.rollback()
+        raise
+    finally:
+        pool.devolver(conn)
+
+
+def fechar_pools():
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.fechar()
+        _POOLS.clear()
+# endregion
+
+# region MIGRAÇÕES DE ESQUEMA (UMA VEZ POR PROCESSO)
+_DDL_GARANTIDAS = set()
+_DDL_LOCK = threading.Lock()
+
+
+def garantir_ddl(db_uri, chave, sql):
+    """
+    Executa `sql` (DDL idempotente, com IF NOT EXISTS) uma única vez por processo para `chave`.
+    Roda em transação própria, já confirmada ao retornar: o lock da DDL não fica preso à
+    transação de quem chamou. Thread-safe: etapas paralelas não disparam a mesma DDL juntas.
+    """
+    with _DDL_LOCK:
+        if chave in _DDL_GARANTIDAS:
+            return
+        with conexao(db_uri) as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+        _DDL_GARANTIDAS.add(chave)
+
+
+def garantir_colunas(db_uri, tabela, colunas):
+    """
+    Cria em `tabela` ("schema.nome") as colunas de `colunas` ({nome: tipo}) que ainda não existem
+    (bases anteriores a elas), uma vez por processo.
+    Consulta o catálogo antes: o ALTER TABLE (lock ACCESS EXCLUSIVE na tabela) só roda
+    quando falta alguma coluna, e não a cada execução.
+    """
+    chave = (tabela, tuple(colunas))
+    with _DDL_LOCK:
+        if chave in _DDL_GARANTIDAS:
+            return
+        schema, nome = tabela.split(".")
+        with conexao(db_uri) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT column_name
+                      FROM information_schema.columns
+                     WHERE table_schema = %s
+                       AND table_name = %s
+                """, (schema, nome))
+                existentes = {row[0] for row in cur.fetchall()}
+                faltando = [c for c in colunas if c not in existentes]
+                if faltando:
+                    cur.execute(
+                        f"ALTER TABLE {tabela} "
+                        + ", ".join(f"ADD COLUMN IF NOT EXISTS {c} {colunas[c]}" for c in faltando)
+                    )
+        _DDL_GARANTIDAS.add(chave)
+# endregion
+
+# region MÉTRICAS / VAZAMENTOS
+def registrar_metricas_pool(db_uri):
+    """
+    Loga as métricas do pool e eventuais vazamentos (conexões não devolvidas).
+    """
+    from src.log import log_etl  # import tardio: src.log também usa este módulo
+
+    pool = obter_pool(db_uri)
+    log_etl("POOL_DB", "INFO", f"Métricas do pool: {pool.metricas()}")
+    for vazamento in pool.verificar_vazamentos():
+        log_etl("POOL_DB", "WARN", f"Conexão emprestada há {vazamento['segundos']}s", erro=vazamento["origem"])
+# endregion
@@ -1,4 +1,5 @@
 # region IMPORTS
+import os
 from datetime import datetime, timedelta
 # endregion
 
@@ -11,6 +12,17 @@ BLING_FULL_FIM=datetime(2023,5,31)
 DATA_FULL_INICIAL = datetime(2020, 1, 1)
 MARGEM_DIAS_INCREMENTO = 3
 
+# Incremental por watermark (pedidos, contatos): a próxima janela começa no dia da maior data de
+# alteração já carregada menos esta sobreposição. Os filtros da API só aceitam data (YYYY-MM-DD),
+# por isso a sobreposição é em dias. Sem watermark registrado, vale MARGEM_DIAS_INCREMENTO.
+WATERMARK_SOBREPOSICAO_DIAS = 1
+# Campos de data de alteração procurados no detalhe da API (o primeiro presente é usado).
+# Se nenhum vier no payload, o watermark passa a ser o fim da janela carregada com sucesso.
+WATERMARK_CAMPOS = {
+    "pedido_venda": ("dataAlteracao", "dataUltimaAlteracao"),
+    "contato": ("dataAlteracao", "dataUltimaAlteracao"),
+}
+
 RODAR_PIPELINE_CARGA_COMPLETA = True
 
 RODAR_EMPRESA = True
@@ -27,6 +39,10 @@ RODAR_CONTATO = True
 REPROCESSAR_CONTATO_MANUAL=True
 RODAR_PRODUTO_ESTRUTURA = True
 
+# Retoma cargas paginadas interrompidas (pedidos, contatos) a partir do checkpoint salvo em
+# conf.controle_carga (janela + última página concluída). False = sempre recomeça da página inicial.
+RETOMAR_CARGA = True
+
 
 # endregion
 
@@ -39,6 +55,186 @@ REPROCESSAR_SALDO_MANUAL = True
 REPROCESSAR_PEDIDOS_VENDAS_MANUAL = True
 
 
+# endregion
+
+# region ============= LIMITES DA API =============
+
+# Token bucket por conta Bling: "taxa" = requisições/s repostas, "burst" = rajada máxima.
+# Burst acima de 1 pode estourar a janela de 1s do Bling (3 req/s), gerando 429.
+API_RATE_LIMITS = {
+    "default": {"taxa": 3, "burst": 1},
+}
+
+# Pool HTTP (requests.Session) compartilhado pelos métodos do BlingAPI
+HTTP_POOL_CONEXOES = 4     # pools por host mantidos em cache
+HTTP_POOL_MAXSIZE = 10     # conexões keep-alive reaproveitáveis por host
+HTTP_TIMEOUT = 60          # segundos
+
+# Requisições simultâneas em voo (threads de detalhe do extrator). O limite de 3 req/s continua
+# garantido pelo token bucket; a concorrência só evita que a latência limite a vazão.
+API_MAX_CONCORRENCIA = 6
+
+# Quantidade de IDs enviados em idsProdutos[] por chamada a estoques/saldos.
+# Em caso de erro, o lote é dividido ao meio até isolar o(s) ID(s) problemático(s).
+SALDO_IDS_POR_REQUISICAO = 100
+
+# Origem da lista de IDs de produto compartilhada entre as etapas (listada uma vez por execução):
+# "stg" = lê stg.produto_bling (sem custo de API; cai para "api" se a tabela estiver vazia)
+# "api" = pagina /produtos sem filtro
+ORIGEM_IDS_PRODUTO = "stg"
+
+# Janelas de data para cargas paginadas longas (pedidos, contatos):
+# - o Bling devolve HTTP 400 para filtros de data acima de 1 ano -> a faixa é dividida em janelas de até JANELA_MAX_DIAS
+# - janela com mais de JANELA_MAX_PAGINAS páginas (sondado pedindo a página seguinte) é dividida ao meio
+# - até JANELAS_PARALELAS janelas são extraídas ao mesmo tempo (mesmo token bucket)
+JANELA_MAX_DIAS = 365
+JANELA_MAX_PAGINAS = 100
+JANELAS_PARALELAS = 2
+
+# Retry em HTTP 429 (BlingAPI.get): backoff exponencial base * 2^(n-1) limitado a RETRY_BACKOFF_MAX,
+# nunca abaixo do Retry-After, mais jitter aleatório de até RETRY_JITTER * espera.
+# Durante a espera, o token bucket da conta fica pausado (todas as threads aguardam juntas).
+# 429 com period = dia (cota diária) não é retentado: levanta CotaDiariaEsgotada e bloqueia
+# novas chamadas por Retry-After ou RETRY_COTA_DIARIA_ESPERA segundos.
+RETRY_429_MAX_TENTATIVAS = 6
+RETRY_BACKOFF_BASE = 1.0       # segundos
+RETRY_BACKOFF_MAX = 30.0       # segundos
+RETRY_JITTER = 0.5
+RETRY_COTA_DIARIA_ESPERA = 3600
+
+# Cota diária de requisições (Bling: 120.000/dia por conta), contabilizada em conf.cota_api
+# somando todas as execuções do dia. Recurso = até dois segmentos do endpoint (ex.: "pedidos/vendas").
+# - COTA_RESERVAS: requisições guardadas para recursos críticos; os demais só usam o que sobra
+# - etapas de prioridade "baixa" cuja estimativa não cabe no disponível são adiadas pelo DAG
+# - estimativa sem planejador próprio = média dos últimos COTA_DIAS_HISTORICO dias do recurso
+COTA_DIARIA_LIMITE = 118000      # folga para reprocessamentos manuais
+COTA_RESERVAS = {
+    "pedidos/vendas": 20000,
+}
+COTA_FLUSH_REQUISICOES = 200     # requisições acumuladas em memória antes de gravar no banco
+COTA_DIAS_HISTORICO = 7
+
+# Circuit breaker de bloqueio de IP (limites documentados pelo Bling):
+# 600 requisições ou 300 erros em 10s -> IP bloqueado por 10 min; > 20 chamadas a /oauth/token em 60s -> 60 min.
+# Ao atingir CB_MARGEM de um limite, todas as threads pausam até a janela esvaziar.
+# Bloqueio detectado (403 com erro estruturado, ou 429 sem error.period) abre o circuito pelo tempo do bloqueio.
+CB_JANELA_SEGUNDOS = 10
+CB_LIMITE_REQUISICOES = 600
+CB_LIMITE_ERROS = 300
+CB_JANELA_TOKEN_SEGUNDOS = 60
+CB_LIMITE_TOKEN = 20
+CB_MARGEM = 0.8
+CB_BLOQUEIO_IP_ESPERA = 600      # segundos
+CB_BLOQUEIO_TOKEN_ESPERA = 3600  # segundos
+
+# endregion
+
+# region ============= ORQUESTRADOR (DAG) =============
+
+# Etapas independentes executadas ao mesmo tempo pelo orquestrador do main.py.
+# Todas dividem o mesmo token bucket (API) e o mesmo pool do Postgres (DB_POOL_MAX).
+ORQUESTRADOR_MAX_PARALELO = 3
+
+# endregion
+
+# region ============= POOL DE CONEXÕES (POSTGRES) =============
+
+DB_POOL_MIN = 1
+DB_POOL_MAX = 8                  # >= threads que gravam em paralelo
+DB_POOL_TIMEOUT = 30             # segundos aguardando conexão livre
+DB_POOL_LIMITE_VAZAMENTO = 300   # conexão emprestada há mais que isso (s) é reportada como vazamento
+
+# endregion
+
+# region ============= MODO DE CARGA NA STAGE =============
+
+# "values" = execute_values (padrão) | "copy" = COPY FROM STDIN em tabela temporária + merge
+# Entidades fora do dicionário usam "values".
+MODO_CARGA_STG = {
+    "pedido_venda": "values",
+    "contato": "values",
+}
+
+# Tamanho do lote quando a entidade usa COPY (cada lote = 1 COPY + 1 INSERT ... SELECT)
+COPY_BATCH_SIZE = 5000
+
+# endregion
+
+# region ============= PIPELINE (EXTRAÇÃO -> TRANSFORMAÇÃO -> CARGA) =============
+
+# Itens em trânsito entre estágios (páginas de detalhes / lotes para o banco).
+# Fila cheia = backpressure: a API para de buscar até o banco alcançar.
+PIPELINE_TAMANHO_FILA = 4
+
+# endregion
+
+# region ============= ZONA BRUTA (PAYLOADS DA API EM DISCO) =============
+
+# Payloads da API gravados antes do map_* em JSONL comprimido (append-only), particionado por
+# entidade / dia da extração / janela, com índice por id_bling (indice.sqlite3 no diretório).
+# Permite reprocessar transformações a partir do disco, sem gastar cota da API.
+# RAW_COMPRESSAO: "auto" (zstd se o pacote zstandard estiver instalado, senão gzip) | "gzip" | "zstd"
+RAW_ATIVO = True
+RAW_DIR = os.getenv("BLING_RAW_DIR", os.path.join("dados", "bruto"))
+RAW_COMPRESSAO = "auto"
+
+# Replay (replay.py): reconstrói as tabelas stg.* a partir da zona bruta, sem API.
+# O map_* roda em REPLAY_PROCESSOS processos; 1 = tudo no processo atual.
+REPLAY_PROCESSOS = max(1, min(4, (os.cpu_count() or 1) - 1))
+REPLAY_TAMANHO_LOTE = 1000       # linhas da zona bruta por lote (mapeamento + upsert)
+
+# endregion
+
+# region ============= API FAKE (BENCHMARK LOCAL) =============
+
+# Servidor local que imita a API v3 do Bling (fake_bling.py / src/fake_bling.py), com dados
+# sintéticos e os mesmos limites da API real. Para apontar a carga para ele:
+#   BLING_API_URL=http://127.0.0.1:8765/Api/v3  e  TOKEN_URL=http://127.0.0.1:8765/Api/v3/oauth/token
+FAKE_HOST = "127.0.0.1"
+FAKE_PORTA = 8765
+FAKE_SEMENTE = 42                 # mesma semente = mesmos dados (benchmarks reprodutíveis)
+FAKE_DIAS_HISTORICO = 730         # datas de inclusão/alteração espalhadas nos últimos N dias
+
+# Quantidade de registros sintéticos por recurso
+FAKE_VOLUME = {
+    "produtos": 2000,
+    "pedidos": 5000,
+    "contatos": 1500,
+    "vendedores": 20,
+    "depositos": 3,
+    "categorias_produto": 30,
+    "grupos_produto": 15,
+    "canais_venda": 5,
+    "categorias_receita_despesa": 40,
+}
+
+# Latência simulada por resposta (ms): LATENCIA +- JITTER
+FAKE_LATENCIA_MS = 80
+FAKE_LATENCIA_JITTER_MS = 40
+
+# Limites aplicados pelo servidor (valores da API real; reduzir os bloqueios para testes rápidos)
+FAKE_LIMITE_SEGUNDO = 3           # requisições por segundo -> 429 (period = second)
+FAKE_LIMITE_DIARIO = 120000       # requisições por dia -> 429 (period = day)
+FAKE_BLOQUEIO_IP_ESPERA = 600     # 600 requisições ou 300 erros em 10s -> 403 por N segundos
+FAKE_BLOQUEIO_TOKEN_ESPERA = 3600 # mais de 20 chamadas a /oauth/token em 60s -> bloqueio por N segundos
+FAKE_TOKEN_EXPIRA = 21600         # validade (s) do access_token emitido
+
+# endregion
+
+# region ============= BENCHMARK DE PONTA A PONTA =============
+
+# benchmark.py: roda as etapas do main.py contra a API fake e um banco descartável
+# (criado com o schema do POSTGRES_URI e apagado ao final) e grava as métricas em JSON.
+BENCH_ESCALA = 0.05               # fração de FAKE_VOLUME (respeitando 3 req/s, 0.05 leva poucos minutos)
+BENCH_DIR = os.path.join("dados", "benchmark")
+BENCH_AMOSTRA_RSS = 0.05          # intervalo (s) da amostragem de memória (pico de RSS por etapa)
+
+# benchmark_transformers.py: micro-benchmark dos map_* e do parse_date_safe sobre payloads gravados
+# em BENCH_FIXTURES_DIR (ou na zona bruta, com --zona-bruta)
+BENCH_FIXTURES_DIR = "fixtures"
+BENCH_MICRO_REPETICOES = 7        # repetições de cada caso (cada uma com >= 0.2s de chamadas)
+BENCH_MICRO_LIMITE_BRUTO = 200    # payloads lidos por entidade com --zona-bruta
+
 # endregion
 
 # region ============= DEBUGAR =============
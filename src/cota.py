@@ -0,0 +1,249 @@
+# region IMPORTS
+import threading
+from datetime import date, datetime, timedelta
+from src.config import (
+    COTA_DIARIA_LIMITE,
+    COTA_RESERVAS,
+    COTA_FLUSH_REQUISICOES,
+    COTA_DIAS_HISTORICO,
+)
+from src.conexao import conexao, garantir_ddl
+from src.log import log_etl
+from src.retry import CotaDiariaEsgotada
+# endregion
+
+# region TABELA conf.cota_api
+def _garantir_tabela_cota(db_uri):
+    """
+    Cria (uma vez por processo) conf.cota_api: requisições enviadas por conta, dia e recurso.
+    """
+    garantir_ddl(db_uri, "conf.cota_api", """
+        CREATE TABLE IF NOT EXISTS conf.cota_api (
+            conta          VARCHAR(50)  NOT NULL,
+            dia            DATE         NOT NULL,
+            recurso        VARCHAR(100) NOT NULL,
+            requisicoes    INTEGER      NOT NULL DEFAULT 0,
+            atualizado_em  TIMESTAMP,
+            PRIMARY KEY (conta, dia, recurso)
+        )
+    """)
+
+
+def recurso_do_endpoint(endpoint):
+    """
+    Agrupa endpoints por recurso para a contabilidade da cota: até os dois primeiros
+    segmentos não numéricos (ex.: "pedidos/vendas/123" -> "pedidos/vendas", "produtos/987" -> "produtos").
+    """
+    partes = []
+    for parte in endpoint.strip("/").split("/")[:2]:
+        if not parte or parte.isdigit():
+            break
+        partes.append(parte)
+    return "/".join(partes) or endpoint
+# endregion
+
+# region LIVRO-CAIXA DA COTA DIÁRIA
+class CotaDiaria:
+    """
+    Contabiliza as requisições da conta no dia (limite do Bling: 120.000/dia) em conf.cota_api,
+    somando todas as execuções do dia.
+    - registrar(endpoint): chamado pelo BlingAPI a cada requisição enviada; o contador local
+      vai ao banco a cada flush_a_cada requisições (e em flush())
+    - reservas {recurso: requisições}: parte da cota guardada para um recurso (ex.: pedidos);
+      os demais recursos só usam o que sobra além das reservas ainda não consumidas
+    - permitir(endpoint): levanta CotaDiariaEsgotada antes de enviar uma requisição que invadiria
+      a cota (ou a reserva de outro recurso)
+    - avaliar_etapa(...): planejamento antes de uma etapa começar; etapas de prioridade "baixa"
+      cuja estimativa não cabe no disponível são adiadas
+    Thread-safe.
+    """
+
+    def __init__(self, db_uri, conta="default", limite=COTA_DIARIA_LIMITE, reservas=None, flush_a_cada=COTA_FLUSH_REQUISICOES):
+        self.db_uri = db_uri
+        self.conta = conta
+        self.limite = int(limite)
+        self.reservas = dict(COTA_RESERVAS if reservas is None else reservas)
+        self.flush_a_cada = max(1, int(flush_a_cada))
+        self._dia = None
+        self._usado = {}  # recurso -> requisições no dia (banco + locais)
+        self._pendente = {}  # recurso -> requisições locais ainda não gravadas
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.carregar()
+
+    def carregar(self):
+        """
+        Lê do banco o consumo do dia (de todas as execuções) e soma as pendências locais.
+        """
+        hoje = date.today()
+        _garantir_tabela_cota(self.db_uri)
+        with conexao(self.db_uri) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT recurso, requisicoes
+                      FROM conf.cota_api
+                     WHERE conta = %s
+                       AND dia = %s
+                """, (self.conta, hoje))
+                usado = {recurso: qtd for recurso, qtd in cur.fetchall()}
+        with self._lock:
+            if self._dia != hoje:
+                self._pendente = {}
+            self._dia = hoje
+            for recurso, qtd in self._pendente.items():
+                usado[recurso] = usado.get(recurso, 0) + qtd
+            self._usado = usado
+
+    def flush(self):
+        """
+        Grava as requisições locais pendentes em conf.cota_api (soma atômica no ON CONFLICT)
+        e relê o consumo do dia, que inclui outras execuções em paralelo.
+        """
+        with self._flush_lock:
+            with self._lock:
+                dia, pendente = self._dia, self._pendente
+                self._pendente = {}
+            if pendente:
+                try:
+                    _garantir_tabela_cota(self.db_uri)
+                    with conexao(self.db_uri) as conn:
+                        with conn.cursor() as cur:
+                            for recurso, qtd in pendente.items():
+                                cur.execute("""
+                                    INSERT INTO conf.cota_api (conta, dia, recurso, requisicoes, atualizado_em)
+                                    VALUES (%s, %s, %s, %s, %s)
+                                    ON CONFLICT (conta, dia, recurso) DO UPDATE
+                                       SET requisicoes = conf.cota_api.requisicoes + EXCLUDED.requisicoes,
+                                           atualizado_em = EXCLUDED.atualizado_em
+                                """, (self.conta, dia, recurso, qtd, datetime.now()))
+                except Exception:
+                    with self._lock:
+                        if self._dia == dia:  # devolve as pendências para o próximo flush
+                            for recurso, qtd in pendente.items():
+                                self._pendente[recurso] = self._pendente.get(recurso, 0) + qtd
+                    raise
+            self.carregar()
+
+    def media_historica(self, recurso, dias=COTA_DIAS_HISTORICO):
+        """
+        Média diária de requisições do recurso nos últimos `dias` dias com consumo (sem hoje).
+        Estimativa padrão de custo de uma etapa. None quando não há histórico.
+        """
+        hoje = date.today()
+        _garantir_tabela_cota(self.db_uri)
+        with conexao(self.db_uri) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT AVG(requisicoes)
+                      FROM conf.cota_api
+                     WHERE conta = %s
+                       AND recurso = %s
+                       AND dia >= %s
+                       AND dia < %s
+                """, (self.conta, recurso, hoje - timedelta(days=dias), hoje))
+                media = cur.fetchone()[0]
+        return int(round(media)) if media is not None else None
+
+    def _virar_dia(self):
+        if self._dia != date.today():
+            self.flush()  # grava as pendências no dia em que ocorreram e recomeça o contador
+
+    def _reservado_para_outros(self, recurso):
+        # Parte das reservas dos outros recursos que ainda não foi consumida
+        return sum(
+            max(qtd - self._usado.get(r, 0), 0)
+            for r, qtd in self.reservas.items()
+            if r != recurso
+        )
+
+    def usado(self, recurso=None):
+        with self._lock:
+            if recurso is None:
+                return sum(self._usado.values())
+            return self._usado.get(recurso, 0)
+
+    def disponivel(self, recurso=None):
+        """
+        Requisições que o recurso ainda pode gastar hoje: limite - consumo total - reservas
+        não consumidas dos outros recursos. Sem recurso, desconta todas as reservas pendentes.
+        """
+        with self._lock:
+            return max(self.limite - sum(self._usado.values()) - self._reservado_para_outros(recurso), 0)
+
+    def permitir(self, endpoint):
+        """
+        Levanta CotaDiariaEsgotada se a próxima requisição do endpoint invadir a cota local.
+        """
+        self._virar_dia()
+        recurso = recurso_do_endpoint(endpoint)
+        if self.disponivel(recurso) <= 0:
+            raise CotaDiariaEsgotada(
+                f"Cota diária local esgotada para {recurso} "
+                f"(usado {self.usado()} de {self.limite}, reservas: {self.reservas})"
+            )
+
+    def registrar(self, endpoint, quantidade=1):
+        """
+        Contabiliza requisições enviadas ao endpoint.
+        Falha ao gravar o contador não interrompe a requisição que já foi feita: as pendências
+        voltam para o contador local (flush) e são gravadas no próximo flush.
+        """
+        recurso = recurso_do_endpoint(endpoint)
+        with self._lock:
+            self._usado[recurso] = self._usado.get(recurso, 0) + quantidade
+            self._pendente[recurso] = self._pendente.get(recurso, 0) + quantidade
+            gravar = sum(self._pendente.values()) >= self.flush_a_cada
+        if gravar:
+            try:
+                self.flush()
+            except Exception as erro:
+                log_etl("COTA", "WARN", "Falha ao gravar a cota em conf.cota_api; nova tentativa no próximo flush", erro=str(erro))
+
+    def avaliar_etapa(self, etapa, recurso, estimativa=None, prioridade="normal"):
+        """
+        Compara a estimativa de requisições da etapa com o disponível para o recurso.
+        Sem estimativa, usa a média histórica do recurso.
+        Retorna False (adiar) só para prioridade "baixa" que não cabe; as demais seguem com aviso.
+        """
+        if estimativa is None:
+            estimativa = self.media_historica(recurso)
+        disponivel = self.disponivel(recurso)
+        if estimativa is None:
+            log_etl(etapa, "COTA", f"Sem estimativa para {recurso}; disponível hoje: {disponivel} requisições")
+            return True
+        if estimativa <= disponivel:
+            log_etl(etapa, "COTA", f"Estimativa de {estimativa} requisições ({recurso}); disponível: {disponivel}")
+            return True
+        if prioridade == "baixa":
+            log_etl(etapa, "ADIADA", f"Estimativa de {estimativa} requisições excede o disponível ({disponivel}); etapa adiada")
+            return False
+        log_etl(etapa, "WARN", f"Estimativa de {estimativa} requisições excede o disponível ({disponivel}); executando (prioridade {prioridade})")
+        return True
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "dia": str(self._dia),
+                "limite": self.limite,
+                "usado": sum(self._usado.values()),
+                "por_recurso": dict(self._usado),
+                "reservas_pendentes": self._reservado_para_outros(None),
+            }
+# endregion
+
+# region REGISTRO POR CONTA
+_COTAS = {}
+_COTAS_LOCK = threading.Lock()
+
+
+def obter_cota_diaria(db_uri, conta: str = "default") -> CotaDiaria:
+    """
+    Retorna o livro-caixa da cota da conta (um por processo), carregando o consumo do dia.
+    """
+    with _COTAS_LOCK:
+        cota = _COTAS.get(conta)
+        if cota is None:
+            cota = CotaDiaria(db_uri, conta=conta)
+            _COTAS[conta] = cota
+        return cota
+# endregion
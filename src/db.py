@@ -5,37 +5,410 @@ import json
  #endregion
 
 # region IMPORTS E CONFIGS
+import io
+import threading
+import time
 import psycopg2
-from psycopg2.extras import execute_batch
-from datetime import datetime
-from src.config import DEBUG  
+import psycopg2.extras
+from dataclasses import dataclass
+from functools import cached_property
+from operator import itemgetter
+from datetime import date, datetime
+from decimal import Decimal
+from src.config import DEBUG, MODO_CARGA_STG, COPY_BATCH_SIZE
+from src.conexao import conexao, garantir_colunas
 from src.log import (log_etl,)
 # endregion
 
+# region CARGA VIA COPY (TEMP TABLE + MERGE)
+def modo_carga(entidade):
+    """
+    Retorna o modo de carga configurado para a entidade ("values" ou "copy").
+    """
+    return MODO_CARGA_STG.get(entidade, "values")
+
+
+def _valor_copy(v):
+    # Serializa um valor no formato texto do COPY (NULL = \N; escapa \, tab e quebras de linha)
+    if v is None:
+        return "\\N"
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    if isinstance(v, (datetime, date)):
+        txt = v.isoformat()
+    elif isinstance(v, (dict, list)):
+        txt = json.dumps(v, ensure_ascii=False)
+    elif isinstance(v, psycopg2.extras.Json):
+        txt = json.dumps(v.adapted, ensure_ascii=False)
+    elif isinstance(v, (int, float, Decimal)):
+        return str(v)
+    else:
+        txt = str(v)
+    return (
+        txt.replace("\\", "\\\\")
+           .replace("\t", "\\t")
+           .replace("\n", "\\n")
+           .replace("\r", "\\r")
+    )
+
+
+def copy_upsert(cur, tabela, colunas, chave, linhas, sql_conflito):
+    """
+    Carrega `linhas` (tuplas na ordem de `colunas`) com COPY FROM STDIN numa tabela temporária
+    e faz o merge na tabela destino com um único INSERT ... SELECT ... ON CONFLICT.
+    - chave: colunas do ON CONFLICT (duplicadas no lote: vale a última ocorrência)
+    - sql_conflito: cláusula "ON CONFLICT (...) DO UPDATE SET ..." do upsert tradicional
+    Retorna a quantidade de linhas afetadas pelo merge.
+    """
+    if not linhas:
+        return 0
+
+    idx_chave = [colunas.index(c) for c in chave]
+    unicas = {tuple(l[i] for i in idx_chave): l for l in linhas}
+
+    temp = "tmp_copy_" + tabela.split(".")[-1]
+    lista_colunas = ", ".join(colunas)
+    # ON COMMIT DROP: a temporária vive só na transação. Conexões do pool são reaproveitadas,
+    # e uma temporária de sessão manteria o layout antigo da tabela (ex.: antes de uma coluna nova).
+    # Lotes da mesma transação reaproveitam a tabela (IF NOT EXISTS + TRUNCATE).
+    cur.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {temp} (LIKE {tabela} INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    cur.execute(f"TRUNCATE {temp}")
+
+    buf = io.StringIO()
+    for linha in unicas.values():
+        buf.write("\t".join(_valor_copy(v) for v in linha))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY {temp} ({lista_colunas}) FROM STDIN", buf)
+
+    cur.execute(
+        f"INSERT INTO {tabela} ({lista_colunas}) SELECT {lista_colunas} FROM {temp} {sql_conflito}"
+    )
+    return cur.rowcount
+# endregion
+
+# region SPEC DECLARATIVO DE ENTIDADE
+@dataclass(frozen=True)
+class EntidadeSpec:
+    """
+    Descreve o upsert de uma tabela stg.* e gera, uma única vez, o SQL e o extrator de linhas.
+    - colunas: colunas lidas do dict mapeado (ordem do INSERT)
+    - chave: colunas do ON CONFLICT
+    - colunas_json: colunas serializadas com json.dumps
+    - colunas_agora: colunas preenchidas com o timestamp da carga (não vêm do dict)
+    - preservar: colunas que NÃO são atualizadas no conflito (ex.: dt_carga)
+    - atualizar_agora: colunas fora do INSERT que recebem CURRENT_TIMESTAMP no conflito
+    - entidade: chave em MODO_CARGA_STG ("values"/"copy")
+    - coluna_hash: coluna com o hash do conteúdo; quando informada, o conflito só
+      reescreve a linha se o hash mudou (linhas iguais são ignoradas)
+    """
+    tabela: str
+    chave: tuple
+    colunas: tuple
+    colunas_json: tuple = ()
+    colunas_agora: tuple = ()
+    preservar: tuple = ()
+    atualizar_agora: tuple = ()
+    entidade: str = ""
+    label: str = ""
+    batch_size: int = 1000
+    commit_por_lote: bool = False
+    coluna_hash: str = ""
+
+    @cached_property
+    def colunas_insert(self):
+        return self.colunas + self.colunas_agora
+
+    @cached_property
+    def sql_conflito(self):
+        sets = [
+            f"{c} = EXCLUDED.{c}"
+            for c in self.colunas_insert
+            if c not in self.chave and c not in self.preservar
+        ]
+        sets += [f"{c} = CURRENT_TIMESTAMP" for c in self.atualizar_agora]
+        sql = f"ON CONFLICT ({', '.join(self.chave)}) DO UPDATE SET " + ", ".join(sets)
+        if self.coluna_hash:
+            h = self.coluna_hash
+            sql += f" WHERE {self.tabela}.{h} IS DISTINCT FROM EXCLUDED.{h}"
+        return sql
+
+    @cached_property
+    def sql_values(self):
+        return f"INSERT INTO {self.tabela} ({', '.join(self.colunas_insert)}) VALUES %s {self.sql_conflito}"
+
+    @cached_property
+    def extrator(self):
+        """
+        Função (registro, agora) -> tupla na ordem de colunas_insert.
+        """
+        pegar = itemgetter(*self.colunas)
+        idx_json = [self.colunas.index(c) for c in self.colunas_json]
+        extra = len(self.colunas_agora)
+
+        if len(self.colunas) == 1:
+            base = lambda r: (pegar(r),)
+        else:
+            base = pegar
+
+        if not idx_json:
+            return lambda r, agora: base(r) + (agora,) * extra
+
+        def extrair(r, agora):
+            linha = list(base(r))
+            for i in idx_json:
+                linha[i] = json.dumps(linha[i])
+            return tuple(linha) + (agora,) * extra
+        return extrair
+
+
+_ESTATISTICAS_UPSERT = {}
+_ESTATISTICAS_LOCK = threading.Lock()
+
+
+def _acumular_estatisticas(label, enviados, gravados, tempo=0.0):
+    with _ESTATISTICAS_LOCK:
+        est = _ESTATISTICAS_UPSERT.setdefault(label, {"enviados": 0, "gravados": 0, "tempo": 0.0})
+        est["enviados"] += enviados
+        est["gravados"] += gravados
+        est["tempo"] += tempo
+
+
+def get_estatisticas_upsert(label):
+    """
+    Totais acumulados no processo para a entidade: enviados, gravados, ignorados (sem alteração)
+    e tempo (s) gasto no banco pelo upsert.
+    """
+    with _ESTATISTICAS_LOCK:
+        est = dict(_ESTATISTICAS_UPSERT.get(label, {"enviados": 0, "gravados": 0, "tempo": 0.0}))
+    est["ignorados"] = est["enviados"] - est["gravados"]
+    est["tempo"] = round(est["tempo"], 3)
+    return est
+
+
+def listar_estatisticas_upsert():
+    """
+    {label: get_estatisticas_upsert(label)} de todas as entidades gravadas no processo.
+    """
+    with _ESTATISTICAS_LOCK:
+        labels = list(_ESTATISTICAS_UPSERT)
+    return {label: get_estatisticas_upsert(label) for label in labels}
+
+
+def upsert_entidade(db_uri, spec, registros, batch_size=None, modo=None):
+    """
+    Upsert genérico a partir de um EntidadeSpec.
+    modo: "values" (execute_values) ou "copy" (COPY + merge); padrão em MODO_CARGA_STG.
+    Retorna a quantidade de linhas efetivamente gravadas (inseridas ou alteradas);
+    com coluna_hash, linhas sem alteração não contam.
+    """
+    if not registros:
+        return 0
+
+    usar_copy = (modo or modo_carga(spec.entidade)) == "copy"
+    batch_size = batch_size or spec.batch_size
+    if usar_copy:
+        batch_size = max(batch_size, COPY_BATCH_SIZE)
+
+    extrair = spec.extrator
+    agora = datetime.now()
+
+    label = spec.label or spec.tabela
+    gravados = 0
+    inicio = time.perf_counter()
+
+    if spec.coluna_hash:
+        # Bases anteriores à coluna de hash (migração em docs/db/tabelas.md)
+        garantir_colunas(db_uri, spec.tabela, {spec.coluna_hash: "TEXT"})
+
+    with conexao(db_uri) as conn:
+        with conn.cursor() as cur:
+            total = len(registros)
+            for i in range(0, total, batch_size):
+                batch = registros[i:i+batch_size]
+                linhas = [extrair(r, agora) for r in batch]
+                if usar_copy:
+                    gravados_lote = copy_upsert(cur, spec.tabela, spec.colunas_insert, spec.chave, linhas, spec.sql_conflito)
+                else:
+                    # page_size = lote inteiro: um único comando, então rowcount cobre o lote todo
+                    psycopg2.extras.execute_values(cur, spec.sql_values, linhas, page_size=len(linhas))
+                    gravados_lote = cur.rowcount
+                gravados += gravados_lote
+                if spec.commit_por_lote:
+                    conn.commit()
+                if DEBUG:
+                    log_etl(label, "DEBUG", f"Batch {i//batch_size + 1}: {len(batch)} enviados, {gravados_lote} inseridos/atualizados.")
+
+    _acumular_estatisticas(label, total, gravados, time.perf_counter() - inicio)
+    return gravados
+# endregion
+
+# region SPECS DAS TABELAS STG
+SPEC_EMPRESA = EntidadeSpec(
+    tabela="stg.empresa_bling",
+    chave=("id_bling",),
+    colunas=("id_bling", "nome", "cnpj", "email", "dt_contrato"),
+    atualizar_agora=("dt_atualizacao",),
+    entidade="empresa",
+    label="EMPRESA",
+)
+
+SPEC_CATEGORIA_PRODUTO = EntidadeSpec(
+    tabela="stg.categoria_produto_bling",
+    chave=("id_bling",),
+    colunas=("id_bling", "descricao", "id_pai_bling"),
+    atualizar_agora=("dt_atualizacao",),
+    entidade="categoria_produto",
+    label="CATEGORIA",
+)
+
+SPEC_GRUPO_PRODUTO = EntidadeSpec(
+    tabela="stg.grupo_produto_bling",
+    chave=("id_bling",),
+    colunas=("id_bling", "descricao", "id_pai_bling"),
+    atualizar_agora=("dt_atualizacao",),
+    entidade="grupo_produto",
+    label="GRUPO PRODUTO",
+    batch_size=500,
+)
+
+SPEC_CANAIS_VENDA = EntidadeSpec(
+    tabela="stg.canais_venda_bling",
+    chave=("id_bling",),
+    colunas=("id_bling", "descricao", "tipo", "situacao"),
+    atualizar_agora=("dt_atualizacao",),
+    entidade="canais_venda",
+    label="CANAIS VENDA",
+)
+
+SPEC_VENDEDOR = EntidadeSpec(
+    tabela="stg.vendedor_bling",
+    chave=("id_bling",),
+    colunas=(
+        "id_bling", "vl_desconto_limite", "id_loja", "id_contato",
+        "nome_contato", "situacao_contato", "comissoes",
+    ),
+    colunas_json=("comissoes",),
+    colunas_agora=("dt_carga", "dt_atualizacao"),
+    preservar=("dt_carga",),
+    entidade="vendedor",
+    label="VENDEDORES",
+)
+
+SPEC_PRODUTO = EntidadeSpec(
+    tabela="stg.produto_bling",
+    chave=("id_bling",),
+    colunas=(
+        "id_bling", "nome", "codigo", "tipo", "situacao", "formato",
+        "descricao_curta", "descricao_complementar", "observacoes", "imagem_url",
+        "dt_validade", "unidade", "qt_itens_caixa", "qt_volumes",
+        "vl_preco", "vl_preco_custo", "vl_peso_liquido", "vl_peso_bruto",
+        "largura", "altura", "profundidade", "unidade_medida",
+        "gtin", "gtin_embalagem", "tipo_producao", "condicao", "marca",
+        "id_categoria", "id_linha_produto", "id_fornecedor", "id_grupo_produto",
+        "ncm", "cest", "origem", "sped_tipo_item",
+    ),
+    colunas_agora=("dt_carga", "dt_atualizacao"),
+    preservar=("dt_carga",),
+    entidade="produto",
+    label="PRODUTOS",
+    batch_size=100,
+)
+
+SPEC_DEPOSITO = EntidadeSpec(
+    tabela="stg.deposito_bling",
+    chave=("id_bling",),
+    colunas=("id_bling", "descricao", "situacao", "padrao", "desconsiderar_saldo"),
+    colunas_agora=("dt_carga", "dt_atualizacao"),
+    preservar=("dt_carga",),
+    entidade="deposito",
+    label="DEPOSITOS",
+)
+
+SPEC_SALDO_PRODUTO_DEPOSITO = EntidadeSpec(
+    tabela="stg.saldo_produto_deposito_bling",
+    chave=("id_produto_bling", "id_deposito_bling"),
+    colunas=(
+        "id_produto_bling", "id_deposito_bling", "saldo_fisico", "saldo_virtual",
+        "dt_carga", "dt_atualizacao",
+    ),
+    preservar=("dt_carga",),
+    entidade="saldo_produto_deposito",
+    label="SALDO_PROD_DEP",
+    batch_size=100,
+)
+
+SPEC_PEDIDO_VENDA = EntidadeSpec(
+    tabela="stg.pedido_venda_bling",
+    chave=("id_bling",),
+    colunas=(
+        "id_bling", "numero", "numero_loja", "data_pedido", "data_saida", "data_prevista",
+        "total_produtos", "total",
+        "id_contato", "contato_nome", "contato_tipo_pessoa", "contato_documento",
+        "id_situacao", "situacao_valor", "id_loja", "numero_pedido_compra",
+        "outras_despesas", "observacoes", "observacoes_internas",
+        "desconto_valor", "desconto_unidade", "id_categoria_financeira", "id_nota_fiscal",
+        "trib_total_icms", "trib_total_ipi",
+        "itens_json", "parcelas_json", "transporte_json", "taxas_json",
+        "id_vendedor", "intermediador_cnpj", "intermediador_usuario",
+        "hash_conteudo", "dt_carga", "dt_atualizacao",
+    ),
+    colunas_json=("itens_json", "parcelas_json", "transporte_json", "taxas_json"),
+    preservar=("dt_carga",),
+    entidade="pedido_venda",
+    label="PEDIDOS_VENDAS",
+    batch_size=20,
+    coluna_hash="hash_conteudo",
+)
+
+SPEC_CATEGORIA_RECEITA_DESPESA = EntidadeSpec(
+    tabela="stg.categoria_receita_despesa_bling",
+    chave=("id_bling",),
+    colunas=("id_bling", "id_categoria_pai", "descricao", "tipo", "dt_carga", "dt_atualizacao"),
+    preservar=("dt_carga",),
+    entidade="categoria_receita_despesa",
+    label="CAT_REC_DESP",
+)
+
+SPEC_CONTATO = EntidadeSpec(
+    tabela="stg.contato_bling",
+    chave=("id_bling",),
+    colunas=(
+        "id_bling", "nome", "codigo", "situacao", "numero_documento",
+        "telefone", "celular", "email", "email_nota_fiscal", "tipo",
+        "fantasia", "indicador_ie", "ie", "rg", "inscricao_municipal",
+        "orgao_emissor", "logradouro", "numero", "complemento", "bairro",
+        "municipio", "uf", "cep", "id_vendedor",
+        "origem_dado", "hash_conteudo", "dt_carga", "dt_atualizacao",
+    ),
+    preservar=("dt_carga",),
+    entidade="contato",
+    label="CONTATO",
+    batch_size=20,
+    coluna_hash="hash_conteudo",
+)
+
+SPEC_PRODUTO_ESTRUTURA = EntidadeSpec(
+    tabela="stg.produto_estrutura_bling",
+    chave=("id_bling", "id_componente"),
+    colunas=("id_bling", "tipo_estoque", "lancamento_estoque", "id_componente", "quantidade_componente"),
+    colunas_agora=("dt_carga", "dt_atualizacao"),
+    preservar=("dt_carga",),
+    entidade="produto_estrutura",
+    label="ESTRUTURA PRODUTO",
+    batch_size=100,
+    commit_por_lote=True,
+)
+# endregion
+
 # region EMPRESA (FULL)
 def upsert_empresa_bling_bulk(lista_de_dicts, db_uri):
     """
     Upsert em lote na tabela stg.empresa_bling.
     """
-    if not lista_de_dicts:
-        return
-    conn = psycopg2.connect(db_uri)
-    with conn:
-        with conn.cursor() as cur:
-            sql = """
-                INSERT INTO stg.empresa_bling
-                    (id_bling, nome, cnpj, email, dt_contrato)
-                VALUES
-                    (%(id_bling)s, %(nome)s, %(cnpj)s, %(email)s, %(dt_contrato)s)
-                ON CONFLICT (id_bling) DO UPDATE
-                SET
-                    nome = EXCLUDED.nome,
-                    cnpj = EXCLUDED.cnpj,
-                    email = EXCLUDED.email,
-                    dt_contrato = EXCLUDED.dt_contrato,
-                    dt_atualizacao = CURRENT_TIMESTAMP
-            """
-            psycopg2.extras.execute_batch(cur, sql, lista_de_dicts, page_size=1000)
+    return upsert_entidade(db_uri, SPEC_EMPRESA, lista_de_dicts)
 # endregion
 
 # region CATEGORIA DE PRODUTO
@@ -43,23 +416,7 @@ def upsert_categoria_produto_bling_bulk(lista_de_dicts, db_uri):
     """
     Upsert em lote na tabela stg.categoria_produto_bling.
     """
-    if not lista_de_dicts:
-        return
-    conn = psycopg2.connect(db_uri)
-    with conn:
-        with conn.cursor() as cur:
-            sql = """
-                INSERT INTO stg.categoria_produto_bling
-                    (id_bling, descricao, id_pai_bling)
-                VALUES
-                    (%(id_bling)s, %(descricao)s, %(id_pai_bling)s)
-                ON CONFLICT (id_bling) DO UPDATE
-                SET
-                    descricao = EXCLUDED.descricao,
-                    id_pai_bling = EXCLUDED.id_pai_bling,
-                    dt_atualizacao = CURRENT_TIMESTAMP
-            """
-            execute_batch(cur, sql, lista_de_dicts, page_size=1000)
+    return upsert_entidade(db_uri, SPEC_CATEGORIA_PRODUTO, lista_de_dicts)
 # endregion
 
 # region GRUPO DE PRODUTO
@@ -67,23 +424,7 @@ def upsert_grupo_produto_bling_bulk(lista_de_dicts, db_uri):
     """
     Upsert em lote na tabela stg.grupo_produto_bling.
     """
-    if not lista_de_dicts:
-        return
-    conn = psycopg2.connect(db_uri)
-    with conn:
-        with conn.cursor() as cur:
-            sql = """
-                INSERT INTO stg.grupo_produto_bling
-                    (id_bling, descricao, id_pai_bling)
-                VALUES
-                    (%(id_bling)s, %(descricao)s, %(id_pai_bling)s)
-                ON CONFLICT (id_bling) DO UPDATE
-                SET
-                    descricao = EXCLUDED.descricao,
-                    id_pai_bling = EXCLUDED.id_pai_bling,
-                    dt_atualizacao = CURRENT_TIMESTAMP
-            """
-            execute_batch(cur, sql, lista_de_dicts, page_size=500)
+    return upsert_entidade(db_uri, SPEC_GRUPO_PRODUTO, lista_de_dicts)
 # endregion
 
 # region CANAIS DE VENDA
@@ -91,79 +432,17 @@ def upsert_canais_venda_bling_bulk(lista_de_dicts, db_uri):
     """
     Upsert em lote na tabela stg.canais_venda_bling.
     """
-    if not lista_de_dicts:
-        return
-    conn = psycopg2.connect(db_uri)
-    with conn:
-        with conn.cursor() as cur:
-            sql = """
-                INSERT INTO stg.canais_venda_bling
-                    (id_bling, descricao, tipo, situacao)
-                VALUES
-                    (%(id_bling)s, %(descricao)s, %(tipo)s, %(situacao)s)
-                ON CONFLICT (id_bling) DO UPDATE
-                SET
-                    descricao = EXCLUDED.descricao,
-                    tipo = EXCLUDED.tipo,
-                    situacao = EXCLUDED.situacao,
-                    dt_atualizacao = CURRENT_TIMESTAMP
-            """
-            execute_batch(cur, sql, lista_de_dicts, page_size=1000)
+    return upsert_entidade(db_uri, SPEC_CANAIS_VENDA, lista_de_dicts)
 # endregion
 
 # region VENDEDOR
 def upsert_vendedores_bling_bulk(db_uri, lista_vendedores):
     """
     Insere ou atualiza registros de vendedores na tabela stg.vendedor_bling.
-    Na inserção inicial, dt_carga recebe CURRENT_TIMESTAMP.
-    Em atualizações, dt_carga permanece inalterado e dt_atualizacao recebe CURRENT_TIMESTAMP.
+    Na inserção inicial, dt_carga recebe o timestamp da carga.
+    Em atualizações, dt_carga permanece inalterado e dt_atualizacao é atualizado.
     """
-    if not lista_vendedores:
-        return
-    conn = psycopg2.connect(db_uri)
-    with conn:
-        with conn.cursor() as cur:
-            # Preparar o campo comissoes como JSON
-            for v in lista_vendedores:
-                v["comissoes"] = psycopg2.extras.Json(v.get("comissoes", {}))
-            # Comando SQL parametrizado para upsert
-            sql = """
-                INSERT INTO stg.vendedor_bling (
-                    id_bling,
-                    vl_desconto_limite,
-                    id_loja,
-                    id_contato,
-                    nome_contato,
-                    situacao_contato,
-                    comissoes,
-                    dt_carga,
-                    dt_atualizacao
-                )
-                VALUES (
-                    %(id_bling)s,
-                    %(vl_desconto_limite)s,
-                    %(id_loja)s,
-                    %(id_contato)s,
-                    %(nome_contato)s,
-                    %(situacao_contato)s,
-                    %(comissoes)s,
-                    CURRENT_TIMESTAMP,
-                    CURRENT_TIMESTAMP
-                )
-                ON CONFLICT (id_bling) DO UPDATE
-                SET
-                    vl_desconto_limite = EXCLUDED.vl_desconto_limite,
-                    id_loja            = EXCLUDED.id_loja,
-                    id_contato         = EXCLUDED.id_contato,
-                    nome_contato       = EXCLUDED.nome_contato,
-                    situacao_contato   = EXCLUDED.situacao_contato,
-                    comissoes          = EXCLUDED.comissoes,
-                    -- dt_carga não é modificado em atualizações
-                    dt_atualizacao     = CURRENT_TIMESTAMP
-            """
-            # Executa o batch de upsert com paginação de 1000 registros
-            psycopg2.extras.execute_batch(cur, sql, lista_vendedores, page_size=1000)
-
+    return upsert_entidade(db_uri, SPEC_VENDEDOR, lista_vendedores)
 # endregion
 
 # region PRODUTO (FULL OU INCREMENTAL)
@@ -171,305 +450,33 @@ def upsert_produto_bling_bulk(db_uri, lista_produtos, batch_size=100):
     """
     Insere ou atualiza registros de produtos na tabela stg.produto_bling, em batches/lotes.
     """
-    if not lista_produtos:
-        return
-
-    query = """
-        INSERT INTO stg.produto_bling (
-            id_bling,
-            nome,
-            codigo,
-            tipo,
-            situacao,
-            formato,
-            descricao_curta,
-            descricao_complementar,
-            observacoes,
-            imagem_url,
-            dt_validade,
-            unidade,
-            qt_itens_caixa,
-            qt_volumes,
-            vl_preco,
-            vl_preco_custo,
-            vl_peso_liquido,
-            vl_peso_bruto,
-            largura,
-            altura,
-            profundidade,
-            unidade_medida,
-            gtin,
-            gtin_embalagem,
-            tipo_producao,
-            condicao,
-            marca,
-            id_categoria,
-            id_linha_produto,
-            id_fornecedor,
-            id_grupo_produto,
-            ncm,
-            cest,
-            origem,
-            sped_tipo_item,
-            dt_carga,
-            dt_atualizacao
-        )
-        VALUES %s
-        ON CONFLICT (id_bling) DO UPDATE SET
-            nome = EXCLUDED.nome,
-            codigo = EXCLUDED.codigo,
-            tipo = EXCLUDED.tipo,
-            situacao = EXCLUDED.situacao,
-            formato = EXCLUDED.formato,
-            descricao_curta = EXCLUDED.descricao_curta,
-            descricao_complementar = EXCLUDED.descricao_complementar,
-            observacoes = EXCLUDED.observacoes,
-            imagem_url = EXCLUDED.imagem_url,
-            dt_validade = EXCLUDED.dt_validade,
-            unidade = EXCLUDED.unidade,
-            qt_itens_caixa = EXCLUDED.qt_itens_caixa,
-            qt_volumes = EXCLUDED.qt_volumes,
-            vl_preco = EXCLUDED.vl_preco,
-            vl_preco_custo = EXCLUDED.vl_preco_custo,
-            vl_peso_liquido = EXCLUDED.vl_peso_liquido,
-            vl_peso_bruto = EXCLUDED.vl_peso_bruto,
-            largura = EXCLUDED.largura,
-            altura = EXCLUDED.altura,
-            profundidade = EXCLUDED.profundidade,
-            unidade_medida = EXCLUDED.unidade_medida,
-            gtin = EXCLUDED.gtin,
-            gtin_embalagem = EXCLUDED.gtin_embalagem,
-            tipo_producao = EXCLUDED.tipo_producao,
-            condicao = EXCLUDED.condicao,
-            marca = EXCLUDED.marca,
-            id_categoria = EXCLUDED.id_categoria,
-            id_linha_produto = EXCLUDED.id_linha_produto,
-            id_fornecedor = EXCLUDED.id_fornecedor,
-            id_grupo_produto = EXCLUDED.id_grupo_produto,
-            ncm = EXCLUDED.ncm,
-            cest = EXCLUDED.cest,
-            origem = EXCLUDED.origem,
-            sped_tipo_item = EXCLUDED.sped_tipo_item,
-            dt_carga = stg.produto_bling.dt_carga,
-            dt_atualizacao = EXCLUDED.dt_atualizacao;
-    """
-
-    with psycopg2.connect(db_uri) as conn:
-        with conn.cursor() as cur:
-            agora = datetime.now()
-            total = len(lista_produtos)
-            for i in range(0, total, batch_size):
-                batch = lista_produtos[i:i+batch_size]
-                psycopg2.extras.execute_values(
-                    cur, query,
-                    [(
-                        p["id_bling"],
-                        p["nome"],
-                        p["codigo"],
-                        p["tipo"],
-                        p["situacao"],
-                        p["formato"],
-                        p["descricao_curta"],
-                        p["descricao_complementar"],
-                        p["observacoes"],
-                        p["imagem_url"],
-                        p["dt_validade"],
-                        p["unidade"],
-                        p["qt_itens_caixa"],
-                        p["qt_volumes"],
-                        p["vl_preco"],
-                        p["vl_preco_custo"],
-                        p["vl_peso_liquido"],
-                        p["vl_peso_bruto"],
-                        p["largura"],
-                        p["altura"],
-                        p["profundidade"],
-                        p["unidade_medida"],
-                        p["gtin"],
-                        p["gtin_embalagem"],
-                        p["tipo_producao"],
-                        p["condicao"],
-                        p["marca"],
-                        p["id_categoria"],
-                        p["id_linha_produto"],
-                        p["id_fornecedor"],
-                        p["id_grupo_produto"],
-                        p["ncm"],
-                        p["cest"],
-                        p["origem"],
-                        p["sped_tipo_item"],
-                        agora,                   # dt_carga
-                        agora
-                    ) for p in batch]
-                )
-                if DEBUG:
-                    log_etl(
-                        "PRODUTOS",
-                        "DEBUG",
-                        f"Batch {i//batch_size + 1}: {len(batch)} produtos inseridos/atualizados."
-                    )
+    return upsert_entidade(db_uri, SPEC_PRODUTO, lista_produtos, batch_size=batch_size)
 # endregion
 
 # region DEPÓSITO (FULL)
-
 def upsert_deposito_bling_bulk(lista_depositos, db_uri):
     """
     Insere ou atualiza depósitos em lote na tabela stg.deposito_bling,
     respeitando o padrão: dt_carga só na primeira vez, dt_atualizacao sempre.
     """
-    import psycopg2
-    from psycopg2.extras import execute_values
-    from datetime import datetime
-
-    if not lista_depositos:
-        return
-
-    now = datetime.now()
-    conn = psycopg2.connect(db_uri)
-    cur = conn.cursor()
-    sql = """
-    INSERT INTO stg.deposito_bling (
-        id_bling, descricao, situacao, padrao, desconsiderar_saldo, dt_carga, dt_atualizacao
-    ) VALUES %s
-    ON CONFLICT (id_bling) DO UPDATE SET
-        descricao = EXCLUDED.descricao,
-        situacao = EXCLUDED.situacao,
-        padrao = EXCLUDED.padrao,
-        desconsiderar_saldo = EXCLUDED.desconsiderar_saldo,
-        -- dt_carga NÃO É ATUALIZADO AQUI
-        dt_atualizacao = EXCLUDED.dt_atualizacao;
-    """
-    values = [
-        (
-            d["id_bling"],
-            d["descricao"],
-            d["situacao"],
-            d["padrao"],
-            d["desconsiderar_saldo"],
-            now,              # dt_carga: só vai na primeira vez!
-            now               # dt_atualizacao: sempre atualizado
-        )
-        for d in lista_depositos
-    ]
-    execute_values(cur, sql, values)
-    conn.commit()
-    cur.close()
-    conn.close()
-
+    return upsert_entidade(db_uri, SPEC_DEPOSITO, lista_depositos)
 # endregion
 
 # region SALDO PRODUTO (FULL)
-
 def upsert_saldo_produto_deposito_bulk(db_uri, lista_registros, batch_size=100):
     """
     Insere ou atualiza registros de saldo produto x deposito, em batch.
     """
-    if not lista_registros:
-        return
-
-    query = """
-        INSERT INTO stg.saldo_produto_deposito_bling (
-            id_produto_bling, id_deposito_bling, saldo_fisico, saldo_virtual, dt_carga, dt_atualizacao
-        )
-        VALUES %s
-        ON CONFLICT (id_produto_bling, id_deposito_bling) DO UPDATE SET
-            saldo_fisico = EXCLUDED.saldo_fisico,
-            saldo_virtual = EXCLUDED.saldo_virtual,
-            dt_carga = stg.saldo_produto_deposito_bling.dt_carga,
-            dt_atualizacao = EXCLUDED.dt_atualizacao;
-    """
-
-    import psycopg2, psycopg2.extras
-    with psycopg2.connect(db_uri) as conn:
-        with conn.cursor() as cur:
-            total = len(lista_registros)
-            for i in range(0, total, batch_size):
-                batch = lista_registros[i:i+batch_size]
-                psycopg2.extras.execute_values(
-                    cur, query,
-                    [(r["id_produto_bling"], r["id_deposito_bling"], r["saldo_fisico"],
-                      r["saldo_virtual"], r["dt_carga"], r["dt_atualizacao"]) for r in batch]
-                )
+    return upsert_entidade(db_uri, SPEC_SALDO_PRODUTO_DEPOSITO, lista_registros, batch_size=batch_size)
 # endregion
 
 # region PEDIDOS: INSERIR/ATUALIZAR (BULK)
-def upsert_pedido_venda_bling_bulk(db_uri, registros, batch_size=20):
-    if not registros:
-        return
-
-    query = """
-        INSERT INTO stg.pedido_venda_bling (
-            id_bling, numero, numero_loja, data_pedido, data_saida, data_prevista,
-            total_produtos, total,
-            id_contato, contato_nome, contato_tipo_pessoa, contato_documento,
-            id_situacao, situacao_valor, id_loja, numero_pedido_compra,
-            outras_despesas, observacoes, observacoes_internas,
-            desconto_valor, desconto_unidade, id_categoria_financeira, id_nota_fiscal,
-            trib_total_icms, trib_total_ipi,
-            itens_json, parcelas_json, transporte_json, taxas_json,
-            id_vendedor, intermediador_cnpj, intermediador_usuario,
-            dt_carga, dt_atualizacao
-        ) VALUES %s
-        ON CONFLICT (id_bling) DO UPDATE SET
-            numero = EXCLUDED.numero,
-            numero_loja = EXCLUDED.numero_loja,
-            data_pedido = EXCLUDED.data_pedido,
-            data_saida = EXCLUDED.data_saida,
-            data_prevista = EXCLUDED.data_prevista,
-            total_produtos = EXCLUDED.total_produtos,
-            total = EXCLUDED.total,
-            id_contato = EXCLUDED.id_contato,
-            contato_nome = EXCLUDED.contato_nome,
-            contato_tipo_pessoa = EXCLUDED.contato_tipo_pessoa,
-            contato_documento = EXCLUDED.contato_documento,
-            id_situacao = EXCLUDED.id_situacao,
-            situacao_valor = EXCLUDED.situacao_valor,
-            id_loja = EXCLUDED.id_loja,
-            numero_pedido_compra = EXCLUDED.numero_pedido_compra,
-            outras_despesas = EXCLUDED.outras_despesas,
-            observacoes = EXCLUDED.observacoes,
-            observacoes_internas = EXCLUDED.observacoes_internas,
-            desconto_valor = EXCLUDED.desconto_valor,
-            desconto_unidade = EXCLUDED.desconto_unidade,
-            id_categoria_financeira = EXCLUDED.id_categoria_financeira,
-            id_nota_fiscal = EXCLUDED.id_nota_fiscal,
-            trib_total_icms = EXCLUDED.trib_total_icms,
-            trib_total_ipi = EXCLUDED.trib_total_ipi,
-            itens_json = EXCLUDED.itens_json,
-            parcelas_json = EXCLUDED.parcelas_json,
-            transporte_json = EXCLUDED.transporte_json,
-            taxas_json = EXCLUDED.taxas_json,
-            id_vendedor = EXCLUDED.id_vendedor,
-            intermediador_cnpj = EXCLUDED.intermediador_cnpj,
-            intermediador_usuario = EXCLUDED.intermediador_usuario,
-            dt_carga = stg.pedido_venda_bling.dt_carga,
-            dt_atualizacao = EXCLUDED.dt_atualizacao;
-    """
-
-    with psycopg2.connect(db_uri) as conn:
-        with conn.cursor() as cur:
-            total = len(registros)
-            for i in range(0, total, batch_size):
-                batch = registros[i:i+batch_size]
-                psycopg2.extras.execute_values(
-                    cur, query,
-                    [(
-                        r["id_bling"], r["numero"], r["numero_loja"], r["data_pedido"], r["data_saida"], r["data_prevista"],
-                        r["total_produtos"], r["total"],
-                        r["id_contato"], r["contato_nome"], r["contato_tipo_pessoa"], r["contato_documento"],
-                        r["id_situacao"], r["situacao_valor"], r["id_loja"], r["numero_pedido_compra"],
-                        r["outras_despesas"], r["observacoes"], r["observacoes_internas"],
-                        r["desconto_valor"], r["desconto_unidade"], r["id_categoria_financeira"], r["id_nota_fiscal"],
-                        r["trib_total_icms"], r["trib_total_ipi"],
-                        json.dumps(r["itens_json"]), json.dumps(r["parcelas_json"]),
-                        json.dumps(r["transporte_json"]), json.dumps(r["taxas_json"]),
-                        r["id_vendedor"], r["intermediador_cnpj"], r["intermediador_usuario"],
-                        r["dt_carga"], r["dt_atualizacao"]
-                    ) for r in batch]
-                )
-                if DEBUG:
-                    log_etl("PEDIDOS_VENDAS", "DEBUG",
-                            f"Batch {i//batch_size + 1}: {len(batch)} pedidos inseridos/atualizados.")
+def upsert_pedido_venda_bling_bulk(db_uri, registros, batch_size=20, modo=None):
+    """
+    Upsert em lote na stg.pedido_venda_bling.
+    modo: "values" (execute_values) ou "copy" (COPY + merge); padrão em MODO_CARGA_STG.
+    """
+    return upsert_entidade(db_uri, SPEC_PEDIDO_VENDA, registros, batch_size=batch_size, modo=modo)
 # endregion
 
 # region CATEGORIA RECEITA/DESPESA (FULL)
@@ -477,157 +484,33 @@ def upsert_categoria_receita_despesa_bling_bulk(lista_de_dicts, db_uri, batch_si
     """
     Upsert em lote na tabela stg.categoria_receita_despesa_bling.
     """
-    if not lista_de_dicts:
-        return
-
-    sql = """
-        INSERT INTO stg.categoria_receita_despesa_bling (
-            id_bling, id_categoria_pai, descricao, tipo, dt_carga, dt_atualizacao
-        )
-        VALUES %s
-        ON CONFLICT (id_bling) DO UPDATE SET
-            id_categoria_pai = EXCLUDED.id_categoria_pai,
-            descricao        = EXCLUDED.descricao,
-            tipo             = EXCLUDED.tipo,
-            dt_carga         = stg.categoria_receita_despesa_bling.dt_carga,
-            dt_atualizacao   = EXCLUDED.dt_atualizacao;
-    """
-
-    with psycopg2.connect(db_uri) as conn:
-        with conn.cursor() as cur:
-            # execute_values é mais rápido para muitos registros
-            psycopg2.extras.execute_values(
-                cur, sql,
-                [(
-                    r["id_bling"],
-                    r["id_categoria_pai"],
-                    r["descricao"],
-                    r["tipo"],
-                    r.get("dt_carga"),
-                    r.get("dt_atualizacao"),
-                ) for r in lista_de_dicts],
-                page_size=batch_size
-            )
+    return upsert_entidade(db_uri, SPEC_CATEGORIA_RECEITA_DESPESA, lista_de_dicts, batch_size=batch_size)
 # endregion
 
 # region CONTATO: INSERIR/ATUALIZAR (BULK)
-def upsert_contato_bling_bulk(db_uri, registros, batch_size=20):
-    if not registros:
-        return
-
-    query = """
-        INSERT INTO stg.contato_bling (
-            id_bling, nome, codigo, situacao, numero_documento,
-            telefone, celular, email, email_nota_fiscal, tipo,
-            fantasia, indicador_ie, ie, rg, inscricao_municipal,
-            orgao_emissor, logradouro, numero, complemento, bairro,
-            municipio, uf, cep, id_vendedor,
-            origem_dado, dt_carga, dt_atualizacao
-        ) VALUES %s
-        ON CONFLICT (id_bling) DO UPDATE SET
-            nome = EXCLUDED.nome,
-            codigo = EXCLUDED.codigo,
-            situacao = EXCLUDED.situacao,
-            numero_documento = EXCLUDED.numero_documento,
-            telefone = EXCLUDED.telefone,
-            celular = EXCLUDED.celular,
-            email = EXCLUDED.email,
-            email_nota_fiscal = EXCLUDED.email_nota_fiscal,
-            tipo = EXCLUDED.tipo,
-            fantasia = EXCLUDED.fantasia,
-            indicador_ie = EXCLUDED.indicador_ie,
-            ie = EXCLUDED.ie,
-            rg = EXCLUDED.rg,
-            inscricao_municipal = EXCLUDED.inscricao_municipal,
-            orgao_emissor = EXCLUDED.orgao_emissor,
-            logradouro = EXCLUDED.logradouro,
-            numero = EXCLUDED.numero,
-            complemento = EXCLUDED.complemento,
-            bairro = EXCLUDED.bairro,
-            municipio = EXCLUDED.municipio,
-            uf = EXCLUDED.uf,
-            cep = EXCLUDED.cep,
-            id_vendedor = EXCLUDED.id_vendedor,
-            origem_dado = EXCLUDED.origem_dado,
-            dt_atualizacao = EXCLUDED.dt_atualizacao;
-    """
-
-    with psycopg2.connect(db_uri) as conn:
-        with conn.cursor() as cur:
-            total = len(registros)
-            for i in range(0, total, batch_size):
-                batch = registros[i:i+batch_size]
-                psycopg2.extras.execute_values(
-                    cur, query, [tuple(r.values()) for r in batch]
-                )
-                if DEBUG:
-                    log_etl("CONTATO", "DEBUG", f"Batch {i//batch_size + 1}: {len(batch)} contatos inseridos/atualizados.")
+def upsert_contato_bling_bulk(db_uri, registros, batch_size=20, modo=None):
+    """
+    Upsert em lote na stg.contato_bling.
+    modo: "values" (execute_values) ou "copy" (COPY + merge); padrão em MODO_CARGA_STG.
+    """
+    return upsert_entidade(db_uri, SPEC_CONTATO, registros, batch_size=batch_size, modo=modo)
 # endregion
 
 # region PRODUTO ESTRUTURA (FULL OU INCREMENTAL)
 def upsert_produto_estrutura_bling_bulk(db_uri, lista_estruturas, batch_size=100):
     """
     Insere ou atualiza registros de estrutura de produtos (kits) na tabela stg.produto_estrutura_bling.
-    Na inserção inicial, dt_carga recebe CURRENT_TIMESTAMP; em atualizações, dt_carga permanece e dt_atualizacao é atualizado.
+    Na inserção inicial, dt_carga recebe o timestamp da carga; em atualizações, dt_carga permanece e dt_atualizacao é atualizado.
     """
     if not lista_estruturas:
         log_etl("ESTRUTURA PRODUTO", "DEBUG", "Lista de estruturas vazia, nada a inserir.")
-        return
-
-    query = """
-        INSERT INTO stg.produto_estrutura_bling (
-            id_bling,
-            tipo_estoque,
-            lancamento_estoque,
-            id_componente,
-            quantidade_componente,
-            dt_carga,
-            dt_atualizacao
-        ) VALUES %s
-        ON CONFLICT (id_bling, id_componente) DO UPDATE SET
-            tipo_estoque = EXCLUDED.tipo_estoque,
-            lancamento_estoque = EXCLUDED.lancamento_estoque,
-            quantidade_componente = EXCLUDED.quantidade_componente,
-            dt_carga = stg.produto_estrutura_bling.dt_carga,
-            dt_atualizacao = EXCLUDED.dt_atualizacao;
-    """
-
-    with psycopg2.connect(db_uri) as conn:
-        with conn.cursor() as cur:
-            now = datetime.now()
-            total = len(lista_estruturas)
-            for i in range(0, total, batch_size):
-                batch = lista_estruturas[i:i+batch_size]
-
-                # Log de debug dos registros antes de inserir
-                #for e in batch:
-                    #log_etl("ESTRUTURA PRODUTO", "DEBUG", f"Preparando estrutura para upsert: {e}")
-
-                psycopg2.extras.execute_values(cur, query, [
-                    (
-                        e["id_bling"],
-                        e["tipo_estoque"],
-                        e["lancamento_estoque"],
-                        e["id_componente"],
-                        e["quantidade_componente"],
-                        now,
-                        now
-                    ) for e in batch
-                ])
-
-                conn.commit()  # Garantir persistência
-
-                log_etl("ESTRUTURA PRODUTO", "DEBUG", f"Batch {i//batch_size + 1}: {len(batch)} estruturas inseridas/atualizadas.")
-
+        return 0
+    return upsert_entidade(db_uri, SPEC_PRODUTO_ESTRUTURA, lista_estruturas, batch_size=batch_size)
 # endregion
 
 # region CALL PROCEDURE
 def call_procedure(db_uri: str, procedure_name: str):
-    import psycopg2
-    conn = psycopg2.connect(db_uri)
-    conn.autocommit = True
-    cur = conn.cursor()
-    cur.execute(f"CALL {procedure_name}();")
-    cur.close()
-    conn.close()
-# endregion
\ No newline at end of file
+    with conexao(db_uri, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"CALL {procedure_name}();")
+# endregion
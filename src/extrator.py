@@ -0,0 +1,352 @@
+# region IMPORTS
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.config import (
+    API_MAX_CONCORRENCIA,
+    DEBUG,
+    SALDO_IDS_POR_REQUISICAO,
+    ORIGEM_IDS_PRODUTO,
+    JANELA_MAX_DIAS,
+    JANELA_MAX_PAGINAS,
+    JANELAS_PARALELAS,
+)
+from src.conexao import conexao
+from src.log import log_etl
+from src.retry import CotaDiariaEsgotada
+from src.utils import registrar_falha_importacao, dividir_janela, dividir_janela_ao_meio
+# endregion
+
+# region EXTRATORES DE RESPOSTA
+def extrair_data(resp):
+    """
+    Extrai o conteúdo de 'data' de uma resposta de detalhe (ex.: produtos/{id}, vendedores/{id}).
+    Retorna None quando a resposta veio vazia ou sem 'data'.
+    """
+    if isinstance(resp, dict) and "data" in resp:
+        return resp["data"]
+    return None
+# endregion
+
+# region PAGINAÇÃO DE IDS
+def iterar_ids_paginas(fn_ids_pagina, params=None, limite=100, pagina_inicial=1, max_paginas=None):
+    """
+    Gera (pagina, ids) chamando fn_ids_pagina(pagina, limit=..., params=...) até vir uma página vazia.
+    - max_paginas: limita a quantidade de páginas (útil em testes)
+    """
+    pagina = pagina_inicial
+    while True:
+        if params is None:
+            ids = fn_ids_pagina(pagina, limit=limite)
+        else:
+            ids = fn_ids_pagina(pagina, limit=limite, params=params)
+        if not ids:
+            break
+        yield pagina, ids
+        if max_paginas and pagina >= max_paginas:
+            break
+        pagina += 1
+# endregion
+
+# region BUSCA CONCORRENTE DE DETALHES
+def _buscar_um(fn_detalhe, extrair, id_ref):
+    try:
+        resp = fn_detalhe(id_ref)
+        return id_ref, (extrair(resp) if extrair else resp), None
+    except Exception as erro:
+        return id_ref, None, erro
+
+
+def buscar_detalhes(executor, ids, fn_detalhe, extrair=None):
+    """
+    Busca o detalhe de cada ID em paralelo no executor informado.
+    Retorna lista de (id, detalhe, erro) na MESMA ordem de `ids`.
+    O rate limit é respeitado pelo token bucket compartilhado do BlingAPI.
+    """
+    return list(executor.map(lambda i: _buscar_um(fn_detalhe, extrair, i), ids))
+
+
+def extrair_detalhes_paginados(
+    fn_ids_pagina,
+    fn_detalhe,
+    db_uri,
+    entidade,
+    ent_label,
+    id_log=None,
+    params=None,
+    limite=100,
+    extrair=None,
+    max_workers=API_MAX_CONCORRENCIA,
+    pagina_inicial=1,
+    max_paginas=None,
+    arquivo=None,
+    janela=None,
+    executor=None,
+):
+    """
+    Motor genérico do padrão "página de IDs -> detalhe por ID".
+    Para cada página gera (pagina, ids, detalhes):
+      - ids: IDs da página, na ordem retornada pela API
+      - detalhes: detalhes válidos, na mesma ordem dos IDs
+    IDs com erro ou detalhe vazio são registrados em conf.log_detalhes via registrar_falha_importacao.
+    CotaDiariaEsgotada não é registrada por ID: interrompe a extração.
+    - arquivo: ArquivoBruto da entidade; os detalhes de cada página são gravados na zona bruta (na janela informada)
+    - executor: executor de detalhes compartilhado (ex.: entre janelas); sem ele, cria um de max_workers threads
+    """
+    proprio = executor is None
+    if proprio:
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"bling-{entidade}")
+    try:
+        for pagina, ids in iterar_ids_paginas(fn_ids_pagina, params, limite, pagina_inicial, max_paginas):
+            if DEBUG:
+                log_etl(ent_label, "DEBUG", f"Página {pagina}: {len(ids)} IDs coletados.")
+
+            detalhes = []
+            for id_ref, detalhe, erro in buscar_detalhes(executor, ids, fn_detalhe, extrair):
+                if isinstance(erro, CotaDiariaEsgotada):
+                    raise erro  # sem cota, os próximos IDs também falhariam: interrompe a carga
+                if erro is not None:
+                    erro_msg = f"Falha ao buscar {entidade} ID {id_ref}: {erro}"
+                elif not detalhe:
+                    erro_msg = f"{entidade} ID {id_ref} não retornou detalhe ou veio vazio."
+                else:
+                    detalhes.append(detalhe)
+                    continue
+
+                if DEBUG:
+                    log_etl(ent_label, "WARN", erro=erro_msg)
+                registrar_falha_importacao(
+                    db_uri=db_uri,
+                    entidade=entidade,
+                    id_referencia=id_ref,
+                    erro=erro_msg,
+                    id_log=id_log
+                )
+
+            if arquivo is not None:
+                arquivo.gravar(detalhes, janela=janela)
+            yield pagina, ids, detalhes
+    finally:
+        if proprio:
+            executor.shutdown(wait=True)
+# endregion
+
+# region JANELAS DE DATA (LIMITE DE 1 ANO / JANELAS DENSAS)
+def _janela_densa(fn_ids_pagina, params, limite, max_paginas):
+    # Sonda a página seguinte ao limite: se vier conteúdo, a janela tem mais de max_paginas páginas
+    return bool(fn_ids_pagina(max_paginas + 1, limit=limite, params=params))
+
+
+def planejar_janelas(
+    fn_ids_pagina,
+    montar_filtro,
+    dt_ini,
+    dt_fim,
+    ent_label,
+    limite=100,
+    max_dias=JANELA_MAX_DIAS,
+    max_paginas=JANELA_MAX_PAGINAS,
+):
+    """
+    Divide [dt_ini, dt_fim] em janelas aceitas pela API e de tamanho controlado:
+      - no máximo max_dias por janela (filtros acima de 1 ano retornam HTTP 400)
+      - janelas com mais de max_paginas páginas são divididas ao meio até caberem (ou terem 1 dia)
+    montar_filtro(ini, fim) devolve os params da janela (ex.: montar_filtro_pedidos com a etapa fixada).
+    Custo: 1 requisição de sondagem por janela avaliada.
+    """
+    pendentes = dividir_janela(dt_ini, dt_fim, max_dias)
+    janelas = []
+    while pendentes:
+        ini, fim = pendentes.pop(0)
+        if _janela_densa(fn_ids_pagina, montar_filtro(ini, fim), limite, max_paginas):
+            metades = dividir_janela_ao_meio(ini, fim)
+            if metades:
+                if DEBUG:
+                    log_etl(ent_label, "DEBUG", f"Janela {ini} a {fim} com mais de {max_paginas} páginas; dividindo ao meio.")
+                pendentes[:0] = metades
+                continue
+            log_etl(ent_label, "WARN", f"Janela de 1 dia ({ini}) com mais de {max_paginas} páginas; mantida inteira.")
+        janelas.append((ini, fim))
+
+    log_etl(ent_label, "INFO", f"Faixa {dt_ini} até {dt_fim} dividida em {len(janelas)} janela(s)")
+    return janelas
+
+
+_FIM_JANELA = object()  # marcador na fila: todas as páginas da janela já foram enfileiradas
+
+
+def extrair_detalhes_por_janelas(
+    fn_ids_pagina,
+    fn_detalhe,
+    montar_filtro,
+    janelas,
+    db_uri,
+    entidade,
+    ent_label,
+    id_log=None,
+    limite=100,
+    extrair=None,
+    paginas_iniciais=None,
+    ao_concluir_janela=None,
+    janelas_paralelas=JANELAS_PARALELAS,
+    max_paginas=None,
+    arquivo=None,
+    max_workers=API_MAX_CONCORRENCIA,
+):
+    """
+    Executa extrair_detalhes_paginados para várias janelas de data ao mesmo tempo
+    (até janelas_paralelas), todas sob o mesmo token bucket do BlingAPI.
+    Gera (janela, pagina, ids, detalhes) na ordem em que as páginas ficam prontas.
+    - paginas_iniciais: {janela: pagina} para retomar cada janela de onde parou
+    - ao_concluir_janela(janela): chamado na thread do consumidor, quando ele pede o item seguinte
+      à última página da janela (a janela vai para a fila como um marcador depois das suas
+      páginas). Assim o consumidor já processou todas as páginas da janela (ex.: pagina_lida
+      do checkpoint) antes de ela ser marcada como extraída
+    - arquivo: ArquivoBruto da entidade (um arquivo por janela na zona bruta)
+    - max_workers: threads de detalhe, num único executor compartilhado pelas janelas. Em voo ficam
+      no máximo janelas_paralelas (páginas de IDs) + max_workers (detalhes) requisições, dentro
+      do HTTP_POOL_MAXSIZE da sessão
+    """
+    paginas_iniciais = paginas_iniciais or {}
+    fila = queue.Queue(maxsize=max(2, janelas_paralelas * 2))
+    parar = threading.Event()
+
+    def _extrair_janela(janela):
+        paginas = extrair_detalhes_paginados(
+            fn_ids_pagina=fn_ids_pagina,
+            fn_detalhe=fn_detalhe,
+            db_uri=db_uri,
+            entidade=entidade,
+            ent_label=ent_label,
+            id_log=id_log,
+            params=montar_filtro(*janela),
+            limite=limite,
+            extrair=extrair,
+            pagina_inicial=paginas_iniciais.get(janela, 1),
+            max_paginas=max_paginas,
+            arquivo=arquivo,
+            janela=janela,
+            executor=executor_detalhes,
+        )
+
+        def _enfileirar(item):
+            while not parar.is_set():
+                try:
+                    fila.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for pagina, ids, detalhes in paginas:
+                if not _enfileirar((janela, pagina, ids, detalhes)):
+                    return
+        finally:
+            paginas.close()
+        _enfileirar((janela, _FIM_JANELA, None, None))
+
+    # O executor de detalhes fecha por último: as janelas (executor interno) terminam antes
+    with (
+        ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"bling-{entidade}") as executor_detalhes,
+        ThreadPoolExecutor(max_workers=max(1, janelas_paralelas), thread_name_prefix=f"janela-{entidade}") as executor,
+    ):
+        futuros = [executor.submit(_extrair_janela, j) for j in janelas]
+        try:
+            while True:
+                try:
+                    item = fila.get(timeout=0.5)
+                except queue.Empty:
+                    for f in futuros:
+                        if f.done() and f.exception():
+                            raise f.exception()
+                    if all(f.done() for f in futuros) and fila.empty():
+                        break
+                    continue
+                if item[1] is _FIM_JANELA:
+                    if ao_concluir_janela:
+                        ao_concluir_janela(item[0])
+                    continue
+                yield item
+        finally:
+            parar.set()
+            for f in futuros:
+                f.cancel()  # janelas ainda não iniciadas não rodam
+# endregion
+
+# region SALDOS EM LOTE
+def buscar_saldos_em_lotes(fn_saldos, ids_produtos, tamanho_lote=SALDO_IDS_POR_REQUISICAO):
+    """
+    Busca saldos agrupando vários IDs por requisição (ex.: api.get_saldos_produtos_por_ids).
+    Se um lote for rejeitado com HTTP 400 (algum ID inválido), ele é dividido ao meio
+    recursivamente até isolar os IDs com erro. Outras falhas (rede, 5xx/429 após as
+    tentativas do BlingAPI) não dependem dos IDs: dividir só multiplicaria as requisições,
+    então o lote inteiro é registrado como falha.
+    Retorna (saldos, falhas):
+      - saldos: itens retornados pela API (um por produto), prontos para map_saldo_produto_deposito
+      - falhas: lista de (id_produto, erro) dos IDs que falharam
+    """
+    saldos = []
+    falhas = []
+
+    def _buscar(grupo):
+        try:
+            saldos.extend(fn_saldos(grupo) or [])
+        except CotaDiariaEsgotada:
+            raise
+        except Exception as erro:
+            resposta = getattr(erro, "response", None)
+            if len(grupo) == 1 or getattr(resposta, "status_code", None) != 400:
+                falhas.extend((id_prod, erro) for id_prod in grupo)
+                return
+            meio = len(grupo) // 2
+            _buscar(grupo[:meio])
+            _buscar(grupo[meio:])
+
+    ids = list(ids_produtos)
+    for i in range(0, len(ids), tamanho_lote):
+        _buscar(ids[i:i + tamanho_lote])
+    return saldos, falhas
+# endregion
+
+# region IDS DE PRODUTO COMPARTILHADOS ENTRE ETAPAS
+_CACHE_IDS_PRODUTO = {}
+_CACHE_IDS_PRODUTO_LOCK = threading.Lock()
+
+
+def _ids_produtos_stg(db_uri):
+    with conexao(db_uri) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id_bling FROM stg.produto_bling ORDER BY id_bling")
+            return [row[0] for row in cur.fetchall()]
+
+
+def _ids_produtos_api(api, limite=100):
+    return [id_prod for _, ids in iterar_ids_paginas(api.get_produtos_ids_pagina, limite=limite) for id_prod in ids]
+
+
+def obter_ids_produtos(api, db_uri, origem=ORIGEM_IDS_PRODUTO, recarregar=False):
+    """
+    Retorna a lista de IDs de produto do catálogo, listada UMA vez por execução
+    e reaproveitada pelas etapas que precisam dela (ex.: SALDO_PROD_DEP).
+    - origem "stg": lê stg.produto_bling; se vazia, lista pela API
+    - origem "api": pagina /produtos sem filtro
+    - recarregar: ignora o cache do processo
+    """
+    with _CACHE_IDS_PRODUTO_LOCK:
+        if not recarregar and "ids" in _CACHE_IDS_PRODUTO:
+            return _CACHE_IDS_PRODUTO["ids"]
+
+        ids = []
+        if origem == "stg":
+            ids = _ids_produtos_stg(db_uri)
+            if not ids:
+                log_etl("IDS_PRODUTO", "WARN", "stg.produto_bling vazia; listando IDs pela API.")
+        if not ids:
+            origem = "api"
+            ids = _ids_produtos_api(api)
+
+        log_etl("IDS_PRODUTO", "INFO", f"IDs de produto carregados (origem: {origem})", quantidade=len(ids))
+        _CACHE_IDS_PRODUTO["ids"] = ids
+        return ids
+# endregion
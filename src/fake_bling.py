@@ -0,0 +1,767 @@
+# region IMPORTS
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from src.circuit_breaker import JanelaDeslizante
+from src.config import (
+    FAKE_HOST,
+    FAKE_PORTA,
+    FAKE_SEMENTE,
+    FAKE_DIAS_HISTORICO,
+    FAKE_VOLUME,
+    FAKE_LATENCIA_MS,
+    FAKE_LATENCIA_JITTER_MS,
+    FAKE_LIMITE_SEGUNDO,
+    FAKE_LIMITE_DIARIO,
+    FAKE_BLOQUEIO_IP_ESPERA,
+    FAKE_BLOQUEIO_TOKEN_ESPERA,
+    FAKE_TOKEN_EXPIRA,
+    CB_JANELA_SEGUNDOS,
+    CB_LIMITE_REQUISICOES,
+    CB_LIMITE_ERROS,
+    CB_JANELA_TOKEN_SEGUNDOS,
+    CB_LIMITE_TOKEN,
+)
+# endregion
+
+# region DADOS SINTÉTICOS
+# IDs no formato dos IDs do Bling (inteiros grandes), um intervalo por recurso
+_BASE_ID = {
+    "produtos": 16000000000,
+    "pedidos": 20000000000,
+    "contatos": 17000000000,
+    "vendedores": 15000000000,
+    "depositos": 14000000000,
+    "categorias_produto": 1000000,
+    "grupos_produto": 2000000,
+    "canais_venda": 3000000,
+    "categorias_receita_despesa": 4000000,
+}
+
+_NOMES = ("Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Isabela", "João", "Larissa", "Marcos")
+_SOBRENOMES = ("Silva", "Souza", "Oliveira", "Santos", "Pereira", "Costa", "Rodrigues", "Almeida", "Lima", "Gomes")
+_PRODUTOS = ("Camiseta", "Calça", "Tênis", "Mochila", "Boné", "Jaqueta", "Meia", "Bermuda", "Vestido", "Cinto")
+_CORES = ("Preto", "Branco", "Azul", "Vermelho", "Verde", "Cinza")
+_MUNICIPIOS = (("São Paulo", "SP", "01310-100"), ("Curitiba", "PR", "80010-000"), ("Belo Horizonte", "MG", "30130-010"),
+               ("Porto Alegre", "RS", "90010-150"), ("Recife", "PE", "50030-230"), ("Goiânia", "GO", "74003-010"))
+
+
+def _data_hora(d, rng):
+    return f"{d.isoformat()} {rng.randint(7, 21):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+
+
+class DadosSinteticos:
+    """
+    Gera os payloads da API fake. Cada registro é montado sob demanda a partir de (semente, id),
+    então o mesmo volume e a mesma semente devolvem sempre os mesmos dados, sem guardar payloads
+    em memória. Em memória fica só o índice (id, dt_inclusao, dt_alteracao) de cada recurso
+    paginado, usado na paginação e nos filtros de data.
+    """
+
+    def __init__(self, volume=None, semente=FAKE_SEMENTE, dias_historico=FAKE_DIAS_HISTORICO, hoje=None):
+        self.volume = dict(FAKE_VOLUME, **(volume or {}))
+        self.semente = semente
+        self.dias_historico = max(1, int(dias_historico))
+        self.hoje = hoje or date.today()
+        self.indices = {recurso: self._montar_indice(recurso) for recurso in self.volume}
+
+    def _rng(self, recurso, id_bling):
+        return random.Random(f"{self.semente}:{recurso}:{id_bling}")
+
+    def _montar_indice(self, recurso):
+        # Mais antigos primeiro; a alteração fica entre a inclusão e hoje
+        n = int(self.volume.get(recurso, 0))
+        indice = []
+        for i in range(n):
+            rng = self._rng(recurso, i)
+            dias_atras = self.dias_historico - (i * self.dias_historico // max(n, 1))
+            inclusao = self.hoje - timedelta(days=dias_atras)
+            alteracao = inclusao + timedelta(days=rng.randint(0, dias_atras))
+            indice.append((_BASE_ID[recurso] + i + 1, inclusao, alteracao))
+        return indice
+
+    def existe(self, recurso, id_bling):
+        posicao = id_bling - _BASE_ID[recurso] - 1
+        return 0 <= posicao < len(self.indices.get(recurso, ()))
+
+    def datas(self, recurso, id_bling):
+        return self.indices[recurso][id_bling - _BASE_ID[recurso] - 1][1:]
+
+    def ids(self, recurso):
+        return [id_bling for id_bling, _, _ in self.indices.get(recurso, ())]
+
+    def _id_aleatorio(self, rng, recurso):
+        n = len(self.indices.get(recurso, ()))
+        return _BASE_ID[recurso] + rng.randint(1, n) if n else None
+
+    def _pessoa(self, rng):
+        return f"{rng.choice(_NOMES)} {rng.choice(_SOBRENOMES)}"
+
+    def empresa(self):
+        return {
+            "id": "a1b2c3d4e5f6",
+            "nome": "Loja Sintética LTDA",
+            "cnpj": "12.345.678/0001-90",
+            "email": "contato@lojasintetica.com.br",
+            "dataContrato": "2020-01-15",
+        }
+
+    def produto(self, id_bling):
+        rng = self._rng("produtos", id_bling)
+        inclusao, alteracao = self.datas("produtos", id_bling)
+        nome = f"{rng.choice(_PRODUTOS)} {rng.choice(_CORES)} {rng.choice(('P', 'M', 'G', 'GG'))}"
+        preco = round(rng.uniform(19.9, 499.9), 2)
+        composto = rng.random() < 0.05
+        return {
+            "id": id_bling,
+            "nome": nome,
+            "codigo": f"SKU-{id_bling % 1000000:06d}",
+            "preco": preco,
+            "tipo": "P",
+            "situacao": rng.choice(("A", "A", "A", "I")),
+            "formato": "E" if composto else rng.choice(("S", "S", "V")),
+            "descricaoCurta": f"<p>{nome}</p>",
+            "dataValidade": "0000-00-00",
+            "unidade": "UN",
+            "pesoLiquido": round(rng.uniform(0.1, 2.0), 3),
+            "pesoBruto": round(rng.uniform(0.2, 2.5), 3),
+            "volumes": 1,
+            "itensPorCaixa": rng.choice((1, 6, 12)),
+            "gtin": f"789{rng.randint(0, 10**10 - 1):010d}",
+            "gtinEmbalagem": "",
+            "tipoProducao": "P",
+            "condicao": 0,
+            "freteGratis": False,
+            "marca": rng.choice(("Marca A", "Marca B", "Marca C")),
+            "descricaoComplementar": "",
+            "linkExterno": "",
+            "observacoes": "",
+            "descricaoEmbalagemDiscreta": "",
+            "categoria": {"id": self._id_aleatorio(rng, "categorias_produto") or 0},
+            "estoque": {"minimo": 0, "maximo": 0, "crossdocking": 0, "localizacao": ""},
+            "actionEstoque": "",
+            "dimensoes": {"largura": rng.randint(10, 60), "altura": rng.randint(2, 40), "profundidade": rng.randint(10, 60), "unidadeMedida": 1},
+            "tributacao": {
+                "origem": 0,
+                "nFCI": "",
+                "ncm": "6109.10.00",
+                "cest": "28.038.00",
+                "codigoListaServicos": "",
+                "spedTipoItem": "00",
+                "codigoItem": "",
+                "percentualTributos": 0,
+                "valorBaseStRetencao": 0,
+                "valorStRetencao": 0,
+                "valorICMSSubstituto": 0,
+                "codigoExcecaoTipi": "",
+                "classeEnquadramentoIpi": "",
+                "valorIpiFixo": 0,
+                "codigoSeloIpi": "",
+                "valorPisFixo": 0,
+                "valorCofinsFixo": 0,
+                "codigoANP": "",
+                "descricaoANP": "",
+                "percentualGLP": 0,
+                "percentualGasNacional": 0,
+                "percentualGasImportado": 0,
+                "valorPartida": 0,
+                "tipoArmamento": 0,
+                "descricaoCompletaArmamento": "",
+                "dadosAdicionais": "",
+                "grupoProduto": {"id": self._id_aleatorio(rng, "grupos_produto") or 0},
+            },
+            "midia": {
+                "video": {"url": ""},
+                "imagens": {
+                    "externas": [],
+                    "internas": [{"link": f"https://orgbling.s3.amazonaws.com/fake/{id_bling}.jpg", "linkMiniatura": "", "validade": "", "ordem": 1, "anexo": {"id": 0}, "anexoVinculo": {"id": 0}}],
+                },
+            },
+            "linhaProduto": {"id": 0},
+            "estrutura": {"tipoEstoque": "F", "lancamentoEstoque": "A", "componentes": []},
+            "camposCustomizados": [],
+            "variacoes": [],
+            "fornecedor": {
+                "id": 0,
+                "contato": {"id": 0, "nome": ""},
+                "codigo": "",
+                "precoCusto": round(preco * rng.uniform(0.3, 0.6), 2),
+                "precoCompra": 0,
+            },
+            "dataInclusao": _data_hora(inclusao, rng),
+            "dataAlteracaoFinal": _data_hora(alteracao, rng),
+        }
+
+    def estrutura(self, id_bling):
+        """
+        Estrutura (composição) de um produto formato "E"; None para os demais.
+        """
+        if self.produto(id_bling)["formato"] != "E":
+            return None
+        rng = self._rng("estruturas", id_bling)
+        return {
+            "tipoEstoque": "F",
+            "lancamentoEstoque": rng.choice(("A", "M", "P")),
+            "componentes": [
+                {"produto": {"id": self._id_aleatorio(rng, "produtos")}, "quantidade": rng.randint(1, 4)}
+                for _ in range(rng.randint(2, 5))
+            ],
+        }
+
+    def saldo(self, id_bling):
+        rng = self._rng("saldos", id_bling)
+        depositos = []
+        for id_deposito in self.ids("depositos"):
+            fisico = rng.randint(0, 300)
+            depositos.append({"id": id_deposito, "saldoFisico": fisico, "saldoVirtual": fisico - rng.randint(0, min(fisico, 10))})
+        return {
+            "produto": {"id": id_bling, "codigo": f"SKU-{id_bling % 1000000:06d}"},
+            "saldoFisicoTotal": sum(d["saldoFisico"] for d in depositos),
+            "saldoVirtualTotal": sum(d["saldoVirtual"] for d in depositos),
+            "depositos": depositos,
+        }
+
+    def pedido(self, id_bling):
+        rng = self._rng("pedidos", id_bling)
+        inclusao, _ = self.datas("pedidos", id_bling)
+        itens = []
+        for _ in range(rng.randint(1, 5)):
+            id_produto = self._id_aleatorio(rng, "produtos") or 0
+            valor = round(rng.uniform(19.9, 499.9), 2)
+            itens.append({
+                "id": rng.randint(10**9, 10**10),
+                "codigo": f"SKU-{id_produto % 1000000:06d}",
+                "unidade": "UN",
+                "quantidade": rng.randint(1, 3),
+                "desconto": 0,
+                "valor": valor,
+                "aliquotaIPI": 0,
+                "descricao": f"{rng.choice(_PRODUTOS)} {rng.choice(_CORES)}",
+                "descricaoDetalhada": "",
+                "produto": {"id": id_produto},
+                "comissao": {"base": valor, "aliquota": 0, "valor": 0},
+            })
+        total_produtos = round(sum(i["valor"] * i["quantidade"] for i in itens), 2)
+        frete = round(rng.choice((0, 0, 15.9, 29.9)), 2)
+        total = round(total_produtos + frete, 2)
+        id_contato = self._id_aleatorio(rng, "contatos") or 0
+        parcelas = rng.choice((1, 1, 2, 3))
+        return {
+            "id": id_bling,
+            "numero": id_bling - _BASE_ID["pedidos"],
+            "numeroLoja": f"LJ-{rng.randint(10**7, 10**8)}",
+            "data": inclusao.isoformat(),
+            "dataSaida": (inclusao + timedelta(days=rng.randint(0, 3))).isoformat(),
+            "dataPrevista": (inclusao + timedelta(days=rng.randint(3, 10))).isoformat(),
+            "totalProdutos": total_produtos,
+            "total": total,
+            "contato": {
+                "id": id_contato,
+                "nome": self._pessoa(rng),
+                "tipoPessoa": rng.choice(("F", "J")),
+                "numeroDocumento": f"{rng.randint(10**10, 10**11 - 1)}",
+            },
+            "situacao": {"id": rng.choice((6, 9, 12, 15)), "valor": rng.randint(0, 3)},
+            "loja": {"id": self._id_aleatorio(rng, "canais_venda") or 0},
+            "numeroPedidoCompra": "",
+            "outrasDespesas": 0,
+            "observacoes": "",
+            "observacoesInternas": "",
+            "desconto": {"valor": 0, "unidade": "REAL"},
+            "categoria": {"id": self._id_aleatorio(rng, "categorias_receita_despesa") or 0},
+            "notaFiscal": {"id": rng.choice((0, rng.randint(10**9, 10**10)))},
+            "tributacao": {"totalICMS": round(total * 0.18, 2), "totalIPI": 0},
+            "itens": itens,
+            "parcelas": [
+                {
+                    "id": rng.randint(10**9, 10**10),
+                    "dataVencimento": (inclusao + timedelta(days=30 * (p + 1))).isoformat(),
+                    "valor": round(total / parcelas, 2),
+                    "observacoes": "",
+                    "formaPagamento": {"id": rng.randint(1000, 1010)},
+                }
+                for p in range(parcelas)
+            ],
+            "transporte": {
+                "fretePorConta": 0,
+                "frete": frete,
+                "quantidadeVolumes": 1,
+                "pesoBruto": round(rng.uniform(0.2, 5.0), 3),
+                "prazoEntrega": rng.randint(2, 15),
+                "contato": {"id": 0, "nome": "Transportadora Sintética"},
+                "etiqueta": {},
+                "volumes": [{"id": rng.randint(10**9, 10**10), "servico": "SEDEX", "codigoRastreamento": ""}],
+            },
+            "vendedor": {"id": self._id_aleatorio(rng, "vendedores") or 0},
+            "intermediador": {"cnpj": "", "nomeUsuario": ""},
+            "taxas": {"taxaComissao": 0, "custoFrete": 0, "valorBase": total},
+        }
+
+    def contato(self, id_bling):
+        rng = self._rng("contatos", id_bling)
+        inclusao, alteracao = self.datas("contatos", id_bling)
+        nome = self._pessoa(rng)
+        municipio, uf, cep = rng.choice(_MUNICIPIOS)
+        pessoa_juridica = rng.random() < 0.3
+        return {
+            "id": id_bling,
+            "nome": nome,
+            "codigo": f"C{id_bling % 1000000:06d}",
+            "situacao": rng.choice(("A", "A", "A", "I")),
+            "numeroDocumento": f"{rng.randint(10**13, 10**14 - 1)}" if pessoa_juridica else f"{rng.randint(10**10, 10**11 - 1)}",
+            "telefone": f"(11) 3{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            "celular": f"(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+            "fantasia": nome if pessoa_juridica else "",
+            "tipo": "J" if pessoa_juridica else "F",
+            "indicadorIe": 1 if pessoa_juridica else 9,
+            "ie": f"{rng.randint(10**8, 10**9)}" if pessoa_juridica else "",
+            "rg": "" if pessoa_juridica else f"{rng.randint(10**7, 10**8)}",
+            "inscricaoMunicipal": "",
+            "orgaoEmissor": "" if pessoa_juridica else "SSP",
+            "email": f"{nome.split()[0].lower()}.{id_bling % 100000}@exemplo.com.br",
+            "emailNotaFiscal": "",
+            "endereco": {
+                "geral": {
+                    "endereco": f"Rua {rng.choice(_SOBRENOMES)}",
+                    "cep": cep,
+                    "bairro": "Centro",
+                    "municipio": municipio,
+                    "uf": uf,
+                    "numero": str(rng.randint(1, 3000)),
+                    "complemento": "",
+                },
+                "cobranca": {"endereco": "", "cep": "", "bairro": "", "municipio": "", "uf": "", "numero": "", "complemento": ""},
+            },
+            "vendedor": {"id": self._id_aleatorio(rng, "vendedores") or 0},
+            "dadosAdicionais": {"dataNascimento": "0000-00-00", "sexo": "", "naturalidade": ""},
+            "financeiro": {"limiteCredito": 0, "condicaoPagamento": "", "categoria": {"id": 0}},
+            "pais": {"nome": "Brasil"},
+            "tiposContato": [],
+            "pessoasContato": [],
+            "dataInclusao": _data_hora(inclusao, rng),
+            "dataAlteracao": _data_hora(alteracao, rng),
+        }
+
+    def vendedor(self, id_bling):
+        rng = self._rng("vendedores", id_bling)
+        return {
+            "id": id_bling,
+            "descontoLimite": rng.choice((0, 5, 10, 15)),
+            "loja": {"id": self._id_aleatorio(rng, "canais_venda") or 0},
+            "contato": {"id": self._id_aleatorio(rng, "contatos") or 0, "nome": self._pessoa(rng), "situacao": "A"},
+            "comissoes": [{"descontoMaximo": 10, "aliquota": rng.choice((1, 2, 3, 5))}],
+        }
+
+    def deposito(self, id_bling):
+        posicao = id_bling - _BASE_ID["depositos"]
+        return {
+            "id": id_bling,
+            "descricao": "Geral" if posicao == 1 else f"Depósito {posicao}",
+            "situacao": 1,
+            "padrao": posicao == 1,
+            "desconsiderarSaldo": False,
+        }
+
+    def categoria_produto(self, id_bling):
+        posicao = id_bling - _BASE_ID["categorias_produto"]
+        pai = _BASE_ID["categorias_produto"] + 1 + (posicao - 1) // 5 if posicao > 5 else 0
+        return {"id": id_bling, "descricao": f"Categoria {posicao}", "categoriaPai": {"id": pai}}
+
+    def grupo_produto(self, id_bling):
+        posicao = id_bling - _BASE_ID["grupos_produto"]
+        pai = _BASE_ID["grupos_produto"] + 1 if posicao > 3 else None
+        return {"id": id_bling, "nome": f"Grupo {posicao}", "grupoProdutoPai": {"id": pai} if pai else None}
+
+    def canal_venda(self, id_bling):
+        posicao = id_bling - _BASE_ID["canais_venda"]
+        tipos = ("Api", "Mercadolivre", "Shopee", "Amazon", "Magalu")
+        return {"id": id_bling, "descricao": f"Loja {posicao}", "tipo": tipos[(posicao - 1) % len(tipos)], "situacao": 1}
+
+    def categoria_receita_despesa(self, id_bling):
+        posicao = id_bling - _BASE_ID["categorias_receita_despesa"]
+        pai = _BASE_ID["categorias_receita_despesa"] + 1 + (posicao - 1) % 4 if posicao > 4 else 0
+        return {"id": id_bling, "idCategoriaPai": pai, "descricao": f"Categoria financeira {posicao}", "tipo": 1 if posicao % 2 else 2}
+# endregion
+
+# region ROTAS
+_RE_ID = r"(\d+)"
+_FILTROS_DATA = (
+    # (parâmetro inicial, parâmetro final, posição no índice: 1 = inclusão, 2 = alteração)
+    ("dataInicial", "dataFinal", 1),
+    ("dataInclusaoInicial", "dataInclusaoFinal", 1),
+    ("dataAlteracaoInicial", "dataAlteracaoFinal", 2),
+)
+_LIMITE_PAGINA = 100
+_INTERVALO_MAXIMO_DIAS = 366  # a API recusa (400) filtros de data com mais de 1 ano
+
+
+class ErroApi(Exception):
+    """
+    Resposta de erro da API fake, no formato de erro da API v3.
+    """
+
+    def __init__(self, status, tipo, mensagem, descricao="", **extra):
+        super().__init__(mensagem)
+        self.status = status
+        self.corpo = {"error": dict({"type": tipo, "message": mensagem, "description": descricao}, **extra)}
+
+
+def _parse_data(valor):
+    try:
+        return date.fromisoformat(str(valor).strip()[:10])
+    except ValueError:
+        raise ErroApi(400, "VALIDATION_ERROR", "Não foi possível validar os dados", f"Data inválida: {valor}")
+
+
+def _filtrar_por_data(indice, params):
+    for inicial, final, posicao in _FILTROS_DATA:
+        if inicial not in params and final not in params:
+            continue
+        ini = _parse_data(params[inicial]) if inicial in params else date.min
+        fim = _parse_data(params[final]) if final in params else date.max
+        if inicial in params and final in params and (fim - ini).days > _INTERVALO_MAXIMO_DIAS:
+            raise ErroApi(400, "VALIDATION_ERROR", "Não foi possível validar os dados",
+                          "O intervalo entre as datas não pode ser maior que 1 ano")
+        indice = [linha for linha in indice if ini <= linha[posicao] <= fim]
+    return indice
+
+
+def _paginar(itens, params):
+    # Aceita pagina/limite (métodos *_ids_pagina) e page/limit (iter_paginas)
+    pagina = max(int(params.get("pagina") or params.get("page") or 1), 1)
+    limite = min(max(int(params.get("limite") or params.get("limit") or _LIMITE_PAGINA), 1), _LIMITE_PAGINA)
+    return itens[(pagina - 1) * limite:pagina * limite]
+
+
+def _lista(dados, recurso, montar, params, resumo=None):
+    indice = _filtrar_por_data(dados.indices.get(recurso, []), params)
+    pagina = _paginar(indice, params)
+    montar_item = resumo or montar
+    return {"data": [montar_item(id_bling) for id_bling, _, _ in pagina]}
+
+
+def _detalhe(dados, recurso, montar, id_bling):
+    if not dados.existe(recurso, id_bling):
+        raise ErroApi(404, "RESOURCE_NOT_FOUND", "Recurso não encontrado", f"{recurso} {id_bling} não existe")
+    return {"data": montar(id_bling)}
+
+
+def _saldos(dados, params):
+    ids = params.get("idsProdutos[]") or []
+    if not ids:
+        raise ErroApi(400, "VALIDATION_ERROR", "Não foi possível validar os dados", "Informe idsProdutos[]")
+    return {"data": [dados.saldo(int(i)) for i in ids if str(i).isdigit() and dados.existe("produtos", int(i))]}
+
+
+def _estrutura(dados, id_bling):
+    estrutura = dados.estrutura(id_bling) if dados.existe("produtos", id_bling) else None
+    if estrutura is None:
+        raise ErroApi(404, "RESOURCE_NOT_FOUND", "Recurso não encontrado", f"Produto {id_bling} não possui estrutura")
+    return {"data": estrutura}
+
+
+def _resumo_produto(dados):
+    def resumo(id_bling):
+        p = dados.produto(id_bling)
+        return {k: p[k] for k in ("id", "nome", "codigo", "preco", "tipo", "situacao", "formato", "descricaoCurta", "imagemURL") if k in p}
+    return resumo
+
+
+def _resumo_pedido(dados):
+    def resumo(id_bling):
+        p = dados.pedido(id_bling)
+        return {k: p[k] for k in ("id", "numero", "numeroLoja", "data", "dataSaida", "dataPrevista", "totalProdutos", "total", "contato", "situacao", "loja")}
+    return resumo
+
+
+def _resumo_contato(dados):
+    def resumo(id_bling):
+        c = dados.contato(id_bling)
+        return {k: c[k] for k in ("id", "nome", "codigo", "situacao", "numeroDocumento", "telefone", "celular")}
+    return resumo
+
+
+def montar_rotas(dados):
+    """
+    Lista de (regex do caminho, função(params, *grupos) -> corpo JSON) dos endpoints GET
+    que o BlingAPI usa. Caminhos relativos a /Api/v3.
+    """
+    return [
+        (r"empresas/me/dados-basicos", lambda p: {"data": dados.empresa()}),
+        (r"produtos", lambda p: _lista(dados, "produtos", dados.produto, p, resumo=_resumo_produto(dados))),
+        (rf"produtos/estruturas/{_RE_ID}", lambda p, i: _estrutura(dados, int(i))),
+        (rf"produtos/{_RE_ID}", lambda p, i: _detalhe(dados, "produtos", dados.produto, int(i))),
+        (r"estoques/saldos", lambda p: _saldos(dados, p)),
+        (r"depositos", lambda p: _lista(dados, "depositos", dados.deposito, p)),
+        (r"categorias/produtos", lambda p: _lista(dados, "categorias_produto", dados.categoria_produto, p)),
+        (r"categorias/receitas-despesas", lambda p: _lista(dados, "categorias_receita_despesa", dados.categoria_receita_despesa, p)),
+        (rf"categorias/receitas-despesas/{_RE_ID}", lambda p, i: _detalhe(dados, "categorias_receita_despesa", dados.categoria_receita_despesa, int(i))),
+        (r"grupos-produtos", lambda p: _lista(dados, "grupos_produto", dados.grupo_produto, p)),
+        (r"canais-venda", lambda p: _lista(dados, "canais_venda", dados.canal_venda, p)),
+        (r"vendedores", lambda p: _lista(dados, "vendedores", dados.vendedor, p)),
+        (rf"vendedores/{_RE_ID}", lambda p, i: _detalhe(dados, "vendedores", dados.vendedor, int(i))),
+        (r"contatos", lambda p: _lista(dados, "contatos", dados.contato, p, resumo=_resumo_contato(dados))),
+        (rf"contatos/{_RE_ID}", lambda p, i: _detalhe(dados, "contatos", dados.contato, int(i))),
+        (r"pedidos/vendas", lambda p: _lista(dados, "pedidos", dados.pedido, p, resumo=_resumo_pedido(dados))),
+        (rf"pedidos/vendas/{_RE_ID}", lambda p, i: _detalhe(dados, "pedidos", dados.pedido, int(i))),
+    ]
+# endregion
+
+# region SERVIDOR
+class ServidorBlingFake:
+    """
+    Servidor HTTP local que imita a API v3 do Bling para benchmarks e testes da carga.
+    - GET dos endpoints usados pelo BlingAPI (montar_rotas) e POST /oauth/token
+    - Bearer token obrigatório (401 se inválido/expirado); tokens emitidos por emitir_token() e /oauth/token
+    - Limites da API real: limite_segundo req/s e limite_diario req/dia -> 429 com error.period
+      ("second"/"day"); 600 requisições ou 300 erros em 10s -> IP bloqueado (403) por bloqueio_ip
+      segundos; mais de 20 chamadas a /oauth/token em 60s -> 429 e bloqueio por bloqueio_token segundos
+    - Latência simulada por resposta: latencia_ms +- jitter_ms
+    Uso: with ServidorBlingFake(porta=0) as servidor: ... servidor.url_api ...
+    """
+
+    def __init__(
+        self,
+        host=FAKE_HOST,
+        porta=FAKE_PORTA,
+        dados=None,
+        latencia_ms=FAKE_LATENCIA_MS,
+        jitter_ms=FAKE_LATENCIA_JITTER_MS,
+        limite_segundo=FAKE_LIMITE_SEGUNDO,
+        limite_diario=FAKE_LIMITE_DIARIO,
+        bloqueio_ip=FAKE_BLOQUEIO_IP_ESPERA,
+        bloqueio_token=FAKE_BLOQUEIO_TOKEN_ESPERA,
+        token_expira=FAKE_TOKEN_EXPIRA,
+        exigir_token=True,
+    ):
+        self.dados = dados or DadosSinteticos()
+        self.latencia = max(float(latencia_ms), 0.0) / 1000
+        self.jitter = max(float(jitter_ms), 0.0) / 1000
+        self.limite_segundo = int(limite_segundo)
+        self.limite_diario = int(limite_diario)
+        self.bloqueio_ip = float(bloqueio_ip)
+        self.bloqueio_token = float(bloqueio_token)
+        self.token_expira = int(token_expira)
+        self.exigir_token = exigir_token
+        self._rotas = [(re.compile(padrao + r"/?$"), funcao) for padrao, funcao in montar_rotas(self.dados)]
+
+        self._lock = threading.Lock()
+        self._por_segundo = JanelaDeslizante(1)
+        self._requisicoes = JanelaDeslizante(CB_JANELA_SEGUNDOS)
+        self._erros = JanelaDeslizante(CB_JANELA_SEGUNDOS)
+        self._token = JanelaDeslizante(CB_JANELA_TOKEN_SEGUNDOS)
+        self._bloqueado_ate = 0.0
+        self._dia = date.today()
+        self._usado_dia = 0
+        self._tokens = {}  # access_token -> expira em (time.time())
+        self._refresh_tokens = set()
+        self._contagem = {}  # status HTTP -> respostas
+        self.total_bloqueios = 0
+
+        self._httpd = ThreadingHTTPServer((host, porta), _criar_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    # Endereços
+    @property
+    def porta(self):
+        return self._httpd.server_address[1]
+
+    @property
+    def url_api(self):
+        return f"http://{self._httpd.server_address[0]}:{self.porta}/Api/v3"
+
+    @property
+    def url_token(self):
+        return f"{self.url_api}/oauth/token"
+
+    # Ciclo de vida
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-bling", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def servir(self):
+        """
+        Atende em primeiro plano até Ctrl+C (uso pelo script fake_bling.py).
+        """
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    # Tokens
+    def emitir_token(self):
+        """
+        Emite um par access/refresh válido (para gravar em conf.token antes da carga).
+        """
+        access_token = secrets.token_hex(20)
+        refresh_token = secrets.token_hex(20)
+        with self._lock:
+            self._tokens[access_token] = time.time() + self.token_expira
+            self._refresh_tokens.add(refresh_token)
+        return {"access_token": access_token, "refresh_token": refresh_token, "expires_in": self.token_expira,
+                "token_type": "Bearer", "scope": ""}
+
+    def _token_valido(self, cabecalho):
+        if not self.exigir_token:
+            return True
+        token = (cabecalho or "").removeprefix("Bearer ").strip()
+        with self._lock:
+            expira = self._tokens.get(token)
+        return expira is not None and expira > time.time()
+
+    def _renovar_token(self, corpo):
+        params = parse_qs(corpo)
+        refresh_token = (params.get("refresh_token") or [""])[0]
+        if params.get("grant_type", [""])[0] != "refresh_token":
+            raise ErroApi(400, "invalid_request", "grant_type inválido")
+        with self._lock:
+            valido = refresh_token in self._refresh_tokens or not self.exigir_token
+            self._refresh_tokens.discard(refresh_token)
+        if not valido:
+            raise ErroApi(400, "invalid_grant", "Invalid refresh token")
+        return self.emitir_token()
+
+    # Limites
+    def _bloquear(self, segundos, agora):
+        self._bloqueado_ate = max(self._bloqueado_ate, agora + segundos)
+        self.total_bloqueios += 1
+
+    def _verificar_bloqueio(self, agora, token=False):
+        # Chamado com self._lock; registra a requisição nas janelas de 10s (e de 60s no token)
+        if agora < self._bloqueado_ate:
+            raise ErroApi(403, "FORBIDDEN", "IP bloqueado temporariamente",
+                          f"Bloqueado por {int(self._bloqueado_ate - agora)}s por excesso de requisições")
+        self._requisicoes.registrar(agora)
+        if self._requisicoes.contar(agora) >= CB_LIMITE_REQUISICOES:
+            self._bloquear(self.bloqueio_ip, agora)
+            raise ErroApi(403, "FORBIDDEN", "IP bloqueado temporariamente",
+                          f"Mais de {CB_LIMITE_REQUISICOES} requisições em {CB_JANELA_SEGUNDOS}s")
+        if token:
+            self._token.registrar(agora)
+            if self._token.contar(agora) > CB_LIMITE_TOKEN:
+                self._bloquear(self.bloqueio_token, agora)
+                raise ErroApi(429, "TOO_MANY_REQUESTS", "IP bloqueado temporariamente",
+                              f"Mais de {CB_LIMITE_TOKEN} chamadas a /oauth/token em {CB_JANELA_TOKEN_SEGUNDOS}s")
+
+    def _verificar_limites(self, agora):
+        # Chamado com self._lock, depois da autenticação: só requisições aceitas contam no limite
+        if self._por_segundo.contar(agora) >= self.limite_segundo:
+            raise ErroApi(429, "TOO_MANY_REQUESTS", "Limite de requisições atingido.",
+                          f"Limite de {self.limite_segundo} requisições por segundo", period="second")
+        if self._dia != date.today():
+            self._dia, self._usado_dia = date.today(), 0
+        if self._usado_dia >= self.limite_diario:
+            raise ErroApi(429, "TOO_MANY_REQUESTS", "Limite de requisições atingido.",
+                          f"Limite de {self.limite_diario} requisições por dia", period="day")
+        self._por_segundo.registrar(agora)
+        self._usado_dia += 1
+
+    def _registrar_status(self, status, agora):
+        with self._lock:
+            self._contagem[status] = self._contagem.get(status, 0) + 1
+            if status >= 400:
+                self._erros.registrar(agora)
+                if self._erros.contar(agora) >= CB_LIMITE_ERROS and agora >= self._bloqueado_ate:
+                    self._bloquear(self.bloqueio_ip, agora)
+
+    # Atendimento
+    def atender(self, metodo, caminho, params, cabecalho_auth, corpo=""):
+        """
+        Processa uma requisição e devolve (status, corpo JSON). Independente do HTTP, para testes diretos.
+        """
+        agora = time.monotonic()
+        rota = re.sub(r"^/?(Api/v3/?)?", "", caminho, flags=re.IGNORECASE).strip("/")
+        try:
+            if metodo == "POST":
+                if rota != "oauth/token":
+                    raise ErroApi(404, "RESOURCE_NOT_FOUND", "Recurso não encontrado", rota)
+                with self._lock:
+                    self._verificar_bloqueio(agora, token=True)
+                status, resposta = 200, self._renovar_token(corpo)
+            else:
+                with self._lock:
+                    self._verificar_bloqueio(agora)
+                if not self._token_valido(cabecalho_auth):
+                    raise ErroApi(401, "invalid_token", "invalid_token", "Token inválido ou expirado")
+                with self._lock:
+                    self._verificar_limites(agora)
+                status, resposta = 200, self._rotear(rota, params)
+        except ErroApi as erro:
+            status, resposta = erro.status, erro.corpo
+        except (ValueError, TypeError) as erro:
+            status, resposta = 400, ErroApi(400, "VALIDATION_ERROR", "Parâmetro inválido", str(erro)).corpo
+        self._registrar_status(status, agora)
+        return status, resposta
+
+    def _rotear(self, rota, params):
+        for padrao, funcao in self._rotas:
+            casou = padrao.match(rota)
+            if casou:
+                return funcao(params, *casou.groups())
+        raise ErroApi(404, "RESOURCE_NOT_FOUND", "Recurso não encontrado", rota)
+
+    def atraso(self):
+        if self.latencia or self.jitter:
+            time.sleep(max(self.latencia + random.uniform(-self.jitter, self.jitter), 0.0))
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "respostas": dict(sorted(self._contagem.items())),
+                "usado_dia": self._usado_dia,
+                "bloqueios": self.total_bloqueios,
+                "bloqueado_por": round(max(self._bloqueado_ate - time.monotonic(), 0.0), 1),
+            }
+
+
+def _criar_handler(servidor):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, como a sessão do BlingAPI espera
+
+        def _responder(self, metodo, corpo=""):
+            url = urlsplit(self.path)
+            params = {
+                chave: valores if chave.endswith("[]") else valores[-1]
+                for chave, valores in parse_qs(url.query).items()
+            }
+            servidor.atraso()
+            status, resposta = servidor.atender(metodo, url.path, params, self.headers.get("Authorization"), corpo)
+            conteudo = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(conteudo)))
+            self.end_headers()
+            self.wfile.write(conteudo)
+
+        def do_GET(self):
+            self._responder("GET")
+
+        def do_POST(self):
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            self._responder("POST", self.rfile.read(tamanho).decode("utf-8") if tamanho else "")
+
+        def log_message(self, formato, *args):
+            pass  # sem log por requisição: o servidor é usado em benchmarks
+
+    return Handler
+# endregion
@@ -1,6 +1,6 @@
 # region IMPORTS
-import psycopg2
 from datetime import datetime, timedelta
+from src.conexao import conexao
 # endregion
 
 # region LOG DE TROUBLESHOOTING (stdout)
@@ -26,8 +26,7 @@ def iniciar_log_etl(db_uri, tabela, acao):
     Insere um registro de início de carga na tabela conf.log.
     Retorna o id_log gerado (para atualizar depois).
     """
-    conn = psycopg2.connect(db_uri)
-    with conn:
+    with conexao(db_uri) as conn:
         with conn.cursor() as cur:
             sql = """
                 INSERT INTO conf.log (tabela, acao, status, dt_inicio)
@@ -43,8 +42,7 @@ def finalizar_log_etl(db_uri, id_log, status='finalizado', mensagem_erro=None):
     Atualiza o registro de log iniciado, mudando status para 'finalizado' ou 'erro',
     registrando data/hora do fim e mensagem de erro, se houver.
     """
-    conn = psycopg2.connect(db_uri)
-    with conn:
+    with conexao(db_uri) as conn:
         with conn.cursor() as cur:
             sql = """
                 UPDATE conf.log
@@ -0,0 +1,123 @@
+# region IMPORTS
+import json
+import os
+import statistics
+import timeit
+from src.arquivo_bruto import listar_arquivos_brutos, ler_arquivo_bruto
+from src.config import BENCH_FIXTURES_DIR, BENCH_MICRO_REPETICOES, BENCH_MICRO_LIMITE_BRUTO, RAW_DIR
+from src.date_utils import parse_date_safe
+from src.transformers import map_produtos, map_pedido_venda, map_contato
+# endregion
+
+# region PAYLOADS
+# entidade (nome na zona bruta) -> arquivo em BENCH_FIXTURES_DIR
+_FIXTURES = {
+    "produto": "produtos.json",
+    "pedido_venda": "pedidos_vendas.json",
+    "contato": "contatos.json",
+}
+_FIXTURE_DATAS = "datas.json"  # {grupo de formato: [strings]} para o parse_date_safe
+
+
+def carregar_fixture(arquivo, diretorio=BENCH_FIXTURES_DIR):
+    with open(os.path.join(diretorio, arquivo), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def carregar_zona_bruta(entidade, limite=BENCH_MICRO_LIMITE_BRUTO, diretorio=RAW_DIR):
+    """
+    Payloads reais da entidade gravados pela carga (zona bruta), dos arquivos mais recentes.
+    """
+    payloads = []
+    for _, _, caminho in reversed(listar_arquivos_brutos(entidade, diretorio=diretorio)):
+        for linha in ler_arquivo_bruto(caminho):
+            payloads.append(linha["dados"])
+            if len(payloads) >= limite:
+                return payloads
+    return payloads
+
+
+def carregar_payloads(zona_bruta=False, diretorio_fixtures=BENCH_FIXTURES_DIR, diretorio_bruto=RAW_DIR):
+    """
+    {entidade: [payloads]} para os map_* e {"datas": {grupo: [strings]}} para o parse_date_safe.
+    zona_bruta=True troca as fixtures pelos payloads da zona bruta (a entidade sem arquivos
+    continua com a fixture).
+    """
+    payloads = {}
+    for entidade, arquivo in _FIXTURES.items():
+        registros = carregar_zona_bruta(entidade, diretorio=diretorio_bruto) if zona_bruta else []
+        payloads[entidade] = registros or carregar_fixture(arquivo, diretorio_fixtures)
+    payloads["datas"] = carregar_fixture(_FIXTURE_DATAS, diretorio_fixtures)
+    return payloads
+# endregion
+
+# region CASOS
+def montar_casos(payloads):
+    """
+    Lista de (nome, função sem argumentos, registros processados por chamada).
+    Os map_* são chamados como na carga: map_produtos com a página inteira, map_pedido_venda
+    e map_contato um detalhe por vez. parse_date_safe tem um caso por formato de data, já que
+    o custo depende de quantos formatos ele tenta antes de acertar (ou desistir).
+    """
+    produtos = payloads["produto"]
+    pedidos = payloads["pedido_venda"]
+    contatos = payloads["contato"]
+    casos = [
+        ("map_produtos", lambda: map_produtos(produtos), len(produtos)),
+        ("map_pedido_venda", lambda: [map_pedido_venda(p) for p in pedidos], len(pedidos)),
+        ("map_contato", lambda: [map_contato(c) for c in contatos], len(contatos)),
+    ]
+    for grupo, valores in payloads["datas"].items():
+        casos.append((f"parse_date_safe[{grupo}]", lambda v=valores: [parse_date_safe(x) for x in v], len(valores)))
+    return casos
+# endregion
+
+# region MEDIÇÃO
+def medir(fn, repeticoes=BENCH_MICRO_REPETICOES):
+    """
+    Tempos (s) por chamada de fn em cada repetição. O número de chamadas por repetição é
+    calibrado pelo timeit.autorange (>= 0.2s por repetição).
+    """
+    timer = timeit.Timer(fn)
+    chamadas, _ = timer.autorange()
+    return chamadas, [t / chamadas for t in timer.repeat(repeat=repeticoes, number=chamadas)]
+
+
+def executar_micro_benchmark(filtro=None, zona_bruta=False, repeticoes=BENCH_MICRO_REPETICOES, diretorio_fixtures=BENCH_FIXTURES_DIR):
+    """
+    Mede cada caso (filtro: trecho do nome, ex.: "parse_date") e devolve {caso: métricas}.
+    O melhor tempo é a referência para comparar commits (menos sujeito a ruído da máquina).
+    """
+    payloads = carregar_payloads(zona_bruta, diretorio_fixtures)
+    resultado = {}
+    for nome, fn, registros in montar_casos(payloads):
+        if filtro and filtro not in nome:
+            continue
+        chamadas, tempos = medir(fn, repeticoes)
+        melhor = min(tempos)
+        resultado[nome] = {
+            "registros": registros,
+            "chamadas_por_repeticao": chamadas,
+            "repeticoes": repeticoes,
+            "melhor_us": round(melhor * 1e6, 2),
+            "mediana_us": round(statistics.median(tempos) * 1e6, 2),
+            "desvio_us": round(statistics.pstdev(tempos) * 1e6, 2),
+            "por_registro_us": round(melhor / registros * 1e6, 3) if registros else None,
+            "registros_s": round(registros / melhor, 1) if melhor else None,
+        }
+    return resultado
+
+
+def comparar_micro(base, novo):
+    """
+    {caso: (por_registro_us base, novo, variação %)} para os casos presentes nos dois resultados.
+    """
+    comparacao = {}
+    for caso, metricas in novo.get("casos", {}).items():
+        anterior = base.get("casos", {}).get(caso)
+        if not anterior:
+            continue
+        va, vb = anterior["por_registro_us"], metricas["por_registro_us"]
+        comparacao[caso] = (va, vb, round((vb - va) / va * 100, 1) if va and vb is not None else None)
+    return comparacao
+# endregion
@@ -0,0 +1,160 @@
+# region IMPORTS
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Callable
+from src.config import ORQUESTRADOR_MAX_PARALELO
+from src.log import log_etl
+# endregion
+
+# region REGISTRO DE TAREFAS
+@dataclass
+class Tarefa:
+    nome: str
+    fn: Callable
+    depende_de: tuple = ()
+    habilitada: bool = True
+    mensagem_desligada: str = ""
+    recurso: str = None
+    custo: Callable = None
+    prioridade: str = "normal"
+
+
+_TAREFAS = {}  # nome -> Tarefa, na ordem de registro
+_TAREFAS_LOCK = threading.Lock()
+
+
+def registrar_tarefa(nome, fn, depende_de=(), habilitada=True, mensagem_desligada=None, recurso=None, custo=None, prioridade="normal"):
+    """
+    Registra uma etapa de carga no DAG.
+    - depende_de: nomes de tarefas já registradas que precisam terminar antes (ex.: ESTRUTURA -> PRODUTO)
+    - habilitada: flag RODAR_* da etapa; tarefa desligada não roda, mas libera as dependentes
+    - recurso: recurso da API consumido pela etapa (ex.: "estoques/saldos"), para a cota diária
+    - custo: função sem argumentos que estima as requisições da etapa (avaliada só ao liberar a tarefa);
+      sem ela, vale a média histórica do recurso
+    - prioridade: "critica" | "normal" | "baixa"; só "baixa" é adiada quando a estimativa não cabe na cota
+    Exigir dependências já registradas garante que o grafo não tem ciclos.
+    """
+    depende_de = tuple(depende_de)
+    with _TAREFAS_LOCK:
+        faltando = [d for d in depende_de if d not in _TAREFAS]
+        if faltando:
+            raise ValueError(f"Tarefa {nome}: dependências não registradas {faltando}")
+        _TAREFAS[nome] = Tarefa(
+            nome=nome,
+            fn=fn,
+            depende_de=depende_de,
+            habilitada=habilitada,
+            mensagem_desligada=mensagem_desligada or f"Carga {nome} está desligada",
+            recurso=recurso,
+            custo=custo,
+            prioridade=prioridade,
+        )
+    return fn
+
+
+def tarefa(nome, depende_de=(), habilitada=True, mensagem_desligada=None, recurso=None, custo=None, prioridade="normal"):
+    """
+    Decorador de registrar_tarefa. A função continua podendo ser chamada direto (ex.: numa célula).
+    """
+    def decorador(fn):
+        return registrar_tarefa(nome, fn, depende_de, habilitada, mensagem_desligada, recurso, custo, prioridade)
+    return decorador
+
+
+def tarefas_registradas():
+    with _TAREFAS_LOCK:
+        return list(_TAREFAS.values())
+
+
+def limpar_tarefas():
+    """
+    Esvazia o registro (ao reexecutar as células de definição no Jupyter).
+    """
+    with _TAREFAS_LOCK:
+        _TAREFAS.clear()
+# endregion
+
+# region EXECUÇÃO DO DAG
+def _executar(t):
+    inicio = time.time()
+    t.fn()
+    return time.time() - inicio
+
+
+def _cabe_na_cota(t, cota):
+    # Planejamento antes de liberar a tarefa: estimativa da etapa x disponível do recurso
+    if cota is None or not t.recurso:
+        return True
+    estimativa = None
+    if t.custo:
+        try:
+            estimativa = t.custo()
+        except Exception as e:
+            log_etl(t.nome, "WARN", "Falha ao estimar requisições; usando média histórica", erro=str(e))
+    return cota.avaliar_etapa(t.nome, t.recurso, estimativa, t.prioridade)
+
+
+def executar_dag(max_paralelo=ORQUESTRADOR_MAX_PARALELO, tarefas=None, cota=None):
+    """
+    Executa as tarefas respeitando as dependências; tarefas independentes rodam em paralelo
+    (até max_paralelo), todas dividindo o mesmo rate limiter da API e o mesmo pool do Postgres.
+    - Dependência desligada conta como satisfeita (usa o que já está na stage).
+    - Dependência com erro faz a dependente ser pulada; as demais seguem.
+    - Com cota (CotaDiaria), tarefas de prioridade "baixa" cuja estimativa de requisições
+      não cabe no disponível são adiadas (contam como satisfeitas, como as desligadas).
+    Ao final relança o primeiro erro (se houver). Retorna {nome: status}.
+    """
+    tarefas = list(tarefas or tarefas_registradas())
+    nomes = {t.nome for t in tarefas}  # dependência fora desta execução conta como satisfeita
+    status = {}  # nome -> "ok" | "desligada" | "adiada" | "erro" | "pulada"
+    pendentes = list(tarefas)
+    erros = []
+    inicio_dag = time.time()
+
+    with ThreadPoolExecutor(max_workers=max_paralelo, thread_name_prefix="dag") as executor:
+        em_execucao = {}
+
+        while pendentes or em_execucao:
+            liberou = True
+            while liberou:
+                liberou = False
+                for t in list(pendentes):
+                    deps = [status.get(d) for d in t.depende_de if d in nomes]
+                    if any(d is None for d in deps):
+                        continue  # dependência ainda pendente ou rodando
+                    pendentes.remove(t)
+                    liberou = True
+                    if not t.habilitada:
+                        log_etl(t.nome, "DESLIGADA", t.mensagem_desligada)
+                        status[t.nome] = "desligada"
+                    elif any(d in ("erro", "pulada") for d in deps):
+                        falhas = [d for d in t.depende_de if status.get(d) in ("erro", "pulada")]
+                        log_etl("ORQUESTRADOR", "WARN", f"{t.nome} pulada: dependência com erro ({', '.join(falhas)})")
+                        status[t.nome] = "pulada"
+                    elif not _cabe_na_cota(t, cota):
+                        status[t.nome] = "adiada"
+                    else:
+                        em_execucao[executor.submit(_executar, t)] = t
+
+            if not em_execucao:
+                break
+
+            concluidas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidas:
+                t = em_execucao.pop(futuro)
+                try:
+                    tempo = futuro.result()
+                    status[t.nome] = "ok"
+                    log_etl("ORQUESTRADOR", "INFO", f"Tarefa {t.nome} concluída", tempo=tempo)
+                except Exception as e:
+                    status[t.nome] = "erro"
+                    erros.append(e)
+                    log_etl("ORQUESTRADOR", "ERRO", f"Tarefa {t.nome} falhou", erro=str(e))
+
+    log_etl("ORQUESTRADOR", "FIM", f"DAG finalizado: {status}", tempo=(time.time() - inicio_dag))
+    if erros:
+        raise erros[0]
+    return status
+# endregion
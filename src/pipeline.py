@@ -0,0 +1,151 @@
+# region IMPORTS
+import queue
+import threading
+import time
+from src.config import PIPELINE_TAMANHO_FILA
+from src.log import log_etl
+# endregion
+
+# region PIPELINE EXTRAÇÃO -> TRANSFORMAÇÃO -> CARGA
+_FIM = object()  # sentinela: o estágio anterior terminou
+
+
+class _Cancelado(Exception):
+    pass
+
+
+def _colocar(fila, item, parar):
+    """
+    put bloqueante (backpressure), mas que desiste se outro estágio falhou.
+    Retorna o tempo (s) aguardado com a fila cheia.
+    """
+    inicio = time.monotonic()
+    while True:
+        if parar.is_set():
+            raise _Cancelado()
+        try:
+            fila.put(item, timeout=0.5)
+            return time.monotonic() - inicio
+        except queue.Full:
+            continue
+
+
+def _retirar(fila, parar):
+    while True:
+        if parar.is_set():
+            raise _Cancelado()
+        try:
+            return fila.get(timeout=0.5)
+        except queue.Empty:
+            continue
+
+
+def executar_pipeline(fonte, transformar, gravar, tamanho_lote, ent_label, tamanho_fila=PIPELINE_TAMANHO_FILA, ao_falhar=None):
+    """
+    Executa extração, transformação e carga em estágios paralelos ligados por filas limitadas.
+    - fonte: iterável de listas de itens brutos (ex.: detalhes de uma página da API)
+    - transformar: função item_bruto -> registro (ex.: map_pedido_venda); retorno None descarta o item
+    - gravar: função lote -> quantidade gravada (ex.: upsert em batch via flush_buffer)
+    - tamanho_lote: registros por chamada de gravar
+    - tamanho_fila: itens em trânsito entre estágios; com a fila cheia o estágio anterior
+      aguarda (backpressure), então a API só segue à frente do banco até esse limite
+    - ao_falhar: função (item_bruto, erro) chamada quando transformar falha num item
+      (ex.: registrar_falha_importacao); o item é descartado e a transformação segue
+
+    Enquanto o banco grava um lote, a API continua buscando as próximas páginas.
+    Um payload malformado descarta só o próprio item (transformar é protegido item a item);
+    erros de extração ou de carga interrompem os demais estágios e são relançados aqui.
+    Retorna dict com métricas (paginas, transformados, falhas, gravados, tempos de espera por estágio).
+    """
+    fila_brutos = queue.Queue(maxsize=tamanho_fila)
+    fila_lotes = queue.Queue(maxsize=tamanho_fila)
+    parar = threading.Event()
+    erros = []
+    metricas = {
+        "paginas": 0,
+        "transformados": 0,
+        "falhas": 0,
+        "gravados": 0,
+        "espera_extracao": 0.0,  # API aguardando a transformação (fila cheia)
+        "espera_transformacao": 0.0,  # transformação aguardando a carga (fila cheia)
+    }
+
+    def _extrair():
+        try:
+            for itens in fonte:
+                metricas["espera_extracao"] += _colocar(fila_brutos, itens, parar)
+                metricas["paginas"] += 1
+            _colocar(fila_brutos, _FIM, parar)
+        except _Cancelado:
+            pass
+        except Exception as e:
+            erros.append(e)
+            parar.set()
+        finally:
+            if hasattr(fonte, "close"):
+                fonte.close()  # encerra o gerador (e o executor de detalhes) ao cancelar
+
+    def _transformar():
+        try:
+            lote = []
+            while True:
+                itens = _retirar(fila_brutos, parar)
+                if itens is _FIM:
+                    break
+                for item in itens:
+                    try:
+                        registro = transformar(item)
+                    except Exception as erro:
+                        metricas["falhas"] += 1
+                        log_etl(ent_label, "WARN", "Item descartado na transformação", erro=str(erro))
+                        if ao_falhar:
+                            ao_falhar(item, erro)
+                        continue
+                    if registro is None:
+                        continue
+                    lote.append(registro)
+                    metricas["transformados"] += 1
+                    if len(lote) >= tamanho_lote:
+                        metricas["espera_transformacao"] += _colocar(fila_lotes, lote, parar)
+                        lote = []
+            if lote:
+                metricas["espera_transformacao"] += _colocar(fila_lotes, lote, parar)
+            _colocar(fila_lotes, _FIM, parar)
+        except _Cancelado:
+            pass
+        except Exception as e:
+            erros.append(e)
+            parar.set()
+
+    threads = [
+        threading.Thread(target=_extrair, name=f"pipeline-{ent_label}-extracao", daemon=True),
+        threading.Thread(target=_transformar, name=f"pipeline-{ent_label}-transformacao", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    # Carga roda na thread chamadora (conexões do pool e logs ficam no fluxo principal)
+    try:
+        while True:
+            lote = _retirar(fila_lotes, parar)
+            if lote is _FIM:
+                break
+            metricas["gravados"] += gravar(lote) or 0
+    except _Cancelado:
+        pass
+    except Exception as e:
+        erros.append(e)
+        parar.set()
+    finally:
+        parar.set()  # libera os outros estágios também em interrupção (ex.: KeyboardInterrupt)
+        for t in threads:
+            t.join()
+
+    if erros:
+        raise erros[0]
+
+    metricas["espera_extracao"] = round(metricas["espera_extracao"], 3)
+    metricas["espera_transformacao"] = round(metricas["espera_transformacao"], 3)
+    log_etl(ent_label, "PIPELINE", f"Métricas do pipeline: {metricas}")
+    return metricas
+# endregion
@@ -0,0 +1,123 @@
+# region IMPORTS
+import threading
+import time
+from src.config import API_RATE_LIMITS
+# endregion
+
+# region TOKEN BUCKET
+class TokenBucket:
+    """
+    Limitador de taxa no modelo token bucket (thread-safe).
+    - taxa: tokens repostos por segundo (ex.: 3 req/s do Bling)
+    - burst: capacidade máxima do balde (requisições em rajada)
+    Toda requisição consome 1 token; sem token disponível, a chamada aguarda a reposição.
+    """
+
+    def __init__(self, taxa: float, burst: int = 1):
+        if taxa <= 0:
+            raise ValueError("taxa deve ser maior que zero")
+        self.taxa = float(taxa)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._ultimo = time.monotonic()
+        self._pausado_ate = 0.0
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.total_adquiridos = 0
+        self.total_esperas = 0
+        self.tempo_espera_total = 0.0
+        self.total_pausas = 0
+
+    def _repor(self):
+        agora = time.monotonic()
+        decorrido = agora - self._ultimo
+        if decorrido > 0:
+            self._tokens = min(self.burst, self._tokens + decorrido * self.taxa)
+            self._ultimo = agora
+
+    def adquirir(self, tokens: int = 1):
+        """
+        Bloqueia até haver `tokens` disponíveis e os consome.
+        Retorna o tempo (s) aguardado.
+        Pedir mais tokens que o burst é erro: o balde nunca chegaria a tê-los e a chamada
+        ficaria presa para sempre.
+        """
+        if tokens > self.burst:
+            raise ValueError(f"tokens ({tokens}) maior que o burst do balde ({self.burst})")
+        esperado = 0.0
+        while True:
+            with self._lock:
+                pausa = self._pausado_ate - time.monotonic()
+                if pausa > 0:
+                    falta = pausa
+                else:
+                    self._repor()
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        self.total_adquiridos += tokens
+                        if esperado > 0:
+                            self.total_esperas += 1
+                            self.tempo_espera_total += esperado
+                        return esperado
+                    falta = (tokens - self._tokens) / self.taxa
+            time.sleep(falta)
+            esperado += falta
+
+    def tentar_adquirir(self, tokens: int = 1) -> bool:
+        """
+        Consome `tokens` se disponíveis, sem bloquear. Retorna True se conseguiu.
+        """
+        with self._lock:
+            if time.monotonic() < self._pausado_ate:
+                return False
+            self._repor()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.total_adquiridos += tokens
+                return True
+            return False
+
+    def pausar(self, segundos: float):
+        """
+        Suspende a entrega de tokens por `segundos` (ex.: após um 429), para TODAS as threads.
+        Pausas sobrepostas não se somam: vale a que termina mais tarde.
+        """
+        with self._lock:
+            fim = time.monotonic() + segundos
+            if fim > self._pausado_ate:
+                self._pausado_ate = fim
+                self._tokens = 0.0
+                self._ultimo = fim  # não acumula tokens durante a pausa
+                self.total_pausas += 1
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "taxa": self.taxa,
+                "burst": self.burst,
+                "adquiridos": self.total_adquiridos,
+                "esperas": self.total_esperas,
+                "tempo_espera_total": round(self.tempo_espera_total, 3),
+                "pausas": self.total_pausas,
+            }
+# endregion
+
+# region REGISTRO POR CONTA
+_LIMITADORES = {}
+_LIMITADORES_LOCK = threading.Lock()
+
+
+def obter_rate_limiter(conta: str = "default") -> TokenBucket:
+    """
+    Retorna o limitador compartilhado da conta (um único balde por conta no processo),
+    criando-o a partir de API_RATE_LIMITS na primeira chamada.
+    """
+    with _LIMITADORES_LOCK:
+        limitador = _LIMITADORES.get(conta)
+        if limitador is None:
+            conf = API_RATE_LIMITS.get(conta) or API_RATE_LIMITS["default"]
+            limitador = TokenBucket(taxa=conf["taxa"], burst=conf["burst"])
+            _LIMITADORES[conta] = limitador
+        return limitador
+# endregion
@@ -0,0 +1,199 @@
+# region IMPORTS
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.arquivo_bruto import listar_arquivos_brutos, ler_arquivo_bruto
+from src.config import RAW_DIR, REPLAY_PROCESSOS, REPLAY_TAMANHO_LOTE
+from src.db import (
+    upsert_entidade,
+    SPEC_EMPRESA,
+    SPEC_CATEGORIA_PRODUTO,
+    SPEC_GRUPO_PRODUTO,
+    SPEC_CANAIS_VENDA,
+    SPEC_VENDEDOR,
+    SPEC_PRODUTO,
+    SPEC_DEPOSITO,
+    SPEC_SALDO_PRODUTO_DEPOSITO,
+    SPEC_PEDIDO_VENDA,
+    SPEC_CATEGORIA_RECEITA_DESPESA,
+    SPEC_CONTATO,
+    SPEC_PRODUTO_ESTRUTURA,
+)
+from src.log import log_etl
+from src.transformers import (
+    map_empresa,
+    map_categoria_produto,
+    map_grupo_produto,
+    map_canais_venda,
+    map_vendedores,
+    map_produtos,
+    map_deposito,
+    map_saldo_produto_deposito,
+    map_pedido_venda,
+    map_categoria_receita_despesa,
+    map_contato,
+    map_produto_estrutura,
+)
+# endregion
+
+# region ENTIDADES REPROCESSÁVEIS
+# entidade (nome na zona bruta) -> (forma do map_*, map_*, spec da tabela stg)
+#   "item":      map_x(payload) -> registro
+#   "lista":     map_x([payloads]) -> [registros]
+#   "estrutura": map_produto_estrutura(payload, id_produto=id da linha) -> [registros]
+ENTIDADES_REPLAY = {
+    "empresa": ("item", map_empresa, SPEC_EMPRESA),
+    "categoria_produto": ("item", map_categoria_produto, SPEC_CATEGORIA_PRODUTO),
+    "grupo_produto": ("item", map_grupo_produto, SPEC_GRUPO_PRODUTO),
+    "canais_venda": ("item", map_canais_venda, SPEC_CANAIS_VENDA),
+    "vendedor": ("lista", map_vendedores, SPEC_VENDEDOR),
+    "produto": ("lista", map_produtos, SPEC_PRODUTO),
+    "deposito": ("item", map_deposito, SPEC_DEPOSITO),
+    "saldo_produto_deposito": ("lista", map_saldo_produto_deposito, SPEC_SALDO_PRODUTO_DEPOSITO),
+    "pedido_venda": ("item", map_pedido_venda, SPEC_PEDIDO_VENDA),
+    "categoria_receita_despesa": ("item", map_categoria_receita_despesa, SPEC_CATEGORIA_RECEITA_DESPESA),
+    "contato": ("item", map_contato, SPEC_CONTATO),
+    "produto_estrutura": ("estrutura", map_produto_estrutura, SPEC_PRODUTO_ESTRUTURA),
+}
+# endregion
+
+# region MAPEAMENTO (RODA NOS PROCESSOS FILHOS)
+def mapear_lote(entidade, linhas):
+    """
+    Aplica o map_* da entidade a um lote de linhas da zona bruta.
+    Retorna (registros, falhas): falhas = [(id, erro)] das linhas que o map_* não aceitou.
+    Função de módulo (e não closure) para poder ser enviada aos processos filhos.
+    """
+    forma, mapear, _ = ENTIDADES_REPLAY[entidade]
+    if forma == "lista":
+        try:
+            return [r for r in mapear([l["dados"] for l in linhas]) if r], []
+        except Exception:
+            pass  # lote com payload inválido: refaz item a item para isolar a falha
+
+    registros = []
+    falhas = []
+    for linha in linhas:
+        try:
+            if forma == "item":
+                registro = mapear(linha["dados"])
+                if registro:
+                    registros.append(registro)
+            elif forma == "lista":
+                registros.extend(r for r in mapear([linha["dados"]]) if r)
+            else:
+                registros.extend(mapear(linha["dados"], id_produto=linha["id"]))
+        except Exception as erro:
+            falhas.append((linha.get("id"), str(erro)))
+    return registros, falhas
+
+
+def _mapear_lote_tupla(args):
+    return mapear_lote(*args)
+
+
+def _mapear_em_blocos(executor, lotes, em_voo):
+    # Mantém até `em_voo` lotes sendo mapeados; devolve (qtd_linhas, resultado) na ordem de leitura
+    pendentes = []
+    for args in lotes:
+        pendentes.append((len(args[1]), executor.submit(_mapear_lote_tupla, args)))
+        if len(pendentes) >= em_voo:
+            linhas, futuro = pendentes.pop(0)
+            yield linhas, futuro.result()
+    for linhas, futuro in pendentes:
+        yield linhas, futuro.result()
+# endregion
+
+# region LEITURA EM LOTES
+def _lotes(entidade, arquivos, tamanho_lote):
+    # Lê os arquivos em ordem de dia de extração (o payload mais novo de cada ID vem por último)
+    lote = []
+    for _, _, caminho in arquivos:
+        for linha in ler_arquivo_bruto(caminho):
+            lote.append(linha)
+            if len(lote) >= tamanho_lote:
+                yield entidade, lote
+                lote = []
+    if lote:
+        yield entidade, lote
+
+
+def _ultimo_por_chave(registros, chave):
+    # Mesmo ID em vários arquivos (ou janelas sobrepostas): fica o último, que é o mais recente.
+    # Também evita "ON CONFLICT DO UPDATE command cannot affect row a second time" no upsert.
+    unicos = {}
+    for r in registros:
+        unicos[tuple(r.get(c) for c in chave)] = r
+    return list(unicos.values())
+# endregion
+
+# region REPLAY
+def reprocessar_entidade(db_uri, entidade, dt_ini=None, dt_fim=None, processos=REPLAY_PROCESSOS,
+                         tamanho_lote=REPLAY_TAMANHO_LOTE, diretorio=RAW_DIR, executor=None):
+    """
+    Reconstrói a tabela stg da entidade a partir da zona bruta, sem chamar a API:
+    lê os arquivos (streaming, lote a lote), aplica o map_* em processos paralelos e grava
+    com upsert_entidade (mesmo spec e mesmo hash de conteúdo da carga normal).
+    dt_ini/dt_fim filtram pelo dia da extração (partição dt= da zona bruta).
+    Retorna dict com métricas (arquivos, linhas, registros, gravados, falhas, tempo).
+    """
+    if entidade not in ENTIDADES_REPLAY:
+        raise ValueError(f"Entidade sem replay: {entidade}. Disponíveis: {sorted(ENTIDADES_REPLAY)}")
+    spec = ENTIDADES_REPLAY[entidade][2]
+    label = f"REPLAY {entidade.upper()}"
+    arquivos = listar_arquivos_brutos(entidade, dt_ini, dt_fim, diretorio)
+    metricas = {"arquivos": len(arquivos), "linhas": 0, "registros": 0, "gravados": 0, "falhas": 0}
+    inicio = time.time()
+
+    if not arquivos:
+        log_etl(label, "INFO", f"Nenhum arquivo na zona bruta ({diretorio}) para o filtro {dt_ini} a {dt_fim}")
+        return metricas
+    log_etl(label, "INÍCIO", f"Reprocessando {len(arquivos)} arquivo(s) da zona bruta")
+
+    lotes = _lotes(entidade, arquivos, tamanho_lote)
+    proprio = executor is None and processos > 1
+    if proprio:
+        executor = ProcessPoolExecutor(max_workers=processos)
+    try:
+        if executor is None:
+            resultados = ((len(linhas), mapear_lote(ent, linhas)) for ent, linhas in lotes)
+        else:
+            # executor.map consome o gerador inteiro antes de devolver; em blocos,
+            # a memória fica limitada a alguns lotes por processo
+            resultados = _mapear_em_blocos(executor, lotes, max(processos, 1) * 2)
+
+        for linhas, (registros, falhas) in resultados:
+            metricas["linhas"] += linhas
+            metricas["registros"] += len(registros)
+            metricas["falhas"] += len(falhas)
+            for id_ref, erro in falhas:
+                log_etl(label, "WARN", f"Falha ao mapear ID {id_ref}", erro=erro)
+            if registros:
+                metricas["gravados"] += upsert_entidade(db_uri, spec, _ultimo_por_chave(registros, spec.chave))
+    finally:
+        if proprio:
+            executor.shutdown()
+
+    metricas["tempo"] = round(time.time() - inicio, 3)
+    log_etl(label, "FIM", f"Replay concluído: {metricas}", quantidade=metricas["gravados"], tempo=metricas["tempo"])
+    return metricas
+
+
+def reprocessar_zona_bruta(db_uri, entidades=None, dt_ini=None, dt_fim=None, processos=REPLAY_PROCESSOS,
+                           tamanho_lote=REPLAY_TAMANHO_LOTE, diretorio=RAW_DIR):
+    """
+    Replay de várias entidades (padrão: todas), compartilhando o mesmo pool de processos.
+    Retorna {entidade: métricas}.
+    """
+    entidades = list(entidades or ENTIDADES_REPLAY)
+    resultado = {}
+    executor = ProcessPoolExecutor(max_workers=processos) if processos > 1 else None
+    try:
+        for entidade in entidades:
+            resultado[entidade] = reprocessar_entidade(
+                db_uri, entidade, dt_ini, dt_fim, processos, tamanho_lote, diretorio, executor=executor
+            )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return resultado
+# endregion
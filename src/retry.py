@@ -0,0 +1,203 @@
+# region IMPORTS
+import random
+import threading
+import requests
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from src.config import (
+    RETRY_429_MAX_TENTATIVAS,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    RETRY_JITTER,
+    RETRY_COTA_DIARIA_ESPERA,
+)
+from src.log import log_etl
+# endregion
+
+# region EXCEÇÕES
+class CotaDiariaEsgotada(Exception):
+    """
+    Limite diário de requisições da conta atingido (429 com period = dia).
+    Retentar não adianta: a carga deve parar e seguir no próximo dia.
+    - liberada_em: datetime (UTC) estimado para a cota voltar (Retry-After ou RETRY_COTA_DIARIA_ESPERA)
+    """
+
+    def __init__(self, mensagem, liberada_em=None):
+        super().__init__(mensagem)
+        self.liberada_em = liberada_em
+
+
+class TentativasEsgotadas(requests.exceptions.HTTPError):
+    """
+    HTTP 429 persistente: a política de retry esgotou as tentativas (RETRY_429_MAX_TENTATIVAS).
+    Subclasse de HTTPError (response = último 429), para quem já trata HTTPError.
+    """
+# endregion
+
+# region LEITURA DA RESPOSTA 429
+_PERIODOS_DIARIOS = ("day", "dia", "daily", "diario", "diário")
+
+
+def retry_after_segundos(response):
+    """
+    Lê o header Retry-After (segundos ou data HTTP). Retorna segundos (float) ou None.
+    """
+    valor = response.headers.get("Retry-After")
+    if not valor:
+        return None
+    valor = valor.strip()
+    try:
+        return max(float(valor), 0.0)
+    except ValueError:
+        pass
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return max((data - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def periodo_limite(response):
+    """
+    Retorna o período do limite estourado informado no corpo do 429 (ex.: "second", "day"),
+    procurando em error.period e em period. None quando o corpo não informa.
+    """
+    try:
+        corpo = response.json()
+    except ValueError:
+        return None
+    if not isinstance(corpo, dict):
+        return None
+    erro = corpo.get("error")
+    periodo = erro.get("period") if isinstance(erro, dict) else None
+    periodo = periodo or corpo.get("period")
+    return str(periodo).strip().lower() if periodo else None
+# endregion
+
+# region POLÍTICA DE RETRY
+class PoliticaRetry:
+    """
+    Decide quanto esperar (ou se desiste) a cada HTTP 429, em vez de sleep fixo + recursão.
+    - backoff exponencial limitado: base * 2^(tentativa-1), até maximo
+    - Retry-After do servidor é respeitado como espera mínima
+    - jitter: acréscimo aleatório de até jitter * espera, para as threads não voltarem juntas
+    - period = dia no corpo: não retenta; levanta CotaDiariaEsgotada e bloqueia as próximas
+      chamadas localmente (sem gastar requisição nem somar erros para o bloqueio de IP)
+    Thread-safe: uma política por conta, compartilhada pelas threads de extração.
+    """
+
+    def __init__(
+        self,
+        max_tentativas=RETRY_429_MAX_TENTATIVAS,
+        base=RETRY_BACKOFF_BASE,
+        maximo=RETRY_BACKOFF_MAX,
+        jitter=RETRY_JITTER,
+        espera_cota_diaria=RETRY_COTA_DIARIA_ESPERA,
+    ):
+        self.max_tentativas = max(1, int(max_tentativas))
+        self.base = float(base)
+        self.maximo = float(maximo)
+        self.jitter = float(jitter)
+        self.espera_cota_diaria = float(espera_cota_diaria)
+        self._cota_liberada_em = None  # time.monotonic() a partir do qual a cota diária volta
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.total_429 = 0
+        self.total_retentativas = 0
+        self.total_desistencias = 0
+        self.total_cota_diaria = 0
+        self.tempo_espera_total = 0.0
+        self.por_periodo = {}
+
+    def calcular_espera(self, tentativa, retry_after=None):
+        """
+        Espera (s) antes da tentativa seguinte: backoff exponencial limitado, nunca abaixo
+        do Retry-After, mais o jitter.
+        """
+        espera = min(self.maximo, self.base * (2 ** max(tentativa - 1, 0)))
+        if retry_after is not None:
+            espera = max(espera, retry_after)
+        return espera + random.uniform(0, espera * self.jitter)
+
+    def verificar_cota(self):
+        """
+        Levanta CotaDiariaEsgotada se a cota diária já foi dada como esgotada nesta execução.
+        """
+        with self._lock:
+            if self._cota_liberada_em is None:
+                return
+            restante = self._cota_liberada_em - time.monotonic()
+            if restante <= 0:
+                self._cota_liberada_em = None
+                return
+        raise CotaDiariaEsgotada(f"Cota diária da API esgotada; liberação estimada em {int(restante)}s")
+
+    def avaliar_429(self, response, tentativa, endpoint):
+        """
+        Trata um 429 recebido na tentativa informada (1 = primeira).
+        Retorna a espera (s) antes de retentar, ou None quando as tentativas acabaram.
+        Levanta CotaDiariaEsgotada quando o limite estourado é o diário.
+        """
+        retry_after = retry_after_segundos(response)
+        periodo = periodo_limite(response)
+
+        with self._lock:
+            self.total_429 += 1
+            chave = periodo or "desconhecido"
+            self.por_periodo[chave] = self.por_periodo.get(chave, 0) + 1
+
+        if periodo in _PERIODOS_DIARIOS:
+            espera = retry_after if retry_after is not None else self.espera_cota_diaria
+            with self._lock:
+                self.total_cota_diaria += 1
+                self._cota_liberada_em = time.monotonic() + espera
+            log_etl("BLING_API", "ERRO", f"Cota diária esgotada em {endpoint}; novas chamadas bloqueadas por {int(espera)}s")
+            raise CotaDiariaEsgotada(
+                f"Cota diária da API esgotada ({endpoint})",
+                liberada_em=datetime.now(timezone.utc) + timedelta(seconds=espera),
+            )
+
+        if tentativa >= self.max_tentativas:
+            with self._lock:
+                self.total_desistencias += 1
+            log_etl("BLING_API", "ERRO", f"429 em {endpoint}: {tentativa} tentativas esgotadas (período: {periodo})")
+            return None
+
+        espera = self.calcular_espera(tentativa, retry_after)
+        with self._lock:
+            self.total_retentativas += 1
+            self.tempo_espera_total += espera
+        return espera
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "429": self.total_429,
+                "retentativas": self.total_retentativas,
+                "desistencias": self.total_desistencias,
+                "cota_diaria": self.total_cota_diaria,
+                "tempo_espera_total": round(self.tempo_espera_total, 3),
+                "por_periodo": dict(self.por_periodo),
+            }
+# endregion
+
+# region REGISTRO POR CONTA
+_POLITICAS = {}
+_POLITICAS_LOCK = threading.Lock()
+
+
+def obter_politica_retry(conta: str = "default") -> PoliticaRetry:
+    """
+    Retorna a política de retry compartilhada da conta (a cota diária é da conta, não da instância).
+    """
+    with _POLITICAS_LOCK:
+        politica = _POLITICAS.get(conta)
+        if politica is None:
+            politica = PoliticaRetry()
+            _POLITICAS[conta] = politica
+        return politica
+# endregion
@@ -1,9 +1,24 @@
 # region IMPORTS E UTILS
+import hashlib
 import json
 from datetime import datetime
 from src.date_utils import parse_date_safe
 # endregion
 
+# region HASH DE CONTEÚDO
+_CAMPOS_FORA_DO_HASH = ("dt_carga", "dt_atualizacao", "hash_conteudo")
+
+
+def calcular_hash_conteudo(registro, ignorar=_CAMPOS_FORA_DO_HASH):
+    """
+    Hash estável (md5 hex) do conteúdo de negócio de um registro mapeado.
+    Ignora os timestamps de carga, que mudam a cada execução; a ordem das chaves não importa.
+    """
+    conteudo = {k: v for k, v in registro.items() if k not in ignorar}
+    serializado = json.dumps(conteudo, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.md5(serializado.encode("utf-8")).hexdigest()
+# endregion
+
 # region MAPEAR EMPRESA
 def map_empresa(data):
     return {
@@ -203,7 +218,7 @@ def map_pedido_venda(api_obj):
     intermediador = api_obj.get("intermediador") or {}
     taxas = api_obj.get("taxas") or {}
 
-    return {
+    registro = {
         "id_bling":              api_obj.get("id"),
         "numero":                api_obj.get("numero"),
         "numero_loja":           api_obj.get("numeroLoja"),
@@ -249,6 +264,8 @@ def map_pedido_venda(api_obj):
         "dt_carga":              now,
         "dt_atualizacao":        now,
     }
+    registro["hash_conteudo"] = calcular_hash_conteudo(registro)
+    return registro
 # endregion
 
 # region MAPEAR CATEGORIA RECEITA/DESPESA
@@ -280,7 +297,7 @@ def map_contato(api_obj):
     endereco = api_obj.get("endereco", {}).get("geral", {})
     vendedor = api_obj.get("vendedor", {}) or {}
 
-    return {
+    registro = {
         "id_bling": api_obj.get("id"),
         "nome": api_obj.get("nome"),
         "codigo": api_obj.get("codigo"),
@@ -309,6 +326,8 @@ def map_contato(api_obj):
         "dt_carga": now,
         "dt_atualizacao": now  # será sobrescrito pela lógica incremental se necessário
     }
+    registro["hash_conteudo"] = calcular_hash_conteudo(registro)
+    return registro
 # endregion
 
 # region MAPEAR ESTRUTURA PRODUTO
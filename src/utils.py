@@ -1,10 +1,10 @@
 # region IMPORTS
-import psycopg2
 from datetime import date, datetime, timedelta
 from src.transformers import map_produtos, map_saldo_produto_deposito, map_contato
 from src.db import upsert_produto_bling_bulk, upsert_saldo_produto_deposito_bulk, upsert_contato_bling_bulk
 from src.date_utils import parse_date_safe
 from src.config import (MARGEM_DIAS_INCREMENTO, DATA_FULL_INICIAL)
+from src.conexao import conexao, garantir_colunas
 from src.log import (log_etl,)
 
 # endregion
@@ -28,9 +28,7 @@ def get_data_periodo_incremental(db_uri, tabela_fisica, etapa, margem_dias, data
 
 # region REPROCESSA FULL
 def reprocessar_todas_falhas(api, db_uri):
-    import psycopg2
-    conn = psycopg2.connect(db_uri)
-    with conn:
+    with conexao(db_uri) as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 SELECT entidade, id_referencia FROM conf.importacao_falha
@@ -92,8 +90,7 @@ def reprocessa_produtos_por_ids(lista_ids, api, db_uri):
 
 # region MARCA FALHA COMO PROCESSADO EM CASO DE REPROCESSAMENTO
 def marcar_falha_como_processada(db_uri, entidade, id_referencia):
-    conn = psycopg2.connect(db_uri)
-    with conn:
+    with conexao(db_uri) as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 UPDATE conf.log_detalhes
@@ -104,8 +101,7 @@ def marcar_falha_como_processada(db_uri, entidade, id_referencia):
 
 # region INSERE FALHAS DE IMPORTACAO NA TABELA conf.importacao_falha
 def registrar_falha_importacao(db_uri, entidade, id_referencia, erro, id_log=None):
-    conn = psycopg2.connect(db_uri)
-    with conn:
+    with conexao(db_uri) as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO conf.log_detalhes (entidade, id_referencia, erro, id_log)
@@ -120,8 +116,7 @@ def atualizar_controle_carga(db_uri, tabela_fisica, etapa, dt_ultima_carga, supo
     Insere ou atualiza o controle de carga com base em tabela_fisica + etapa.
     'entidade' é opcional, usada apenas como tag organizacional.
     """
-    conn = psycopg2.connect(db_uri)
-    with conn:
+    with conexao(db_uri) as conn:
         with conn.cursor() as cur:
             sql = """
                 INSERT INTO conf.controle_carga 
@@ -145,13 +140,91 @@ def get_ultima_data_carga(db_uri, tabela_fisica, etapa):
            AND etapa = %s
          LIMIT 1
     """
-    with psycopg2.connect(db_uri) as conn:
+    with conexao(db_uri) as conn:
         with conn.cursor() as cur:
             cur.execute(query, (tabela_fisica, etapa))
             result = cur.fetchone()
             return result[0] if result else None
 # endregion
 
+# region WATERMARK (MAIOR ALTERAÇÃO CARREGADA)
+def _garantir_coluna_watermark(db_uri):
+    garantir_colunas(db_uri, "conf.controle_carga", {"watermark": "TIMESTAMP"})
+
+
+def obter_watermark(db_uri, tabela_fisica, etapa):
+    """
+    Retorna a maior data de alteração (na origem) já carregada para a entidade, ou None.
+    """
+    _garantir_coluna_watermark(db_uri)
+    with conexao(db_uri) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT watermark
+                  FROM conf.controle_carga
+                 WHERE tabela_fisica = %s
+                   AND etapa = %s
+                 LIMIT 1
+            """, (tabela_fisica, etapa))
+            result = cur.fetchone()
+            return result[0] if result else None
+
+
+def atualizar_watermark(db_uri, tabela_fisica, etapa, watermark):
+    """
+    Avança o watermark da entidade (nunca retrocede). Chamar só após a carga concluída.
+    """
+    if not watermark:
+        return
+    _garantir_coluna_watermark(db_uri)
+    with conexao(db_uri) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE conf.controle_carga
+                   SET watermark = GREATEST(COALESCE(watermark, %s), %s)
+                 WHERE tabela_fisica = %s
+                   AND etapa = %s
+            """, (watermark, watermark, tabela_fisica, etapa))
+
+
+def maior_data_alteracao(detalhes, campos, atual=None):
+    """
+    Maior data de alteração encontrada nos detalhes da API (primeiro campo presente em `campos`).
+    Retorna `atual` se nenhum detalhe trouxer o campo.
+    """
+    maior = atual
+    for d in detalhes:
+        for campo in campos:
+            dt = parse_date_safe(d.get(campo))
+            if dt:
+                if maior is None or dt > maior:
+                    maior = dt
+                break
+    return maior
+
+
+def get_data_periodo_watermark(db_uri, tabela_fisica, etapa, sobreposicao_dias, margem_dias, data_full_inicial):
+    """
+    Janela incremental a partir do watermark: começa no dia do watermark menos `sobreposicao_dias`
+    e vai até ontem. Os filtros da API são por data (sem hora), então a sobreposição é em dias.
+    Sem watermark registrado, usa a janela por dt_ultima_carga - margem (get_data_periodo_incremental).
+    Retorna (dt_ini, dt_fim) como 'YYYY-MM-DD'.
+    """
+    watermark = obter_watermark(db_uri, tabela_fisica, etapa)
+    if not watermark:
+        return get_data_periodo_incremental(db_uri, tabela_fisica, etapa, margem_dias, data_full_inicial)
+
+    _, dt_fim = janela_incremental(
+        carga_full=False,
+        ultima_execucao=watermark,
+        margem_dias=margem_dias,
+        data_full_inicial=data_full_inicial
+    )
+    dia_watermark = watermark.replace(hour=0, minute=0, second=0, microsecond=0)
+    dt_ini = min(dia_watermark - timedelta(days=sobreposicao_dias), dt_fim)
+    return dt_ini.strftime("%Y-%m-%d"), dt_fim.strftime("%Y-%m-%d")
+# endregion
+
 # region UTILITÁRIOS DE DATA/PERÍODOS
 def gerar_periodos(dt_inicio, dt_fim, max_dias=365):
     """
@@ -167,6 +240,42 @@ def gerar_periodos(dt_inicio, dt_fim, max_dias=365):
         data_atual = proxima_data
     return periodos
 
+def _como_date(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], "%Y-%m-%d").date()
+
+def dividir_janela(dt_inicio, dt_fim, max_dias=365):
+    """
+    Divide [dt_inicio, dt_fim] (datas inclusivas, str 'YYYY-MM-DD' ou date/datetime) em janelas
+    sem sobreposição de no máximo `max_dias` dias, via gerar_periodos.
+    Retorna lista de (str, str) no formato 'YYYY-MM-DD', prontas para os filtros da API.
+    """
+    ini, fim = _como_date(dt_inicio), _como_date(dt_fim)
+    if fim < ini:
+        return []
+    janelas = []
+    # gerar_periodos trabalha com fim exclusivo: fim + 1 dia cobre o último dia
+    for a, b in gerar_periodos(ini, fim + timedelta(days=1), max_dias=max_dias):
+        janelas.append((a.strftime("%Y-%m-%d"), (b - timedelta(days=1)).strftime("%Y-%m-%d")))
+    return janelas
+
+def dividir_janela_ao_meio(dt_inicio, dt_fim):
+    """
+    Divide uma janela inclusiva em duas metades. Retorna None se a janela tem um único dia.
+    """
+    ini, fim = _como_date(dt_inicio), _como_date(dt_fim)
+    dias = (fim - ini).days
+    if dias < 1:
+        return None
+    meio = ini + timedelta(days=dias // 2)
+    return [
+        (ini.strftime("%Y-%m-%d"), meio.strftime("%Y-%m-%d")),
+        ((meio + timedelta(days=1)).strftime("%Y-%m-%d"), fim.strftime("%Y-%m-%d")),
+    ]
+
 def obter_data_inicio_carga(db_uri, entidade, tabela_fisica, etapa, carga_full, dias_margem=2, dt_inicial_full=None):
     """
     Retorna a data inicial para busca incremental/full.
@@ -279,13 +388,16 @@ def flush_buffer(db_uri, buffer, upsert_fn, batch_size, ent_label, log_fn):
     - ent_label: rótulo da entidade para logging (ex.: "PEDIDOS_VENDAS")
     - log_fn: função de log (ex.: log_etl)
 
-    Retorna: quantidade gravada (int)
+    Retorna: quantidade processada (int)
     """
     if not buffer:
         return 0
-    upsert_fn(db_uri, buffer, batch_size=batch_size)
+    gravados = upsert_fn(db_uri, buffer, batch_size=batch_size)
     qtd = len(buffer)
-    log_fn(ent_label, "DB", "Batch gravado", quantidade=qtd)
+    if gravados is None or gravados == qtd:
+        log_fn(ent_label, "DB", "Batch gravado", quantidade=qtd)
+    else:
+        log_fn(ent_label, "DB", f"Batch gravado: {gravados} gravados, {qtd - gravados} sem alteração (ignorados)", quantidade=qtd)
     buffer.clear()
     return qtd
 # endregion
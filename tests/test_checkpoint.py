@@ -0,0 +1,73 @@
+# region IMPORTS
+import time
+import pytest
+import src.checkpoint as checkpoint_mod
+from src.checkpoint import CheckpointCarga
+from src.extrator import extrair_detalhes_por_janelas
+# endregion
+
+# region FIXTURES
+JANELAS = [("2024-01-01", "2024-06-30"), ("2024-07-01", "2024-12-31")]
+PAGINAS_POR_JANELA = 3
+
+
+@pytest.fixture
+def checkpoint(monkeypatch):
+    # Sem banco: o checkpoint só acompanha o progresso em memória
+    monkeypatch.setattr(checkpoint_mod, "salvar_checkpoint", lambda *args, **kwargs: None)
+    return CheckpointCarga("db", "contato", "stg.contato_bling", "api_to_stg", "2024-01-01", "2024-12-31", JANELAS)
+
+
+def _fn_ids_pagina(pagina, limit=100, params=None):
+    # IDs únicos por janela/página; página além de PAGINAS_POR_JANELA vem vazia (fim da janela)
+    if pagina > PAGINAS_POR_JANELA:
+        return []
+    base = 1000 if params["ini"] == JANELAS[0][0] else 2000
+    return [base + pagina * 10 + i for i in range(2)]
+# endregion
+
+# region ORDEM: FIM DE JANELA x PÁGINAS LIDAS
+def test_janela_extraida_so_depois_da_ultima_pagina_lida(checkpoint):
+    eventos = []
+
+    def janela_extraida(janela):
+        eventos.append(("extraida", janela))
+        checkpoint.janela_extraida(janela)
+
+    paginas = extrair_detalhes_por_janelas(
+        fn_ids_pagina=_fn_ids_pagina,
+        fn_detalhe=lambda i: {"id": i},
+        montar_filtro=lambda ini, fim: {"ini": ini, "fim": fim},
+        janelas=JANELAS,
+        db_uri="db",
+        entidade="contato",
+        ent_label="CONTATO",
+        ao_concluir_janela=janela_extraida,
+    )
+    for janela, pagina, ids, detalhes in paginas:
+        time.sleep(0.05)  # consumidor mais lento que a extração: a fila enche antes de ele ler
+        checkpoint.pagina_lida(janela, pagina, [d["id"] for d in detalhes])
+        eventos.append(("lida", janela))
+        # Nenhuma janela pode estar concluída com páginas lidas e ainda não gravadas
+        assert not checkpoint._concluidas
+
+    for janela in JANELAS:
+        posicoes = [n for n, (tipo, j) in enumerate(eventos) if j == janela]
+        assert [eventos[n][0] for n in posicoes].count("lida") == PAGINAS_POR_JANELA
+        assert eventos[posicoes[-1]] == ("extraida", janela)
+
+    ids_lidos = [i for ids in checkpoint._pendentes.values() for i in ids]
+    checkpoint.registros_gravados(ids_lidos)
+    assert checkpoint._concluidas == set(JANELAS)
+    assert checkpoint._ultima == {j: PAGINAS_POR_JANELA for j in JANELAS}
+
+
+def test_janela_extraida_antes_da_pagina_lida_nao_conclui_com_pendencias(checkpoint):
+    janela = JANELAS[0]
+    checkpoint.pagina_lida(janela, 1, [1, 2])
+    checkpoint.janela_extraida(janela)
+    assert janela not in checkpoint._concluidas  # página 1 ainda não gravada
+
+    checkpoint.registros_gravados([1, 2])
+    assert janela in checkpoint._concluidas
+# endregion
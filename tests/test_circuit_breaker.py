@@ -0,0 +1,65 @@
+# region IMPORTS
+import json
+import requests
+from src.circuit_breaker import indica_bloqueio
+# endregion
+
+# region FIXTURES
+# Corpos no envelope de erro da API v3 ({"error": {"type", "message", "description"}}).
+# As mensagens são propositalmente diferentes das do fake_bling: a detecção não pode depender do texto.
+BLOQUEIO_403 = {
+    "error": {
+        "type": "FORBIDDEN",
+        "message": "Acesso negado",
+        "description": "O IP de origem foi bloqueado por excesso de requisições.",
+    }
+}
+BLOQUEIO_429_SEM_PERIODO = {
+    "error": {
+        "type": "TOO_MANY_REQUESTS",
+        "message": "Too many requests",
+        "description": "Requisições bloqueadas temporariamente.",
+    }
+}
+LIMITE_SEGUNDO = {
+    "error": {
+        "type": "TOO_MANY_REQUESTS",
+        "message": "Limite de requisições atingido.",
+        "description": "Limite de requisições por segundo atingido, tente novamente mais tarde.",
+        "period": "second",
+    }
+}
+LIMITE_DIA = {"error": dict(LIMITE_SEGUNDO["error"], period="day")}
+
+
+def _resposta(status, corpo):
+    response = requests.Response()
+    response.status_code = status
+    response._content = (corpo if isinstance(corpo, str) else json.dumps(corpo)).encode("utf-8")
+    return response
+# endregion
+
+# region DETECÇÃO DE BLOQUEIO
+def test_403_com_erro_estruturado_e_bloqueio():
+    assert indica_bloqueio(_resposta(403, BLOQUEIO_403))
+
+
+def test_429_sem_period_e_bloqueio():
+    assert indica_bloqueio(_resposta(429, BLOQUEIO_429_SEM_PERIODO))
+
+
+def test_429_com_period_e_limite_e_nao_bloqueio():
+    assert not indica_bloqueio(_resposta(429, LIMITE_SEGUNDO))
+    assert not indica_bloqueio(_resposta(429, LIMITE_DIA))
+
+
+def test_corpo_fora_do_envelope_nao_e_bloqueio():
+    assert not indica_bloqueio(_resposta(403, "<html>Forbidden</html>"))
+    assert not indica_bloqueio(_resposta(403, {"message": "Forbidden"}))
+    assert not indica_bloqueio(_resposta(429, []))
+
+
+def test_outros_status_nao_sao_bloqueio():
+    assert not indica_bloqueio(_resposta(401, BLOQUEIO_403))
+    assert not indica_bloqueio(_resposta(500, BLOQUEIO_403))
+# endregion
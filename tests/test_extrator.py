@@ -0,0 +1,36 @@
+# region IMPORTS
+import pytest
+import src.extrator as extrator_mod
+from src.extrator import extrair_detalhes_paginados
+from src.retry import CotaDiariaEsgotada
+# endregion
+
+# region COTA DIÁRIA ESGOTADA NO DETALHE
+def test_cota_esgotada_no_detalhe_interrompe_a_extracao(monkeypatch):
+    falhas = []
+    monkeypatch.setattr(extrator_mod, "registrar_falha_importacao", lambda **kwargs: falhas.append(kwargs))
+    paginas_pedidas = []
+
+    def ids_pagina(pagina, limit=100):
+        paginas_pedidas.append(pagina)
+        return [pagina * 10 + i for i in range(5)]
+
+    def detalhe(id_ref):
+        if id_ref >= 12:
+            raise CotaDiariaEsgotada("Cota diária da API esgotada (produtos)")
+        return {"id": id_ref}
+
+    paginas = extrair_detalhes_paginados(
+        fn_ids_pagina=ids_pagina,
+        fn_detalhe=detalhe,
+        db_uri="db",
+        entidade="produto",
+        ent_label="PRODUTOS",
+        max_workers=2,
+    )
+    with pytest.raises(CotaDiariaEsgotada):
+        list(paginas)
+
+    assert paginas_pedidas == [1]  # não segue para a página seguinte
+    assert falhas == []  # IDs sem cota não viram falha de importação
+# endregion